@@ -1,127 +1,626 @@
-from board import Board, log_debug
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from board import Board, log_debug, move_name
+from book import OpeningBook
+from tablebase import Tablebases
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from ordering import MoveOrderer, MAX_PLY
+
+MATE_SCORE = 100000
+TIME_CHECK_INTERVAL = 256  # nodes between clock checks
+MAX_QUIESCENCE_PLY = 32
+TABLEBASE_WIN = MATE_SCORE // 2  # tablebase wins, less the plies to mate; below mates the search sees itself
+# Mates and tablebase wins score MATE_SCORE or TABLEBASE_WIN less the plies from the root to the
+# mate, so sooner wins score higher. Anything beyond WIN_BOUND is such a score; the transposition
+# table holds these counted from the stored position instead, as it may be reached at another ply.
+WIN_BOUND = TABLEBASE_WIN // 2
+NULL_MOVE_REDUCTION = 2  # plies a null move search is shallower than the move searches of its node
+LMR_MIN_DRAFT = 3  # late move reductions only with at least this many plies left
+LMR_MIN_INDEX = 3  # ... from the fourth move on
+LMR_DEEP_INDEX = 8  # and by two plies instead of one from the ninth
+
+
+def tablebase_score(result: int, plies: int, ply: int = 0) -> int:
+    """Scores a tablebase result (Tablebases.probe) for the side to move, ply plies from the
+    root: faster wins (and slower losses) score higher."""
+    return result * (TABLEBASE_WIN - ply - plies)
+
+
+def score_to_tt(value: float, ply: int) -> float:
+    """Converts a score counting mates from the root into one counting them from the position
+    ply plies below it, for storing in the transposition table."""
+    if value > WIN_BOUND:
+        return value + ply
+    if value < -WIN_BOUND:
+        return value - ply
+    return value
+
+
+def score_from_tt(value: float, ply: int) -> float:
+    """The inverse of score_to_tt, for a stored score found ply plies below the root."""
+    if value > WIN_BOUND:
+        return value - ply
+    if value < -WIN_BOUND:
+        return value + ply
+    return value
+
+
+def search_plies(max_depth: int) -> int:
+    """Plies a search to max_depth looks ahead (before quiescence); depths 1 and 2 both search two."""
+    return 2 + max(0, 2 * (max_depth - 2))
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget of choose_move runs out."""
+
+
+@dataclass
+class SearchStats:
+    """
+    What the last choose_move call did. depth, score and pv are those of the deepest completed
+    iteration; the counters and timings cover the whole call. movegen_time, check_time and
+    eval_time are the seconds spent generating legal moves, testing for check and evaluating
+    (summed over the worker processes of a parallel search, so they can add up to more than time).
+    """
+    depth: int = 0
+    score: int | None = None
+    pv: list = field(default_factory=list)
+    nodes: int = 0
+    q_nodes: int = 0
+    beta_cutoffs: int = 0
+    first_move_cutoffs: int = 0
+    tt_probes: int = 0
+    tb_hits: int = 0
+    null_cutoffs: int = 0
+    reductions: int = 0
+    re_searches: int = 0
+    tt_hits: int = 0
+    time: float = 0.0
+    movegen_time: float = 0.0
+    check_time: float = 0.0
+    eval_time: float = 0.0
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.time if self.time else 0.0
+
+    @property
+    def cutoff_rate(self) -> float:
+        """Fraction of the (non-quiescence) nodes that ended in a beta cutoff."""
+        interior = self.nodes - self.q_nodes
+        return self.beta_cutoffs / interior if interior else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """Fraction of beta cutoffs that came from the first move tried."""
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def tt_hit_rate(self) -> float:
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def add(self, other: "SearchStats") -> None:
+        """Adds the counters and timings of another search, e.g. a worker's share of this one."""
+        for name in ("nodes", "q_nodes", "beta_cutoffs", "first_move_cutoffs", "tt_probes", "tt_hits", "tb_hits",
+                     "null_cutoffs", "reductions", "re_searches",
+                     "movegen_time", "check_time", "eval_time"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def summary(self) -> str:
+        return (f"depth {self.depth} score {self.score} nodes {self.nodes} (quiescence {self.q_nodes}) "
+                f"time {self.time:.2f}s nps {self.nps:.0f} cutoffs {self.cutoff_rate:.1%} "
+                f"first move {self.first_move_cutoff_rate:.1%} tt hits {self.tt_hits}/{self.tt_probes} "
+                f"tablebase hits {self.tb_hits} null cutoffs {self.null_cutoffs} reductions {self.reductions} "
+                f"re-searches {self.re_searches} "
+                f"movegen {self.movegen_time:.2f}s checks {self.check_time:.2f}s eval {self.eval_time:.2f}s "
+                f"pv {' '.join(move_name(action) for action in self.pv)}")
+
+
+# Each worker process of a parallel ChessAI keeps its own engine, so its transposition table,
+# killers and history carry over between the root moves it is given.
+_worker_ai = None
+_worker_search_id = None
+_worker_board = None
+
+
+def _init_worker(tt_size_mb, move_ordering, quiescence, tablebases, switches) -> None:
+    global _worker_ai
+    _worker_ai = ChessAI(1, tt_size_mb, move_ordering, quiescence, tablebases=tablebases, **switches)
+
+
+def _search_root_move(board_class, state, action, alpha, max_depth: int, deadline, search_id: int) -> tuple:
+    """Worker task: searches one root move of the board_class.unpack_state(state) position with
+    the window (alpha, inf) and returns (value, SearchStats of the task)."""
+    global _worker_search_id, _worker_board
+    ai = _worker_ai
+    if search_id != _worker_search_id:
+        _worker_search_id = search_id
+        _worker_board = board_class.unpack_state(state)  # every task of a search has the same root
+        ai.tt.new_search()
+        if ai.orderer is not None:
+            ai.orderer.new_search()
+    gameState = _worker_board
+    ai.stats = SearchStats()
+    probes, hits = ai.tt.probes, ai.tt.hits
+    value, _ = ai._search_root(gameState, max_depth, deadline, root_moves=[action], alpha=alpha)
+    ai.stats.tt_probes, ai.stats.tt_hits = ai.tt.probes - probes, ai.tt.hits - hits
+    ai.stats.pv = ai.principal_variation(gameState, search_plies(max_depth), first_move=action)
+    return value, ai.stats
+
 
 class ChessAI:
 
-    def __init__(self, max_depth):
+    def __init__(self, max_depth, tt_size_mb=16, move_ordering=True, quiescence=True, workers=1,
+                 progress=None, log_stats=False, book=None, tablebases=None, pvs=True, null_move=True, lmr=True):
         self.max_depth = max_depth
+        self.tt_size_mb = tt_size_mb
+        # kept across choose_move calls so later moves in a game reuse earlier searches
+        self.tt = TranspositionTable(tt_size_mb)
+        # with move_ordering off, only the hash move is tried first (for before/after comparisons)
+        self.orderer = MoveOrderer() if move_ordering else None
+        # extend the leaves with captures and promotions until the position is quiet
+        self.quiescence = quiescence
+        # principal variation search (null windows after the first move), null-move pruning and
+        # late move reductions; each can be turned off for before/after comparisons (bench_search.py ab)
+        self.pvs = pvs
+        self.null_move = null_move
+        self.lmr = lmr
+        # with more than one worker the root moves are searched in a pool of processes
+        # (started on first use, each with its own tt_size_mb table; see close)
+        self.workers = workers
+        self._pool = None
+        self._search_id = 0
+        # statistics of the last choose_move call; progress, if given, is called with them
+        # after every completed depth, and log_stats writes their summary to the debug log
+        self.stats = SearchStats()
+        self.progress = progress
+        self.log_stats = log_stats
+        # optional callable polled during the search; returning True aborts it like a timeout
+        self.stop = None
+        self._search_start = 0.0
+        self._tt_counts = (0, 0)
+        # opening book (an OpeningBook or the path of one) consulted before searching; book_rng
+        # picks among its moves, so seed it for repeatable games
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        self.book_rng = random.Random()
+        # endgame tablebases (a Tablebases or the directory of one) giving exact scores once few
+        # pieces are left; see tablebase.py
+        self.tablebases = Tablebases(tablebases) if isinstance(tablebases, str) else tablebases
 
-    def choose_move(self, gameState: Board) -> tuple:
-        """Returns the minimax action from the current gameState using self.depth
-        and self.evaluationFunction. Prunes states using alpha-beta pruning."""
-        def maxVal(gameState: Board, alpha: float, beta: float, depth: int) -> float:
-            if depth >= self.max_depth:
-                return self.state_eval(gameState)
-            
-            moves = gameState.get_all_legal_moves()
-            first_move = next(moves, None)
-
-            if first_move is None:
-                # Terminal node: checkmate or draw
-                return self.state_eval(gameState)
-
-            maxV = float("-inf")
-            for action in [first_move, *moves]:
-                # Get arguments for undoing the action later
-                undo_arguments = [*action]
-                pos = action[0]
-                was_first_move = not gameState.piece_map[pos].has_moved
-                undo_arguments.append(was_first_move)
-
-                if gameState.is_capture(action):
-                    capture_details = gameState.get_capture_details(action)
-                    undo_arguments += capture_details
-
-                # Make the move and evaluate it
-                gameState.move(action)
-                maxV = max(maxV, minVal(gameState, alpha, beta, depth))
+    def choose_move(self, gameState: Board, time_limit: float | None = None, max_depth: int | None = None,
+                    pondering=None) -> tuple:
+        """Returns the minimax action from the current gameState, found by a negamax alpha-beta
+        search (principal variation search, with null-move pruning and late move reductions unless
+        turned off). Positions are cached in self.tt; its probes/hits/hit_rate report how often that helped.
+
+        Without a time_limit this searches to max_depth (self.max_depth by default). With a
+        time_limit in seconds it deepens iteratively (depth 1, 2, 3, ... up to max_depth if given)
+        and returns the best move of the last iteration that finished in time (None if self.stop
+        ended the first one; without a time_limit a stop raises SearchTimeout).
+
+        pondering (a callable, used with a time_limit) searches on the opponent's time: while it
+        returns True the time_limit does not apply and the search keeps deepening. Once it returns
+        False (the opponent played the expected move) the time_limit applies, counted from the start
+        of the search, so the time spent pondering counts towards it.
+
+        With workers > 1 each search is split over the root moves; the chosen move is the
+        same one a single process picks at that depth, except with late move reductions on:
+        which moves are reduced follows each process's own move-ordering history, so the
+        workers may value a root move differently and settle on another move. self.stats describes the search afterwards.
 
-                # Return board to prev state by undoing the move
-                gameState.undo_move(*undo_arguments)
+        If the position is in self.book, a book move (picked at random by weight) is returned
+        at once instead, and likewise the best move of self.tablebases once the position is in
+        them; self.stats then has depth 0 and the move as its pv."""
+        if self.book is not None:
+            action = self.book.choose(gameState, self.book_rng)
+            if action is not None:
+                self.stats = SearchStats(pv=[action])
+                if self.log_stats:
+                    log_debug(f"ChessAI: book move {move_name(action)}")
+                return action
+        if self.tablebases is not None and len(gameState.piece_map) <= self.tablebases.max_pieces:
+            best = self.tablebases.best_move(gameState)
+            if best is not None:
+                action, result, plies = best
+                self.stats = SearchStats(score=tablebase_score(result, plies), pv=[action], tb_hits=1)
+                if self.log_stats:
+                    log_debug(f"ChessAI: tablebase move {move_name(action)} score {self.stats.score}")
+                return action
+        self._search_id += 1
+        self.tt.new_search()
+        if self.orderer is not None:
+            self.orderer.new_search()
+        self.stats = SearchStats()
+        self._search_start = time.perf_counter()
+        self._tt_counts = (self.tt.probes, self.tt.hits)
+        search = self._search_root if self.workers <= 1 else self._search_root_parallel
+        if time_limit is None:
+            depth = max_depth or self.max_depth
+            value, action = search(gameState, depth)
+            self._finish_iteration(gameState, depth, value)
+            self._finish_search()
+            return action
 
-                if maxV >= beta:
-                    return maxV
+        start = time.monotonic()
+        deadline = start + time_limit
+        best_action = None
+        stop = self.stop
+        if pondering is not None:
+            # the deadline is checked through stop, as it only applies once pondering ends
+            self.stop = lambda: ((stop is not None and stop())
+                                 or (best_action is not None and not pondering() and time.monotonic() > deadline))
+        depth = 1
+        try:
+            while max_depth is None or depth <= max_depth:
+                try:
+                    # the first iteration always finishes so there is a move to return
+                    value, action = search(gameState, depth, deadline if best_action and pondering is None else None,
+                                           first_move=best_action)
+                except SearchTimeout:
+                    break
+                best_action = action
+                self._finish_iteration(gameState, depth, value)
+                elapsed = time.monotonic() - start
+                # stop on a forced mate, or when the next, deeper iteration would not finish anyway
+                if action is None or abs(value) >= MATE_SCORE - MAX_PLY or (
+                        elapsed > time_limit / 2 and (pondering is None or not pondering())):
+                    break
+                # max_depth 1 and 2 both search two plies
+                depth = 3 if depth == 1 else depth + 1
+        finally:
+            self.stop = stop
+        self._finish_search()
+        return best_action
 
-                alpha = max(alpha, maxV)
+    def _update_stats(self) -> None:
+        stats = self.stats
+        stats.time = time.perf_counter() - self._search_start
+        probes, hits = self._tt_counts
+        stats.tt_probes += self.tt.probes - probes
+        stats.tt_hits += self.tt.hits - hits
+        self._tt_counts = (self.tt.probes, self.tt.hits)
 
-            return maxV
+    def _finish_iteration(self, gameState: Board, depth: int, value) -> None:
+        self._update_stats()
+        self.stats.depth, self.stats.score = depth, value
+        if self.workers <= 1:  # the parallel search takes the PV from the worker that found the move
+            self.stats.pv = self.principal_variation(gameState, search_plies(depth))
+        self._tt_counts = (self.tt.probes, self.tt.hits)  # the PV lookups are not part of the search
+        if self.progress is not None:
+            self.progress(self.stats)
 
-        def minVal(gameState: Board, alpha: float, beta: float, depth: int) -> float:
-            moves = gameState.get_all_legal_moves()
-            first_move = next(moves, None)
+    def _finish_search(self) -> None:
+        self._update_stats()
+        if self.log_stats:
+            log_debug(f"ChessAI: {self.stats.summary()}")
 
-            if first_move is None:
-                # Terminal node: checkmate or draw
-                return self.state_eval(gameState)
+    def principal_variation(self, gameState: Board, plies: int, first_move: tuple | None = None) -> list:
+        """Returns the expected line of play from gameState (starting with first_move, if given),
+        following the best moves stored in the transposition table for up to plies moves."""
+        pv = []
+        seen = set()
+        for _ in range(plies):
+            if first_move is not None and not pv:
+                action = first_move
+            else:
+                entry = self.tt.probe(gameState.hash)
+                if entry is None or entry[3] is None or gameState.hash in seen:
+                    break
+                action = entry[3]
+            seen.add(gameState.hash)
+            position, target, promo = action
+            if (target, promo) not in gameState.legal_moves.get(position, ()):
+                break  # a colliding entry from another position
+            gameState.move(action)
+            pv.append(action)
+        for _ in pv:
+            gameState.unmake()
+        return pv
+
+    def close(self) -> None:
+        """Shuts down the worker processes of a parallel ChessAI, if any were started."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _order_moves(self, gameState: Board, moves: list, hash_move, ply: int) -> list:
+        if self.orderer is not None:
+            return self.orderer.order(gameState, moves, hash_move, ply)
+        if hash_move is not None and hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+        return moves
+
+    def _root_moves(self, gameState: Board, first_move: tuple | None = None) -> list:
+        """Returns the root moves in the order the search tries them."""
+        entry = self.tt.probe(gameState.hash)
+        hash_move = entry[3] if entry is not None else None
+        return self._order_moves(gameState, list(gameState.get_all_legal_moves()), first_move or hash_move, 0)
+
+    def _search_root_parallel(self, gameState: Board, max_depth: int, deadline: float | None = None,
+                              first_move: tuple | None = None) -> tuple[float, tuple]:
+        """_search_root with the root moves shared out to the worker processes.
+
+        The first move is searched here for a first bound, then up to self.workers of the other
+        moves are searched at a time, each against the best value known when it is sent off.
+        That value comes from moves earlier in root order, which a tie does not displace, so
+        taking the first move with the highest value makes the serial choice (but see
+        choose_move about late move reductions)."""
+        moves = self._root_moves(gameState, first_move)
+        value, action = self._search_root(gameState, max_depth, deadline, root_moves=moves[:1])
+        self.stats.pv = self.principal_variation(gameState, search_plies(max_depth), first_move=action)
+        if len(moves) <= 1:
+            return value, action
+        state = gameState.pack_state()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self.tt_size_mb, self.orderer is not None, self.quiescence,
+                                                       self.tablebases and self.tablebases.directory,
+                                                       dict(pvs=self.pvs, null_move=self.null_move, lmr=self.lmr)))
+
+        values = [value] + [None] * (len(moves) - 1)
+        pvs = [self.stats.pv] + [None] * (len(moves) - 1)
+        best = value
+        pending = {}
+        next_index = 1
+        try:
+            while next_index < len(moves) or pending:
+                while next_index < len(moves) and len(pending) < self.workers:
+                    future = self._pool.submit(_search_root_move, type(gameState), state, moves[next_index],
+                                               best, max_depth, deadline, self._search_id)
+                    pending[future] = next_index
+                    next_index += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    values[index], worker_stats = future.result()
+                    pvs[index] = worker_stats.pv
+                    best = max(best, values[index])
+                    self.stats.add(worker_stats)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+        for index in range(1, len(moves)):
+            if values[index] > value:
+                value, action, self.stats.pv = values[index], moves[index], pvs[index]
+        self.tt.store(gameState.hash, search_plies(max_depth), value, EXACT, action)
+        return value, action
+
+    def _search_root(self, gameState: Board, max_depth: int, deadline: float | None = None,
+                     first_move: tuple | None = None, root_moves: list | None = None,
+                     alpha: float = float("-inf")) -> tuple[float, tuple]:
+        """Runs one alpha-beta search to max_depth and returns (value, best action). first_move
+        (e.g. the previous iteration's best move) is searched first. Raises SearchTimeout if
+        the deadline passes, after taking back any moves made on gameState.
+
+        root_moves limits the search to those moves, in that order, and alpha starts the root
+        window above -inf; values at or below alpha are then only upper bounds."""
+        tt = self.tt
+        orderer = self.orderer
+        stats = self.stats
+        stop = self.stop
+        clock = time.perf_counter
+        undo_depth = len(gameState.undo_stack)
+        tablebases = self.tablebases
+        tablebase_pieces = tablebases.max_pieces if tablebases is not None else 0
+        pvs, null_move, lmr = self.pvs, self.null_move, self.lmr
+
+        def check_time():
+            stats.nodes += 1
+            if stats.nodes % TIME_CHECK_INTERVAL == 0 and (
+                    (deadline is not None and time.monotonic() > deadline) or (stop is not None and stop())):
+                raise SearchTimeout()
+
+        # timed wrappers for the three main costs besides making and unmaking moves
+        def legal_moves(gameState: Board) -> list:
+            start = clock()
+            moves = list(gameState.get_all_legal_moves())
+            stats.movegen_time += clock() - start
+            return moves
+
+        def in_check(gameState: Board) -> bool:
+            start = clock()
+            result = gameState.in_check("white" if gameState.ply % 2 == 0 else "black")
+            stats.check_time += clock() - start
+            return result
+
+        def evaluate(gameState: Board) -> int:
+            start = clock()
+            value = self.state_eval(gameState)
+            stats.eval_time += clock() - start
+            return value
+
+        # Scores here, as in the table, are for the side to move (negamax); the root flips them back.
+        def probe(gameState: Board, draft: int, alpha: float, beta: float):
+            """Returns (score, hash_move). score is None unless the stored entry settles the node."""
+            entry = tt.probe(gameState.hash)
+            if entry is None:
+                return None, None
+            depth, score, bound, hash_move = entry
+            score = score_from_tt(score, len(gameState.undo_stack) - undo_depth)
+            if depth >= draft and (bound == EXACT
+                                   or (bound == LOWER and score >= beta)
+                                   or (bound == UPPER and score <= alpha)):
+                return score, hash_move
+            return None, hash_move
 
-            minV = float("inf")
-            for action in [first_move, *moves]:
-                # Get arguments for undoing the action later
-                undo_arguments = [*action]
-                pos = action[0]
-                was_first_move = not gameState.piece_map[pos].has_moved
-                undo_arguments.append(was_first_move)
+        def store(gameState: Board, draft: int, value: float, alpha: float, beta: float, best_action):
+            if value <= alpha:
+                bound = UPPER
+            elif value >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            ply = len(gameState.undo_stack) - undo_depth
+            tt.store(gameState.hash, draft, score_to_tt(value, ply), bound, best_action)
+
+        def probe_tablebases(gameState: Board):
+            """Returns the exact score for the side to move if the position is in the tablebases."""
+            if len(gameState.piece_map) > tablebase_pieces:
+                return None
+            result = tablebases.probe(gameState)
+            if result is None:
+                return None
+            stats.tb_hits += 1
+            return tablebase_score(*result, len(gameState.undo_stack) - undo_depth)
+
+        def ordered_moves(gameState: Board, hash_move) -> list:
+            return self._order_moves(gameState, legal_moves(gameState), hash_move,
+                                     len(gameState.undo_stack) - undo_depth)
+
+        def record_cutoff(gameState: Board, action, index: int, draft: int):
+            stats.beta_cutoffs += 1
+            if index == 0:
+                stats.first_move_cutoffs += 1
+            if orderer is not None:
+                orderer.record_cutoff(gameState, action, len(gameState.undo_stack) - undo_depth, draft)
 
-                if gameState.is_capture(action):
-                    capture_details = gameState.get_capture_details(action)
-                    undo_arguments += capture_details
+        def quiesce(gameState: Board, alpha: float, beta: float, qply: int = 0) -> float:
+            """Negamax search of captures and promotions (all moves when in check) from the side
+            to move's point of view. Standing pat on the static eval stops the search otherwise."""
+            check_time()
+            stats.q_nodes += 1
+            if in_check(gameState):
+                moves = legal_moves(gameState)
+                if not moves:
+                    return -MATE_SCORE + len(gameState.undo_stack) - undo_depth
+                best = float("-inf")
+            else:
+                best = evaluate(gameState)
+                if best >= beta or qply >= MAX_QUIESCENCE_PLY:
+                    return best
+                alpha = max(alpha, best)
+                moves = [action for action in legal_moves(gameState)
+                         if action[2] is not None or gameState.is_capture(action)]
+            if orderer is not None:
+                moves = orderer.order(gameState, moves, ply=MAX_PLY)
 
-                # Make the move and evaluate it
+            for action in moves:
                 gameState.move(action)
-                minV = min(minV, maxVal(gameState, alpha, beta, depth + 1))
+                value = -quiesce(gameState, -beta, -alpha, qply + 1)
+                gameState.unmake()
+
+                if value > best:
+                    best = value
+                    if best >= beta:
+                        return best
+                    alpha = max(alpha, best)
+            return best
 
-                # Return board to prev state by undoing the move
-                gameState.undo_move(*undo_arguments)
+        def negamax(gameState: Board, alpha: float, beta: float, draft: int, null_ok: bool = True) -> float:
+            """Searches draft plies ahead (then quiescence) and returns the score for the side to move."""
+            check_time()
+            score = probe_tablebases(gameState)
+            if score is not None:
+                return score
+            if draft <= 0:
+                if self.quiescence:
+                    return quiesce(gameState, alpha, beta)
+                return evaluate(gameState)
 
-                if minV <= alpha:
-                    return minV
+            score, hash_move = probe(gameState, draft, alpha, beta)
+            if score is not None:
+                return score
+            checked = in_check(gameState)
 
-                beta = min(beta, minV)
+            # Null move: if passing the turn still fails high at reduced depth, a real move would
+            # too. Not in check (the king would be left en prise), not twice in a row, and not
+            # without pieces, where zugzwang makes passing better than any move.
+            if (null_move and null_ok and not checked and draft > NULL_MOVE_REDUCTION
+                    and beta < WIN_BOUND and gameState.has_non_pawn_material(gameState.ply % 2)
+                    and evaluate(gameState) >= beta):
+                gameState.make_null_move()
+                value = -negamax(gameState, -beta, -beta + 1, draft - 1 - NULL_MOVE_REDUCTION, null_ok=False)
+                gameState.unmake()
+                if value >= beta:
+                    stats.null_cutoffs += 1
+                    value = min(value, WIN_BOUND)  # no unproven mate scores
+                    store(gameState, draft, value, alpha, beta, None)
+                    return value
+
+            moves = ordered_moves(gameState, hash_move)
+            if not moves:
+                # checkmate (scored by its distance from the root) or stalemate
+                return -MATE_SCORE + len(gameState.undo_stack) - undo_depth if checked else 0
+
+            alpha_orig = alpha
+            best = float("-inf")
+            best_action = None
+            for index, action in enumerate(moves):
+                quiet = action[2] is None and not gameState.is_capture(action)
+                gameState.move(action)
+                if index == 0:
+                    value = -negamax(gameState, -beta, -alpha, draft - 1)
+                else:
+                    # Late quiet moves are searched shallower; one that beats alpha gets a full-depth search.
+                    reduction = 0
+                    if (lmr and quiet and index >= LMR_MIN_INDEX and draft >= LMR_MIN_DRAFT
+                            and not checked and not in_check(gameState)):
+                        reduction = min(1 if index < LMR_DEEP_INDEX else 2, draft - 2)
+                        stats.reductions += 1
+                    # PVS: after the first move, prove with a null window that the rest are no better
+                    window = alpha + 1 if pvs else beta
+                    value = -negamax(gameState, -window, -alpha, draft - 1 - reduction)
+                    if reduction and value > alpha:
+                        stats.re_searches += 1
+                        value = -negamax(gameState, -window, -alpha, draft - 1)
+                    if window < beta and alpha < value < beta:
+                        stats.re_searches += 1
+                        value = -negamax(gameState, -beta, -alpha, draft - 1)
+                gameState.unmake()
+
+                if value > best:
+                    best, best_action = value, action
+                if best >= beta:
+                    record_cutoff(gameState, action, index, draft)
+                    break
+                alpha = max(alpha, best)
+
+            store(gameState, draft, best, alpha_orig, beta, best_action)
+            return best
 
-            return minV
-        
         bestVal = float("-inf")
         bestAct = None
-        alpha, beta = float("-inf"), float("inf")
-        for move in gameState.get_all_legal_moves():
-            undo_arguments = [*move]
-            pos = move[0]
-            was_first_move = not gameState.piece_map[pos].has_moved
-            undo_arguments.append(was_first_move)
-
-            if gameState.is_capture(move):
-                capture_details = gameState.get_capture_details(move)
-                undo_arguments += capture_details
-
-            gameState.move(move)
-            val = minVal(gameState, alpha, beta, depth=1)
-            gameState.undo_move(*undo_arguments)
-
-            if val >= bestVal:
-                bestVal = val
-                bestAct = move
-            alpha = max(alpha, bestVal)
-        return bestAct
-
-    def state_eval(self, gameState: Board) -> float:
-        """Evaluates the current state based on a heuristic"""
-        curr_color = "white" if gameState.ply % 2 == 0 else "black"
-        opp_color =  "black" if gameState.ply % 2 == 0 else "white"
-        if gameState.in_checkmate(curr_color):
-            return float("-inf")
-        if gameState.is_draw():
-            return 0
-        
-        material = 0
-        for piece in gameState.piece_map.values():
-            if piece.color == curr_color:
-                material += piece.value
-            else:
-                material -= piece.value
+        full_window = root_moves is None and alpha == float("-inf")
+        beta = float("inf")
+        root_draft = search_plies(max_depth)
+        if root_moves is None:
+            root_moves = self._root_moves(gameState, first_move)
+        stats.nodes += 1
+        try:
+            for index, move in enumerate(root_moves):
+                gameState.move(move)
+                if index == 0 or not pvs or alpha == float("-inf"):
+                    val = -negamax(gameState, -beta, -alpha, root_draft - 1)
+                else:
+                    val = -negamax(gameState, -alpha - 1, -alpha, root_draft - 1)
+                    if val > alpha:
+                        stats.re_searches += 1
+                        val = -negamax(gameState, -beta, -alpha, root_draft - 1)
+                gameState.unmake()
+
+                if val > bestVal:
+                    bestVal = val
+                    bestAct = move
+                alpha = max(alpha, bestVal)
+        except SearchTimeout:
+            while len(gameState.undo_stack) > undo_depth:
+                gameState.unmake()
+            raise
 
-        check = 0
-        if gameState.in_check(curr_color):
-            check = -1
-        elif gameState.in_check(opp_color):
-            check += 1
+        if bestAct is not None and full_window:
+            tt.store(gameState.hash, root_draft, bestVal, EXACT, bestAct)
+        return bestVal, bestAct
 
-        return 3 * material + check
\ No newline at end of file
+    def state_eval(self, gameState: Board) -> int:
+        """Evaluates the current state for the side to move, in centipawns. This reads the
+        material and piece-square score that move/unmake keep up to date, so it costs the same
+        at every leaf; checkmate and stalemate are scored by the search where no move is left."""
+        if (gameState.position_history.get(gameState.hash, 0) >= 3 or gameState.time_since_capture >= 100
+                or gameState.has_insufficient_material()):
+            return 0
+        return gameState.evaluate()
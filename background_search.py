@@ -0,0 +1,171 @@
+import multiprocessing
+import queue
+import time
+from ai import ChessAI, SearchStats, SearchTimeout
+from board import Board
+
+
+def _serve(requests, results, cancelled, pondering, max_depth: int, ai_options: dict) -> None:
+    """Worker process: runs one ChessAI for every request, so its transposition table
+    carries over from move to move (pondered or not), until it receives None."""
+    ai = ChessAI(max_depth, **ai_options)
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        search_id, board_class, state, time_limit, ponder = request
+        board = board_class.unpack_state(state)
+        # stop as soon as the parent cancels this search (or a later one)
+        ai.stop = lambda: cancelled.value >= search_id
+        try:
+            move = ai.choose_move(board, time_limit=time_limit,
+                                  pondering=(lambda: pondering.value == search_id) if ponder else None)
+        except SearchTimeout:
+            move = None
+        results.put((search_id, move, ai.stats))
+
+
+class BackgroundSearch:
+    """
+    Runs ChessAI.choose_move in a separate process, on a copy of the board, so the caller
+    (the GUI event loop) never blocks: start() sends off a search, poll() returns the move once
+    it is ready, and cancel() abandons it. The process is started on the first search and
+    kept for the next ones; close() ends it.
+
+    After playing a move, ponder() searches the position after the opponent's expected reply
+    while the opponent thinks. If that reply is played, the next start() picks up the running
+    search (a ponder hit) instead of starting over; otherwise it is cancelled, though the
+    worker's transposition table keeps what it found.
+    """
+    def __init__(self, max_depth: int, **ai_options) -> None:
+        self.max_depth = max_depth
+        self.ai_options = ai_options
+        # spawn rather than fork, so the worker does not inherit the GUI's display connection
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._requests = None
+        self._results = None
+        self._cancelled = None
+        self._pondering = None  # id of the search pondering on the opponent's time, or 0
+        self._search_id = 0
+        self._pending = None  # id of the search whose result poll() is waiting for
+        self._result = None  # (move, stats) of the pending search once it finished
+        self._ponder_key = None  # hash of the position being pondered until the opponent moves
+        self.started_at = 0.0
+        self.stats = SearchStats()  # of the last finished search
+
+    def _start_process(self) -> None:
+        self._requests = self._context.Queue()
+        self._results = self._context.Queue()
+        self._cancelled = self._context.Value("i", 0)
+        self._pondering = self._context.Value("i", 0)
+        self._process = self._context.Process(
+            target=_serve, args=(self._requests, self._results, self._cancelled, self._pondering,
+                                 self.max_depth, self.ai_options),
+            daemon=True)
+        self._process.start()
+
+    @property
+    def thinking(self) -> bool:
+        """True while a search for the side to move runs (not while pondering)."""
+        return self._pending is not None and self._ponder_key is None
+
+    @property
+    def pondering(self) -> bool:
+        return self._pending is not None and self._ponder_key is not None
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the current search started."""
+        return time.monotonic() - self.started_at if self.thinking else 0.0
+
+    def start(self, board: Board, time_limit: float | None = None) -> None:
+        """Starts searching a snapshot of board; later changes to board do not affect it.
+        If board is the position being pondered, that search carries on instead (under the
+        time_limit given to ponder); any other search still running is cancelled first."""
+        self.started_at = time.monotonic()
+        if self.pondering and board.hash == self._ponder_key:
+            self._ponder_key = None
+            with self._pondering.get_lock():
+                self._pondering.value = 0
+            return
+        self._send(board, time_limit, ponder=False)
+
+    def ponder(self, board: Board, time_limit: float) -> bool:
+        """Starts pondering after the move of the last search has been played on board: searches
+        the position after the reply that search expected, the second move of its principal
+        variation. Returns False, and does not ponder, if there is no such reply."""
+        pv = self.stats.pv
+        if len(pv) < 2 or self.thinking:
+            return False
+        reply = pv[1]
+        position, target, promo = reply
+        if (target, promo) not in board.legal_moves.get(position, ()):
+            return False  # pv[0] was not the move played
+        board.move(reply)
+        try:
+            self._send(board, time_limit, ponder=True)
+            self._ponder_key = board.hash
+        finally:
+            board.unmake()
+        return True
+
+    def _send(self, board: Board, time_limit: float | None, ponder: bool) -> None:
+        if self._process is None:
+            self._start_process()
+        self.cancel()
+        self._search_id += 1
+        self._pending = self._search_id
+        if ponder:
+            with self._pondering.get_lock():
+                self._pondering.value = self._search_id
+        # packed here, as the queue would only serialize the board later in a background thread
+        self._requests.put((self._search_id, type(board), board.pack_state(), time_limit, ponder))
+
+    def poll(self):
+        """Returns the move of the current search if it has finished, else None. The result of
+        a pondering search is held back until start() finds a ponder hit."""
+        while self._pending is not None and self._result is None:
+            try:
+                search_id, move, stats = self._results.get_nowait()
+            except queue.Empty:
+                return None
+            if search_id == self._pending:  # results of cancelled searches are dropped
+                self._result = move, stats
+        if self._result is None or self._ponder_key is not None:
+            return None
+        (move, self.stats), self._result = self._result, None
+        self._pending = None
+        return move
+
+    def wait(self, timeout: float | None = None):
+        """Blocks until the current search finishes (or timeout seconds pass) and returns its move."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while self._pending is not None:
+            move = self.poll()
+            if move is not None or self._pending is None:
+                return move
+            if end is not None and time.monotonic() > end:
+                return None
+            time.sleep(0.01)
+        return None
+
+    def cancel(self) -> None:
+        """Abandons the current search, if any; the worker stops it at its next clock check."""
+        if self._pending is not None:
+            with self._cancelled.get_lock():
+                self._cancelled.value = self._pending
+            self._pending = None
+        self._result = None
+        self._ponder_key = None
+
+    def close(self) -> None:
+        """Cancels any search and ends the worker process."""
+        if self._process is None:
+            return
+        self.cancel()
+        self._requests.put(None)
+        self._process.join(timeout=2)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
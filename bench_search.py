@@ -0,0 +1,101 @@
+"""
+Search benchmarks for ChessAI.
+
+    python bench_search.py speedup [--depth 3] [--max-workers N]
+    python bench_search.py ab [--depth 3]
+
+speedup times a fixed-depth search of a few opening and middlegame positions with
+1, 2, ..., N worker processes (N defaults to the number of cores) and prints the speedup
+over a single process, checking that every worker count chooses the same moves.
+
+ab searches the same positions to a fixed depth with the search techniques switched on and
+off (all on, each one off in turn, all off) and prints the nodes and time each setting needed
+to reach that depth, and how many of its moves agree with the all-on setting.
+"""
+import argparse
+import os
+import time
+from ai import ChessAI, search_plies
+from bitboard import BitBoard
+
+# positions as move lists from the start, in from-square/to-square notation
+POSITIONS = {
+    "italian": "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5 c2c3 g8f6",
+    "queens gambit": "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5 f8e7",
+    "sicilian": "e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6 b1c3 a7a6",
+    "open center": "e2e4 e7e5 d2d4 e5d4 d1d4 b8c6 d4e3 g8f6 b1c3 f8b4 c1d2 e8g8",
+}
+
+
+def position(moves: str) -> BitBoard:
+    board = BitBoard()
+    board.initial_setup()
+    for move in moves.split():
+        board.move((board.algebraic_to_index(move[:2]), board.algebraic_to_index(move[2:4]), None))
+    return board
+
+
+# switch settings for ab, as ChessAI keyword arguments
+SWITCHES = ("pvs", "null_move", "lmr")
+SETTINGS = {"all on": {}}
+SETTINGS.update((f"no {switch}", {switch: False}) for switch in SWITCHES)
+SETTINGS["all off"] = dict.fromkeys(SWITCHES, False)
+
+
+def run_searches(workers: int, depth: int, **switches) -> tuple[float, int, list]:
+    """Searches every position with a fresh engine; returns (seconds, nodes, moves)."""
+    ai = ChessAI(depth, workers=workers, **switches)
+    elapsed, nodes, moves = 0.0, 0, []
+    try:
+        for line in POSITIONS.values():
+            board = position(line)
+            start = time.perf_counter()
+            moves.append(ai.choose_move(board))
+            elapsed += time.perf_counter() - start
+            nodes += ai.stats.nodes
+            ai.tt.clear()
+    finally:
+        ai.close()
+    return elapsed, nodes, moves
+
+
+def speedup(depth: int, max_workers: int) -> None:
+    print(f"depth {depth}, {len(POSITIONS)} positions, {os.cpu_count()} cores")
+    print(f"{'workers':>7} {'seconds':>8} {'nodes':>9} {'speedup':>8}  same moves")
+    base_time, base_moves = None, None
+    for workers in range(1, max_workers + 1):
+        elapsed, nodes, moves = run_searches(workers, depth)
+        if base_time is None:
+            base_time, base_moves = elapsed, moves
+        print(f"{workers:>7} {elapsed:>8.2f} {nodes:>9} {base_time / elapsed:>7.2f}x  {moves == base_moves}")
+
+
+def ab(depth: int) -> None:
+    print(f"depth {depth} ({search_plies(depth)} plies), {len(POSITIONS)} positions")
+    print(f"{'setting':<14} {'seconds':>8} {'nodes':>9} {'nodes %':>8}  same moves")
+    base_nodes, base_moves = None, None
+    for name, switches in SETTINGS.items():
+        elapsed, nodes, moves = run_searches(1, depth, **switches)
+        if base_nodes is None:
+            base_nodes, base_moves = nodes, moves
+        same = sum(move == base_move for move, base_move in zip(moves, base_moves))
+        print(f"{name:<14} {elapsed:>8.2f} {nodes:>9} {nodes / base_nodes:>8.0%}  {same}/{len(moves)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    speedup_parser = commands.add_parser("speedup", help="parallel root search speedup curve")
+    speedup_parser.add_argument("--depth", type=int, default=3)
+    speedup_parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    ab_parser = commands.add_parser("ab", help="nodes to reach a depth with each search technique on and off")
+    ab_parser.add_argument("--depth", type=int, default=3)
+    args = parser.parse_args()
+    if args.command == "speedup":
+        speedup(args.depth, max(1, args.max_workers))
+    elif args.command == "ab":
+        ab(args.depth)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+from board import Board
+from pieces import Piece, Rook, Bishop, Queen, Knight, King, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from zobrist import WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE
+from collections.abc import Generator
+
+# Squares are indexed sq = row * 8 + col, so sq 0 is a8 and sq 63 is h1 (same orientation as piece_map).
+# bitboards are indexed [Piece.color_index][Piece.type_code]
+WHITE, BLACK = 0, 1
+COLOR_INDEX = {"white": WHITE, "black": BLACK}
+CASTLING_FLAGS = [(WHITE_KINGSIDE, WHITE_QUEENSIDE), (BLACK_KINGSIDE, BLACK_QUEENSIDE)]  # [color]
+PROMOTION_PIECES = [Queen, Knight, Rook, Bishop]
+
+SQUARE_POS = [(sq // 8, sq % 8) for sq in range(64)]
+SQUARE_BB = [1 << sq for sq in range(64)]
+
+
+def _step_table(offsets):
+    """Builds a table of attacked squares for pieces that move a fixed offset (knights, kings)."""
+    table = []
+    for row, col in SQUARE_POS:
+        bb = 0
+        for dr, dc in offsets:
+            if Piece.in_bounds((row + dr, col + dc)):
+                bb |= 1 << ((row + dr) * 8 + col + dc)
+        table.append(bb)
+    return table
+
+
+def _ray_table(dr, dc):
+    """Builds a table of every square reachable from each square in a single direction on an empty board."""
+    table = []
+    for row, col in SQUARE_POS:
+        bb = 0
+        r, c = row + dr, col + dc
+        while Piece.in_bounds((r, c)):
+            bb |= 1 << (r * 8 + c)
+            r += dr
+            c += dc
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table(Knight.directions)
+KING_ATTACKS = _step_table(King.directions)
+# PAWN_ATTACKS[color][sq] are the squares a pawn of that color on sq attacks
+PAWN_ATTACKS = [_step_table([(-1, -1), (-1, 1)]), _step_table([(1, -1), (1, 1)])]
+
+# Rays that move towards higher square indices find their first blocker with the lowest set bit,
+# rays towards lower indices with the highest set bit.
+ROOK_RAYS_UP = [_ray_table(1, 0), _ray_table(0, 1)]
+ROOK_RAYS_DOWN = [_ray_table(-1, 0), _ray_table(0, -1)]
+BISHOP_RAYS_UP = [_ray_table(1, 1), _ray_table(1, -1)]
+BISHOP_RAYS_DOWN = [_ray_table(-1, 1), _ray_table(-1, -1)]
+
+# BETWEEN[a][b] holds the squares strictly between a and b when they share a line, else 0
+BETWEEN = [[0] * 64 for _ in range(64)]
+for _rays in ROOK_RAYS_UP + ROOK_RAYS_DOWN + BISHOP_RAYS_UP + BISHOP_RAYS_DOWN:
+    for _sq in range(64):
+        _bb = _rays[_sq]
+        while _bb:
+            _bit = _bb & -_bb
+            _bb ^= _bit
+            _target = _bit.bit_length() - 1
+            BETWEEN[_sq][_target] = _rays[_sq] ^ _rays[_target] ^ _bit
+
+# Every square a rook or bishop on sq would see on an empty board
+ROOK_LINES = [0] * 64
+BISHOP_LINES = [0] * 64
+for _sq in range(64):
+    for _rays in ROOK_RAYS_UP + ROOK_RAYS_DOWN:
+        ROOK_LINES[_sq] |= _rays[_sq]
+    for _rays in BISHOP_RAYS_UP + BISHOP_RAYS_DOWN:
+        BISHOP_LINES[_sq] |= _rays[_sq]
+
+
+def _make_slider(rays_up, rays_down):
+    """Returns an attack function for one slider type. The four rays are unrolled because this is
+    the hottest function in move generation."""
+    up_a, up_b = rays_up
+    down_a, down_b = rays_down
+
+    def attacks(sq: int, occupied: int) -> int:
+        ray = up_a[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= up_a[(blockers & -blockers).bit_length() - 1]
+        result = ray
+        ray = up_b[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= up_b[(blockers & -blockers).bit_length() - 1]
+        result |= ray
+        ray = down_a[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= down_a[blockers.bit_length() - 1]
+        result |= ray
+        ray = down_b[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= down_b[blockers.bit_length() - 1]
+        return result | ray
+
+    return attacks
+
+
+rook_attacks = _make_slider(ROOK_RAYS_UP, ROOK_RAYS_DOWN)
+bishop_attacks = _make_slider(BISHOP_RAYS_UP, BISHOP_RAYS_DOWN)
+
+
+class BitBoard(Board):
+    """
+    Board backend that mirrors piece_map into one 64-bit integer per piece type and color and
+    generates moves and check tests from precomputed attack tables instead of walking the dict.
+    piece_map is still kept up to date, so everything that reads it (the GUI, ChessAI, position keys)
+    works unchanged. Call sync_bitboards() after editing piece_map by hand.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.bitboards = [[0] * 6, [0] * 6]  # [color][piece type]
+        self.occupancy = [0, 0]  # [color]
+
+    def sync_bitboards(self) -> None:
+        """Rebuilds the bitboards from piece_map."""
+        self.bitboards = [[0] * 6, [0] * 6]
+        self.occupancy = [0, 0]
+        for (row, col), piece in self.piece_map.items():
+            bit = SQUARE_BB[row * 8 + col]
+            self.bitboards[piece.color_index][piece.type_code] |= bit
+            self.occupancy[piece.color_index] |= bit
+
+    def _put_piece(self, pos: tuple[int, int], piece: Piece) -> None:
+        super()._put_piece(pos, piece)
+        bit = SQUARE_BB[pos[0] * 8 + pos[1]]
+        self.bitboards[piece.color_index][piece.type_code] |= bit
+        self.occupancy[piece.color_index] |= bit
+
+    def _remove_piece(self, pos: tuple[int, int]) -> Piece:
+        piece = super()._remove_piece(pos)
+        mask = ~SQUARE_BB[pos[0] * 8 + pos[1]]
+        self.bitboards[piece.color_index][piece.type_code] &= mask
+        self.occupancy[piece.color_index] &= mask
+        return piece
+
+    def attackers(self, sq: int, by_color: int, occupied: int) -> int:
+        """Returns the bitboard of pieces of by_color that attack sq given the occupancy."""
+        enemy = self.bitboards[by_color]
+        return ((KNIGHT_ATTACKS[sq] & enemy[KNIGHT])
+                | (PAWN_ATTACKS[by_color ^ 1][sq] & enemy[PAWN])
+                | (KING_ATTACKS[sq] & enemy[KING])
+                | (bishop_attacks(sq, occupied) & (enemy[BISHOP] | enemy[QUEEN]))
+                | (rook_attacks(sq, occupied) & (enemy[ROOK] | enemy[QUEEN])))
+
+    def pinned(self, color: int, occupied: int) -> int:
+        """Returns the bitboard of color's pieces that are pinned to their king."""
+        enemy = self.bitboards[color ^ 1]
+        own_occ = self.occupancy[color]
+        king_sq = self.bitboards[color][KING].bit_length() - 1
+        snipers = ((ROOK_LINES[king_sq] & (enemy[ROOK] | enemy[QUEEN]))
+                   | (BISHOP_LINES[king_sq] & (enemy[BISHOP] | enemy[QUEEN])))
+        pinned = 0
+        between_king = BETWEEN[king_sq]
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            blockers = between_king[bit.bit_length() - 1] & occupied
+            # exactly one blocker, and it is ours
+            if blockers and not blockers & (blockers - 1) and blockers & own_occ:
+                pinned |= blockers
+        return pinned
+
+    def square_attacked(self, sq: int, by_color: int, occupied: int, exclude: int = 0) -> bool:
+        """Returns True if a piece of by_color attacks sq given the occupancy. Pieces of by_color on the
+        squares in exclude are ignored (they are being captured by the move under test)."""
+        enemy = self.bitboards[by_color]
+        keep = ~exclude
+        if KNIGHT_ATTACKS[sq] & enemy[KNIGHT] & keep:
+            return True
+        if PAWN_ATTACKS[by_color ^ 1][sq] & enemy[PAWN] & keep:
+            return True
+        if KING_ATTACKS[sq] & enemy[KING]:
+            return True
+        diagonal = (enemy[BISHOP] | enemy[QUEEN]) & keep
+        if diagonal and bishop_attacks(sq, occupied) & diagonal:
+            return True
+        straight = (enemy[ROOK] | enemy[QUEEN]) & keep
+        if straight and rook_attacks(sq, occupied) & straight:
+            return True
+        return False
+
+    def in_check(self, color: str) -> bool:
+        """Returns True if the king of the given color is in check."""
+        us = COLOR_INDEX[color]
+        king_sq = self.bitboards[us][KING].bit_length() - 1
+        return self.square_attacked(king_sq, us ^ 1, self.occupancy[WHITE] | self.occupancy[BLACK])
+
+    def has_non_pawn_material(self, color_index: int) -> bool:
+        """Returns True if the side (0 white, 1 black) has a piece other than its king and pawns."""
+        own = self.bitboards[color_index]
+        return bool(self.occupancy[color_index] & ~(own[PAWN] | own[KING]))
+
+    def en_passant_square(self) -> int | None:
+        """Returns the square a pawn could capture onto en passant this ply, if any."""
+        return None if self.en_passant is None else self.en_passant[0] * 8 + self.en_passant[1]
+
+    def _generate_legal_moves(self) -> Generator:
+        us = self.ply % 2
+        them = us ^ 1
+        own = self.bitboards[us]
+        own_occ = self.occupancy[us]
+        enemy_occ = self.occupancy[them]
+        occupied = own_occ | enemy_occ
+        king_sq = own[KING].bit_length() - 1
+        checkers = self.attackers(king_sq, them, occupied)
+        in_check = checkers != 0
+        pinned = self.pinned(us, occupied)
+        attacked = self.square_attacked
+
+        # Squares a non-king move must land on: anywhere but our own pieces, or when in check,
+        # onto the checker or between it and the king. In double check only the king can move.
+        allowed = ~own_occ
+        if in_check:
+            if checkers & (checkers - 1):
+                allowed = 0
+            else:
+                allowed = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+
+        def targets_to_moves(from_sq, targets, promotes=False):
+            from_bit = SQUARE_BB[from_sq]
+            check_needed = from_bit & pinned
+            moves = []
+            while targets:
+                to_bit = targets & -targets
+                targets ^= to_bit
+                if check_needed and attacked(king_sq, them, (occupied ^ from_bit) | to_bit, to_bit):
+                    continue
+                target = SQUARE_POS[to_bit.bit_length() - 1]
+                if promotes:
+                    for promo_piece in PROMOTION_PIECES:
+                        moves.append((target, promo_piece))
+                else:
+                    moves.append((target, None))
+            return moves
+
+        # Knights, bishops, rooks and queens
+        for kind in (KNIGHT, BISHOP, ROOK, QUEEN):
+            pieces = own[kind]
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                sq = bit.bit_length() - 1
+                if kind == KNIGHT:
+                    targets = KNIGHT_ATTACKS[sq]
+                elif kind == BISHOP:
+                    targets = bishop_attacks(sq, occupied)
+                elif kind == ROOK:
+                    targets = rook_attacks(sq, occupied)
+                else:
+                    targets = bishop_attacks(sq, occupied) | rook_attacks(sq, occupied)
+                moves = targets_to_moves(sq, targets & allowed)
+                if moves:
+                    yield SQUARE_POS[sq], moves
+
+        # Pawns
+        forward = -8 if us == WHITE else 8
+        start_row = 6 if us == WHITE else 1
+        promotion_row = 0 if us == WHITE else 7
+        ep_sq = self.en_passant_square()
+        pieces = own[PAWN]
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            targets = PAWN_ATTACKS[us][sq] & enemy_occ
+            one = sq + forward
+            if not occupied & SQUARE_BB[one]:
+                targets |= SQUARE_BB[one]
+                two = one + forward
+                if sq // 8 == start_row and not occupied & SQUARE_BB[two]:
+                    targets |= SQUARE_BB[two]
+            moves = targets_to_moves(sq, targets & allowed, promotes=one // 8 == promotion_row)
+
+            if ep_sq is not None and PAWN_ATTACKS[us][sq] & SQUARE_BB[ep_sq]:
+                # the captured pawn leaves a square that is not the target, so always verify
+                captured_bit = SQUARE_BB[ep_sq - forward]
+                after = (occupied ^ bit ^ captured_bit) | SQUARE_BB[ep_sq]
+                if not attacked(king_sq, them, after, captured_bit):
+                    moves.append((SQUARE_POS[ep_sq], None))
+            if moves:
+                yield SQUARE_POS[sq], moves
+
+        # King, including castling
+        king_bit = own[KING]
+        king_moves = []
+        targets = KING_ATTACKS[king_sq] & ~own_occ
+        occupied_without_king = occupied ^ king_bit
+        while targets:
+            to_bit = targets & -targets
+            targets ^= to_bit
+            to_sq = to_bit.bit_length() - 1
+            if not attacked(to_sq, them, occupied_without_king | to_bit, to_bit):
+                king_moves.append((SQUARE_POS[to_sq], None))
+
+        king_pos = SQUARE_POS[king_sq]
+        if not in_check and self.castling_rights:
+            row = king_pos[0]
+            for kingside, flag in zip((True, False), CASTLING_FLAGS[us]):
+                if not self.castling_rights & flag:
+                    continue
+                between = range(king_sq + 1, king_sq + 3) if kingside else range(king_sq - 3, king_sq)
+                if any(occupied & SQUARE_BB[sq] for sq in between):
+                    continue
+                step = 1 if kingside else -1
+                if any(attacked(king_sq + step * i, them, occupied) for i in (1, 2)):
+                    continue
+                king_moves.append(((row, king_pos[1] + 2 * step), None))
+
+        if king_moves:
+            yield king_pos, king_moves
+
+
+if __name__ == "__main__":
+    pass
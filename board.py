@@ -1,22 +1,53 @@
-from pieces import Piece, Rook, Bishop, Queen, Knight, King, Pawn
+from pieces import Piece, Rook, Bishop, Queen, Knight, King, Pawn, PAWN, KING
+from zobrist import (PIECE_KEYS, CASTLING_KEYS, EN_PASSANT_KEYS, BLACK_TO_MOVE_KEY,
+                     WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE)
+from evaluation import MG_SCORES, EG_SCORES, PHASE_WEIGHTS, MAX_PHASE
+from fen import FenPosition, parse_fen, format_fen
+from packing import pack_codes, unpack_position
 from collections.abc import Generator
 from datetime import datetime
 
 LOG_FILE = "debug_log.txt"
+ALL_CASTLING = WHITE_KINGSIDE | WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE
+# castling rights kept when a move starts or ends on the square: moving a king or rook, or capturing
+# a rook on its corner, gives up the rights that depend on it
+CASTLING_KEEP = {
+    (7, 4): ALL_CASTLING & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE), (7, 7): ALL_CASTLING & ~WHITE_KINGSIDE,
+    (7, 0): ALL_CASTLING & ~WHITE_QUEENSIDE, (0, 4): ALL_CASTLING & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE),
+    (0, 7): ALL_CASTLING & ~BLACK_KINGSIDE, (0, 0): ALL_CASTLING & ~BLACK_QUEENSIDE,
+}
+# FEN piece letter -> (color, piece class)
+FEN_PIECES = {str(piece_class(color)): (color, piece_class) for color in ("white", "black")
+              for piece_class in (Pawn, Knight, Bishop, Rook, Queen, King)}
 
 def log_debug(message: str):
     with open(LOG_FILE, "a") as f:
         timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
         f.write(f"{timestamp} {message}\n")
 
+def move_name(action) -> str:
+    """Returns a (position, target, promo) action in coordinate notation, e.g. e2e4 or e7e8q."""
+    (from_row, from_col), (to_row, to_col), promo = action
+    name = f"{'abcdefgh'[from_col]}{8 - from_row}{'abcdefgh'[to_col]}{8 - to_row}"
+    return name + (str(promo("black")) if promo else "")
+
 class Board:
     def __init__(self) -> None:
         self.piece_map: dict[tuple[int, int], Piece] = {}  # (row, col) -> Piece
         self.king_positions = {"white": None, "black": None}
         self.ply = 0
         self.time_since_capture = 0
-        self.legal_moves: dict[tuple, list] = {}  # pos: (target, promo)
-        self.position_history: dict[str, int] = {}
+        self._legal_moves: dict[tuple, list] | None = None  # pos: (target, promo), None until generated
+        self.hash = 0  # incrementally updated Zobrist hash of the position
+        self.castling_rights = 0  # bitmask of WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE
+        self.en_passant: tuple[int, int] | None = None  # square a pawn just skipped by moving two, if any
+        self.en_passant_file: int | None = None  # file hashed for en passant, if a capture there is possible
+        self.undo_stack: list[tuple] = []  # one record per move(), popped by unmake()
+        self.position_history: dict[int, int] = {}  # hash -> times seen
+        # incrementally updated evaluation terms, white minus black (see evaluate())
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
     
     def display(self, player_color="white"):
         """Prints the board with the player's color at the bottom."""
@@ -64,20 +95,147 @@ class Board:
         back_line = [Rook, Knight, Bishop, Queen, King, Bishop, Knight, Rook]
 
         for col, piece_class in enumerate(back_line):
-            self.piece_map[(0,col)] = piece_class("black")
-            self.piece_map[(1,col)] = Pawn("black")
-            self.piece_map[(7,col)] = piece_class("white")
-            self.piece_map[(6,col)] = Pawn("white")
+            self._put_piece((0,col), piece_class("black"))
+            self._put_piece((1,col), Pawn("black"))
+            self._put_piece((7,col), piece_class("white"))
+            self._put_piece((6,col), Pawn("white"))
         
         self.king_positions["black"] = (0,4)
         self.king_positions["white"] = (7,4)
+        self.castling_rights = ALL_CASTLING
+        self.hash ^= CASTLING_KEYS[self.castling_rights]
 
-        self.update_legal_moves()
+        self.legal_moves = None
         self.record_position()
 
+    @classmethod
+    def from_fen(cls, fen: str) -> "Board":
+        """Returns a board (of the calling class) set up from a FEN string.
+        Raises ValueError if the FEN is malformed."""
+        return cls.from_fen_position(parse_fen(fen))
+
+    @classmethod
+    def from_fen_position(cls, position: FenPosition) -> "Board":
+        """Returns a board (of the calling class) set up from a parsed FEN (see fen.read_fens).
+        Raises ValueError if a side has no king or more than one."""
+        board = cls()
+        board.ply = 2 * (position.fullmove - 1) + (not position.white_to_move)
+        board.time_since_capture = position.halfmove
+        for sq, char in enumerate(position.squares):
+            if char == ".":
+                continue
+            row, col = divmod(sq, 8)
+            color, piece_class = FEN_PIECES[char]
+            if piece_class is King:
+                if board.king_positions[color] is not None:
+                    raise ValueError(f"Invalid FEN: more than one {color} king")
+                board.king_positions[color] = (row, col)
+            board._put_piece((row, col), piece_class(color))
+        if None in board.king_positions.values():
+            raise ValueError("Invalid FEN: missing king")
+
+        # rights whose king or rook is not on its home square are dropped
+        for flag, color, king_pos, rook_pos in (
+                (WHITE_KINGSIDE, "white", (7, 4), (7, 7)), (WHITE_QUEENSIDE, "white", (7, 4), (7, 0)),
+                (BLACK_KINGSIDE, "black", (0, 4), (0, 7)), (BLACK_QUEENSIDE, "black", (0, 4), (0, 0))):
+            if (position.castling & flag and board.piece_map.get(king_pos) is King(color)
+                    and board.piece_map.get(rook_pos) is Rook(color)):
+                board.castling_rights |= flag
+        board.hash ^= CASTLING_KEYS[board.castling_rights]
+
+        if position.en_passant is not None:
+            target = position.en_passant
+            pawn_pos = (target[0] + (1 if target[0] == 2 else -1), target[1])
+            pawn = board.piece_map.get(pawn_pos)
+            if pawn is Pawn("black" if position.white_to_move else "white"):
+                board.en_passant = target
+                for side_col in (target[1] - 1, target[1] + 1):
+                    neighbor = board.piece_map.get((pawn_pos[0], side_col))
+                    if isinstance(neighbor, Pawn) and neighbor.color != pawn.color:
+                        board.en_passant_file = target[1]
+                        board.hash ^= EN_PASSANT_KEYS[target[1]]
+                        break
+        if board.ply % 2 == 1:
+            board.hash ^= BLACK_TO_MOVE_KEY
+
+        board.legal_moves = None
+        board.record_position()
+        return board
+
+    def fen_position(self) -> FenPosition:
+        """Returns the current position as a FenPosition."""
+        squares = ["."] * 64
+        for (row, col), piece in self.piece_map.items():
+            squares[row * 8 + col] = str(piece)
+        # like FEN, en_passant is set after every double push, whether or not a capture is possible
+        return FenPosition("".join(squares), self.ply % 2 == 0, self.castling_rights, self.en_passant,
+                           self.time_since_capture, self.ply // 2 + 1)
+
+    def to_fen(self) -> str:
+        """Returns the current position as a FEN string."""
+        return format_fen(self.fen_position())
+
+    def pack(self) -> bytes:
+        """Returns the position (not its history) in the 38-byte binary form described in packing.py."""
+        codes = bytearray(64)
+        for (row, col), piece in self.piece_map.items():
+            codes[row * 8 + col] = piece.code + 1
+        return pack_codes(codes, self.ply % 2 == 0, self.castling_rights,
+                          None if self.en_passant is None else self.en_passant[1],
+                          self.time_since_capture, self.ply // 2 + 1)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "Board":
+        """Returns a board (of the calling class) set up from the output of pack().
+        Raises ValueError if data is not a packed position."""
+        return cls.from_fen_position(unpack_position(data))
+
+    def pack_state(self) -> tuple[bytes, dict[int, int]]:
+        """Returns pack() with the repetition counts of the positions since the last capture or
+        pawn move (no earlier one can come back), which is all a search needs: sending this
+        to another process costs a few hundred bytes where pickling the board, undo stack and
+        cached legal moves included, runs to tens of KB late in a game."""
+        recent = {entry[8] for entry in self.undo_stack[max(0, len(self.undo_stack) - self.time_since_capture):]}
+        recent.add(self.hash)
+        return self.pack(), {key: count for key, count in self.position_history.items() if key in recent}
+
+    @classmethod
+    def unpack_state(cls, state: tuple[bytes, dict[int, int]]) -> "Board":
+        """Returns a board (of the calling class) set up from the output of pack_state(). It
+        has no undo stack, so moves made before pack_state cannot be taken back."""
+        data, history = state
+        board = cls.unpack(data)
+        board.position_history = dict(history)
+        return board
+
+    def _put_piece(self, pos: tuple[int, int], piece: Piece) -> None:
+        """Places a piece on an empty square. Every board mutation in move/unmake goes
+        through this and _remove_piece so that subclasses can mirror the change."""
+        self.piece_map[pos] = piece
+        key, sq = (piece.color, type(piece)), pos[0] * 8 + pos[1]
+        self.hash ^= PIECE_KEYS[key][sq]
+        self.mg_score += MG_SCORES[key][sq]
+        self.eg_score += EG_SCORES[key][sq]
+        self.phase += PHASE_WEIGHTS[key[1]]
+
+    def _remove_piece(self, pos: tuple[int, int]) -> Piece:
+        """Removes and returns the piece on the given square."""
+        piece = self.piece_map.pop(pos)
+        key, sq = (piece.color, type(piece)), pos[0] * 8 + pos[1]
+        self.hash ^= PIECE_KEYS[key][sq]
+        self.mg_score -= MG_SCORES[key][sq]
+        self.eg_score -= EG_SCORES[key][sq]
+        self.phase -= PHASE_WEIGHTS[key[1]]
+        return piece
+
     def in_check(self, color: str) -> bool:
         """Returns True if the king of the given color is in check."""
         return self._in_check_static(self.piece_map, self.king_positions, color)
+
+    def has_non_pawn_material(self, color_index: int) -> bool:
+        """Returns True if the side (0 white, 1 black) has a piece other than its king and pawns."""
+        return any(piece.color_index == color_index and piece.type_code not in (PAWN, KING)
+                   for piece in self.piece_map.values())
     
     @staticmethod
     def _in_check_static(piece_map, king_positions, color: str) -> bool:
@@ -132,11 +290,15 @@ class Board:
         return False
 
     def move_causes_check(self, piece_position: tuple[int, int], target: tuple[int, int]) -> bool:
-        """Returns True if moving a piece to the target would place its own king in check."""
+        """Returns True if moving a piece to the target would place its own king in check.
+        Simulates the move on a copy of piece_map, so it is only used where the pin and attack
+        maps are not enough (en passant, which removes a piece off the target square)."""
         piece = self.piece_map[piece_position]
         simulated_map = self.piece_map.copy()
         simulated_king_positions = self.king_positions.copy()
 
+        if self.is_en_passant((piece_position, target, None)):
+            simulated_map.pop((piece_position[0], target[1]))
         simulated_map.pop(piece_position)
         simulated_map[target] = piece
 
@@ -145,56 +307,177 @@ class Board:
 
         return self._in_check_static(simulated_map, simulated_king_positions, piece.color)
 
-    def can_castle(self, color: str, kingside: bool) -> bool:
-        """Returns True if castling (kingside or queenside) is legal for the given color."""
+    def compute_king_safety(self, color: str) -> tuple[list, dict, set]:
+        """
+        Computes, once per position, what is needed to decide the legality of color's moves:
+        checkers: a list of (checker_pos, squares) where squares are the checker's square and the
+                  squares between it and the king, i.e. where a non-king move must land to stop the check
+        pins: {pinned_pos: squares} where squares is the pin ray (up to and including the pinner)
+        attacked: every square the opponent attacks, computed with our king removed so the king
+                  cannot step back along a slider's line
+        """
         king_pos = self.king_positions[color]
-        king = self.piece_map[king_pos]
-        if king.has_moved or self.in_check(king.color):
-            return False
-        
-        row = king_pos[0]
-        rook_col = 7 if kingside else 0
-        rook = self.piece_map.get((row, rook_col))
-        
-        if rook is None or rook.has_moved:
+        piece_map = self.piece_map
+        checkers = []
+        pins = {}
+
+        # Sliders: walk out from the king. The first enemy piece may give check; if the first piece
+        # is our own, an enemy slider behind it pins it.
+        for directions, sliders in ((Rook.directions, (Rook, Queen)), (Bishop.directions, (Bishop, Queen))):
+            for dr, dc in directions:
+                row, col = king_pos
+                ray = []
+                blocker = None
+                while True:
+                    row += dr
+                    col += dc
+                    if not Piece.in_bounds((row, col)):
+                        break
+                    ray.append((row, col))
+                    piece = piece_map.get((row, col))
+                    if piece is None:
+                        continue
+                    if piece.color != color:
+                        if isinstance(piece, sliders):
+                            if blocker is None:
+                                checkers.append(((row, col), set(ray)))
+                            else:
+                                pins[blocker] = set(ray)
+                        break
+                    if blocker is not None:
+                        break
+                    blocker = (row, col)
+
+        # Knights and pawns
+        for dr, dc in Knight.directions:
+            square = (king_pos[0] + dr, king_pos[1] + dc)
+            piece = piece_map.get(square)
+            if isinstance(piece, Knight) and piece.color != color:
+                checkers.append((square, {square}))
+        pawn_row = king_pos[0] - 1 if color == "white" else king_pos[0] + 1
+        for dc in (-1, 1):
+            square = (pawn_row, king_pos[1] + dc)
+            piece = piece_map.get(square)
+            if isinstance(piece, Pawn) and piece.color != color:
+                checkers.append((square, {square}))
+
+        # Squares attacked by the opponent
+        attacked = set()
+        for (row, col), piece in piece_map.items():
+            if piece.color == color:
+                continue
+            if isinstance(piece, Pawn):
+                forward = 1 if piece.color == "black" else -1
+                attacked.add((row + forward, col - 1))
+                attacked.add((row + forward, col + 1))
+            elif isinstance(piece, (Knight, King)):
+                for dr, dc in piece.directions:
+                    attacked.add((row + dr, col + dc))
+            else:
+                for dr, dc in piece.directions:
+                    r, c = row + dr, col + dc
+                    while Piece.in_bounds((r, c)):
+                        attacked.add((r, c))
+                        if (r, c) in piece_map and (r, c) != king_pos:
+                            break
+                        r += dr
+                        c += dc
+
+        return checkers, pins, attacked
+
+    def can_castle(self, color: str, kingside: bool, attacked: set | None = None) -> bool:
+        """Returns True if castling (kingside or queenside) is legal for the given color.
+        attacked is the opponent's attack set from compute_king_safety, computed if not given."""
+        if color == "white":
+            flag = WHITE_KINGSIDE if kingside else WHITE_QUEENSIDE
+        else:
+            flag = BLACK_KINGSIDE if kingside else BLACK_QUEENSIDE
+        if not self.castling_rights & flag:
             return False
+        row = self.king_positions[color][0]
 
-        path = [(row, col) for col in (range(5,7) if kingside else range(1,4))]
-        for square in path:
-            if square in self.piece_map or self.move_causes_check(king_pos, square):
-                return False
-        
-        # Check if a knight is blocking queenside castle
-        # as the above only checks the king's path
-        if not kingside and (7,1) in self.piece_map:
+        # every square between king and rook must be empty
+        between = range(5, 7) if kingside else range(1, 4)
+        if any((row, col) in self.piece_map for col in between):
             return False
-        
-        return True
+
+        # the king may not be in check or pass through or land on an attacked square
+        if attacked is None:
+            attacked = self.compute_king_safety(color)[2]
+        king_path = (4, 5, 6) if kingside else (4, 3, 2)
+        return not any((row, col) in attacked for col in king_path)
+
+    @property
+    def legal_moves(self) -> dict[tuple, list]:
+        """Legal moves for the side to move as {pos: [(target, promo), ...]}. Generated on first
+        access and cached until the position changes."""
+        if self._legal_moves is None:
+            self.update_legal_moves()
+        return self._legal_moves
+
+    @legal_moves.setter
+    def legal_moves(self, legal_moves: dict[tuple, list] | None) -> None:
+        self._legal_moves = legal_moves
 
     def update_legal_moves(self) -> None:
-        self.legal_moves = {}
+        """Regenerates the legal move cache. Only needed after editing piece_map by hand."""
+        self._legal_moves = dict(self._generate_legal_moves())
+
+    def has_legal_move(self) -> bool:
+        """Returns True if the side to move has any legal move, stopping at the first one found
+        when the moves have not been generated yet."""
+        if self._legal_moves is not None:
+            return any(self._legal_moves.values())
+        return next(self._generate_legal_moves(), None) is not None
+
+    def _generate_legal_moves(self) -> Generator:
+        """Yields (pos, [(target, promo), ...]) for each piece of the side to move that has a legal move."""
+        color = "white" if self.ply % 2 == 0 else "black"
+        checkers, pins, attacked = self.compute_king_safety(color)
+        # in double check only the king can move; in single check other pieces must block or capture
+        if len(checkers) > 1:
+            evasion_squares = set()
+        elif checkers:
+            evasion_squares = checkers[0][1]
+        else:
+            evasion_squares = None
+
         for pos, piece in self.piece_map.items():
-            if ((self.ply % 2 == 0 and piece.color != "white")
-                or (self.ply % 2 == 1 and piece.color != "black")):
+            if piece.color != color:
                 continue
-            self.legal_moves[pos] = []
-            moves = piece.valid_moves(pos, self)
-            for target, _ in moves:
-                if not self.move_causes_check(pos, target):
-                    # Handle pawn promotion
-                    if isinstance(piece, Pawn) and (target[0] == 0 or target[0] == 7):
-                        for promo_piece in [Queen, Knight, Rook, Bishop]:
-                            self.legal_moves[pos].append((target, promo_piece))
-                    else:
-                        self.legal_moves[pos].append((target, None))
+            moves = []
+            is_king = isinstance(piece, King)
+            is_pawn = isinstance(piece, Pawn)
+            pin_ray = pins.get(pos)
+            for target, promo in piece.valid_moves(pos, self):
+                if is_king:
+                    if target in attacked:
+                        continue
+                elif is_pawn and target[1] != pos[1] and target not in self.piece_map:
+                    # en passant can expose the king along the rank of the captured pawn
+                    if self.move_causes_check(pos, target):
+                        continue
+                elif ((evasion_squares is not None and target not in evasion_squares)
+                      or (pin_ray is not None and target not in pin_ray)):
+                    continue
+
+                # Handle pawn promotion (Pawn.valid_moves only lists the choices for pushes, not captures)
+                if is_pawn and promo is None and (target[0] == 0 or target[0] == 7):
+                    for promo_piece in [Queen, Knight, Rook, Bishop]:
+                        moves.append((target, promo_piece))
+                else:
+                    moves.append((target, promo))
             
             # add castles
-            if isinstance(piece, King):
+            if is_king and not checkers:
                 king_row, king_col = pos
-                if self.can_castle(piece.color, kingside=True):
-                    self.legal_moves[pos].append(((king_row, king_col + 2), None))
-                if self.can_castle(piece.color, kingside=False):
-                    self.legal_moves[pos].append(((king_row, king_col - 2), None))
+                if self.can_castle(piece.color, kingside=True, attacked=attacked):
+                    moves.append(((king_row, king_col + 2), None))
+                if self.can_castle(piece.color, kingside=False, attacked=attacked):
+                    moves.append(((king_row, king_col - 2), None))
+
+            if moves:
+                yield pos, moves
 
     def move(self, action):
         """Moves a piece from piece_position to target, handling promotion, castling, en passant,
@@ -205,95 +488,143 @@ class Board:
             raise ValueError(f"No legal moves for the piece on {position}. Try again")
 
         legal_moves = self.legal_moves[position]
-        if (not Piece.in_bounds(position) 
-            or target not in {move[0] for move in legal_moves}):
+        if not Piece.in_bounds(position) or (target, promo) not in legal_moves:
             self.display()
+            if promo is None and any(move[0] == target for move in legal_moves):
+                raise ValueError(f"Moving the pawn at {position} to {target} needs a promotion piece. Try again.")
             raise ValueError(f"{target} is not a legal move for the piece at {position}. Try again.")
 
-        # remove the taken piece for en passant (done before getting piece bc helper depends on piece being at pos)
-        opp_pawn_pos = (position[0], target[1])
-        if self.is_en_passant(action):
-            del self.piece_map[opp_pawn_pos]
-        
-        piece = self.piece_map.pop(position)
-
-        # if capture or pawn move, reset counter
-        if target in self.piece_map or isinstance(piece, Pawn):
+        piece = self.piece_map[position]
+        is_en_passant = self.is_en_passant(action)
+        captured_pos = (position[0], target[1]) if is_en_passant else target
+        captured_piece = self.piece_map.get(captured_pos)
+        # everything unmake() needs to restore the exact prior state
+        self.undo_stack.append((
+            position, target, piece, captured_piece, captured_pos, self.castling_rights, self.en_passant,
+            self.time_since_capture, self.hash, self.en_passant_file, self._legal_moves,
+        ))
+
+        self.en_passant = None
+        if self.en_passant_file is not None:
+            self.hash ^= EN_PASSANT_KEYS[self.en_passant_file]
+            self.en_passant_file = None
+
+        if self.castling_rights and (position in CASTLING_KEEP or target in CASTLING_KEEP):
+            rights = (self.castling_rights & CASTLING_KEEP.get(position, ALL_CASTLING)
+                      & CASTLING_KEEP.get(target, ALL_CASTLING))
+            self.hash ^= CASTLING_KEYS[self.castling_rights] ^ CASTLING_KEYS[rights]
+            self.castling_rights = rights
+
+        # the 50-move counter (the FEN halfmove clock) restarts on a capture or pawn move
+        if captured_piece is not None:
+            self._remove_piece(captured_pos)
+        is_pawn = piece.type_code == PAWN
+        if captured_piece is not None or is_pawn:
             self.time_since_capture = 0
-        
-        # move the piece
-        self.piece_map[target] = piece
+        else:
+            self.time_since_capture += 1
 
-        # handle promotion
+        # move the piece, handling promotion
+        self._remove_piece(position)
         if promo is not None:
-            self.piece_map[target] = promo(piece.color, has_moved=True)
+            self._put_piece(target, promo(piece.color))
+        else:
+            self._put_piece(target, piece)
 
         # update king_positions and move rook if castle
-        if isinstance(piece, King):
+        if piece.type_code == KING:
             self.king_positions[piece.color] = target
             king_row, king_col = position
             if king_col - target[1] == -2:  # kingside
-                rook = self.piece_map.pop((king_row, 7))
-                self.piece_map[(king_row, 5)] = rook
-                rook.has_moved = True
+                self._put_piece((king_row, 5), self._remove_piece((king_row, 7)))
             elif king_col - target[1] == 2:  # queenside
-                rook = self.piece_map.pop((king_row, 0))
-                self.piece_map[(king_row, 3)] = rook
-                rook.has_moved = True
-                
-        # update pawn if moved two
-        if isinstance(piece, Pawn) and abs(position[0] - target[0]) == 2:
-            piece.moved_two_ply = self.ply
-        piece.has_moved = True
+                self._put_piece((king_row, 3), self._remove_piece((king_row, 0)))
+
+        # a pawn that moved two can be taken en passant on the square it skipped
+        if is_pawn and abs(position[0] - target[0]) == 2:
+            self.en_passant = ((position[0] + target[0]) // 2, target[1])
+            # only hash the en passant file if an enemy pawn can actually take
+            enemy_pawn = Pawn("black" if piece.color == "white" else "white")
+            for side in (target[1] - 1, target[1] + 1):
+                if self.piece_map.get((target[0], side)) is enemy_pawn:
+                    self.en_passant_file = target[1]
+                    self.hash ^= EN_PASSANT_KEYS[target[1]]
+                    break
+
+        self.hash ^= BLACK_TO_MOVE_KEY
 
         self.ply += 1
-        self.time_since_capture += 1
-        self.update_legal_moves()
+        self.legal_moves = None
         self.record_position()
 
-    def undo_move(self, position: tuple, target: tuple, promo: Piece, was_first_move: bool, 
-                  captured_piece: Piece|None=None, captured_piece_pos: tuple|None=None, prev_time_since_capture: int|None=None):
-        prev_board_key = self.compute_position_key()
-        if self.position_history[prev_board_key] <= 1:
-            del self.position_history[prev_board_key]
+    def make_null_move(self) -> None:
+        """Passes the turn without moving a piece, for null-move pruning in the search; unmake()
+        takes it back. The side to move must not be in check. A null move is not recorded in
+        position_history, as no game can reach the position it leads to."""
+        self.undo_stack.append((
+            None, None, None, None, None, self.castling_rights, self.en_passant,
+            self.time_since_capture, self.hash, self.en_passant_file, self._legal_moves,
+        ))
+        self.en_passant = None
+        if self.en_passant_file is not None:
+            self.hash ^= EN_PASSANT_KEYS[self.en_passant_file]
+            self.en_passant_file = None
+        self.hash ^= BLACK_TO_MOVE_KEY
+        self.time_since_capture += 1
+        self.ply += 1
+        self.legal_moves = None
+
+    def unmake(self) -> None:
+        """Takes back the last move made with move() (or make_null_move()), restoring the exact
+        prior state (pieces, en passant, castling rights, 50-move counter, hash and legal moves)."""
+        (position, target, piece, captured_piece, captured_pos, castling_rights, en_passant,
+         time_since_capture, prev_hash, en_passant_file, legal_moves) = self.undo_stack.pop()
+
+        if position is None:  # a null move
+            self.ply -= 1
+            self.time_since_capture = time_since_capture
+            self.hash = prev_hash
+            self.en_passant = en_passant
+            self.en_passant_file = en_passant_file
+            self.legal_moves = legal_moves
+            return
+
+        if self.position_history[self.hash] <= 1:
+            del self.position_history[self.hash]
         else:
-            self.position_history[prev_board_key] -= 1
-        
+            self.position_history[self.hash] -= 1
 
-        piece = self.piece_map.pop(target)
-        
-        if promo is not None:
-            piece = Pawn(piece.color, has_moved=True)
-            piece.moved_two_ply = self.ply - 4  # a bit arbitrary. Enough so it's not the prev move
-        if isinstance(piece, King):
+        # removes the promoted piece rather than the pawn after a promotion
+        self._remove_piece(target)
+        if piece.type_code == KING:
             self.king_positions[piece.color] = position
 
             # Castling
             if abs(position[1] - target[1]) > 1:
                 if target[1] == 2:  # queenside
-                    rook = self.piece_map.pop((position[0], 3))  # the rook is on the backrank of the d column
-                    rook.has_moved = False
-                    self.piece_map[(position[0], 0)] = rook
+                    rook = self._remove_piece((position[0], 3))  # the rook is on the backrank of the d column
+                    self._put_piece((position[0], 0), rook)
                 else:  # kingside
-                    rook = self.piece_map.pop((position[0], 5))  # the rook is on the backrank of the f column
-                    rook.has_moved = False
-                    self.piece_map[(position[0], 7)] = rook
-        
-        self.piece_map[position] = piece
-        if was_first_move:
-            piece.has_moved = False
-            # If pawn moved two spaces
-            if isinstance(piece, Pawn) and abs(position[0] - target[0]) == 2:
-                piece.moved_two_ply = -1
-        
+                    rook = self._remove_piece((position[0], 5))  # the rook is on the backrank of the f column
+                    self._put_piece((position[0], 7), rook)
+
+        self._put_piece(position, piece)
         if captured_piece is not None:
-            self.piece_map[captured_piece_pos] = captured_piece
-            self.time_since_capture = prev_time_since_capture
-        else:
-            self.time_since_capture -= 1
-            
+            self._put_piece(captured_pos, captured_piece)
+
         self.ply -= 1
-        self.update_legal_moves()
+        self.time_since_capture = time_since_capture
+        self.hash = prev_hash
+        self.castling_rights = castling_rights
+        self.en_passant = en_passant
+        self.en_passant_file = en_passant_file
+        # the position is back to what it was before move(), so its cached moves are valid again
+        self.legal_moves = legal_moves
+
+    def undo_move(self, *args, **kwargs):
+        """Takes back the last move. The arguments of the old signature (position, target, promo,
+        was_first_move and capture details) are accepted but no longer needed; see unmake()."""
+        self.unmake()
     
     def algebraic_to_index(self, notation: str) -> tuple[int, int]:
         """Converts standard chess notation (e.g., 'e4') to board coordinates (row, col)."""
@@ -312,81 +643,82 @@ class Board:
     
     def in_checkmate(self, color: str) -> bool:
         """Returns true if color is in checkmate"""
-        if self.in_check(color) and all(not moves for moves in self.legal_moves.values()):
+        if self.in_check(color) and not self.has_legal_move():
             return True
         return False
     
     def is_draw(self):
         """Returns true if the game is a draw"""
-        curr_color = "white" if self.ply % 2 == 0 else "black"
-        # Stalemate
-        if (all(not moves for moves in self.legal_moves.values()) 
-            and not self.in_check(curr_color)):
-            return True
-        
         # Threefold repetition
-        if self.position_history[self.compute_position_key()] >= 3:
+        if self.position_history.get(self.hash, 0) >= 3:
             return True
 
         # 50-move rule
         if self.time_since_capture >= 100:
             return True
 
-        # Insufficient material
-        pieces = list(self.piece_map.values())
-        if all(isinstance(p, (King, Bishop, Knight)) for p in pieces):
-            if len(pieces) <= 3:
-                # King vs King or King and Bishop/Knight vs King
-                return True
-            if len(pieces) == 4:
-                # King and bishop vs king and bishop (same color bishops)
-                bishops = [p for p in pieces if isinstance(p, Bishop)]
-                if len(bishops) == 2:
-                    bishop_squares = [pos for pos, p in self.piece_map.items() if isinstance(p, Bishop)]
-                    same_color = lambda square: (square[0] + square[1]) % 2
-                    if same_color(bishop_squares[0]) == same_color(bishop_squares[1]):
-                        return True
+        if self.has_insufficient_material():
+            return True
+
+        # Stalemate (last, as it is the only check that needs move generation)
+        curr_color = "white" if self.ply % 2 == 0 else "black"
+        if not self.in_check(curr_color) and not self.has_legal_move():
+            return True
 
         return False
     
+    def has_insufficient_material(self) -> bool:
+        """Returns True if neither side can mate: king vs king, king and bishop or knight vs
+        king, or kings and two bishops on squares of the same color. The piece count and the
+        phase (1 per minor piece, more for rooks and queens, 0 for pawns) rule out everything
+        else without looking at the pieces, so this is cheap enough for every search leaf."""
+        count = len(self.piece_map)
+        if count <= 2 or (count == 3 and self.phase == 1):
+            return True  # the third piece has phase 1, so it is a bishop or knight
+        if count == 4 and self.phase == 2:
+            bishop_squares = [(row + col) % 2 for (row, col), piece in self.piece_map.items()
+                              if isinstance(piece, Bishop)]
+            return len(bishop_squares) == 2 and bishop_squares[0] == bishop_squares[1]
+        return False
+
     def record_position(self):
-        key = self.compute_position_key()
-        self.position_history[key] = self.position_history.get(key, 0) + 1
+        self.position_history[self.hash] = self.position_history.get(self.hash, 0) + 1
 
-    def compute_position_key(self) -> str:
+    def compute_position_key(self) -> int:
         """
-        Generates a unique string key for the current board position,
-        used for tracking repeated positions.
+        Computes the Zobrist hash of the current position from scratch. move and unmake keep
+        self.hash equal to this incrementally; use this to verify it or after editing piece_map by hand.
         """
-        # Collect all pieces with their positions sorted
-        pieces = []
-        for pos in sorted(self.piece_map.keys()):
-            piece = self.piece_map[pos]
-            # Use the first two characters of the piece class name
-            pieces.append(f"{piece.color[0]}{type(piece).__name__[:2]}{pos[0]}{pos[1]}")
-        
-        # Add castling rights info
-        castling_rights = []
-        for color in ["white", "black"]:
-            row = 7 if color == "white" else 0
-            if isinstance(self.piece_map.get((row, 0)), Rook) and not self.piece_map[(row, 0)].has_moved:
-                castling_rights.append(f"{color[0]}Q")
-            if isinstance(self.piece_map.get((row, 7)), Rook) and not self.piece_map[(row, 7)].has_moved:
-                castling_rights.append(f"{color[0]}K")
-        
-        # Track which kings have moved
-        king_moved = ''.join(f"{color[0]}Km" for color in ["white", "black"] 
-                             if self.king_positions[color] in self.piece_map and 
-                             self.piece_map[self.king_positions[color]].has_moved)
-        
-        # Combine all info into a string key with the current player's turn
-        return '|'.join([
-            ''.join(pieces),
-            ''.join(castling_rights),
-            king_moved,
-            str(self.ply % 2)
-        ])
+        key = 0
+        for (row, col), piece in self.piece_map.items():
+            key ^= PIECE_KEYS[(piece.color, type(piece))][row * 8 + col]
+        key ^= CASTLING_KEYS[self.castling_rights]
+        if self.en_passant_file is not None:
+            key ^= EN_PASSANT_KEYS[self.en_passant_file]
+        if self.ply % 2 == 1:
+            key ^= BLACK_TO_MOVE_KEY
+        return key
     
+    def compute_evaluation(self) -> tuple[int, int, int]:
+        """
+        Computes (mg_score, eg_score, phase) from scratch. move and unmake keep the fields of the
+        same names equal to this incrementally; use this to verify them or after editing piece_map by hand.
+        """
+        mg_score = eg_score = phase = 0
+        for (row, col), piece in self.piece_map.items():
+            key = (piece.color, type(piece))
+            mg_score += MG_SCORES[key][row * 8 + col]
+            eg_score += EG_SCORES[key][row * 8 + col]
+            phase += PHASE_WEIGHTS[key[1]]
+        return mg_score, eg_score, phase
+
+    def evaluate(self) -> int:
+        """Returns the material and piece-square score in centipawns for the side to move, blended
+        from the midgame and endgame scores by the material left on the board."""
+        phase = min(self.phase, MAX_PHASE)
+        score = (self.mg_score * phase + self.eg_score * (MAX_PHASE - phase)) // MAX_PHASE
+        return score if self.ply % 2 == 0 else -score
+
     def get_all_legal_moves(self) -> Generator:
         """Yields (start_pos, target_pos, promotion_choice) for all legal moves."""
         for pos, moves in self.legal_moves.items():
@@ -421,18 +753,8 @@ class Board:
 
     def is_en_passant(self, action):
         pos, target, _ = action
-        # if pos not in self.piece_map:
-        #     return False
-        piece = self.piece_map[pos]
-        opp_pawn_pos = (pos[0], target[1])
-        if (isinstance(piece, Pawn)
-            and abs(pos[0] - target[0]) == abs(pos[1] - target[1]) == 1  #diag move
-            and opp_pawn_pos in self.piece_map
-            and isinstance(self.piece_map[opp_pawn_pos], Pawn)
-            and self.piece_map[opp_pawn_pos].color != piece.color
-            and self.piece_map[opp_pawn_pos].moved_two_ply == self.ply - 1):
-            return True
-        return False
+        # only a pawn can move diagonally onto the en passant square
+        return target == self.en_passant and pos[1] != target[1] and self.piece_map[pos].type_code == PAWN
     
 
 if __name__ == "__main__":
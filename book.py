@@ -0,0 +1,223 @@
+"""
+Opening books in the Polyglot .bin format, built from PGN files and read through mmap.
+
+    python book.py build games.pgn [more.pgn ...] book.bin --plies 20 --min-games 2
+    python book.py probe book.bin ["<fen>"]     # list the book moves of a position (default: start)
+
+A book is a file of 16-byte entries sorted by position key, each big-endian:
+
+     8 bytes  position key (polyglot.polyglot_key)
+     2 bytes  move: to file (bits 0-2), to rank (3-5), from file (6-8), from rank (9-11),
+              promotion (12-14: 0 none, 1 knight, 2 bishop, 3 rook, 4 queen); castling is
+              written as the king taking its own rook (e1h1), as Polyglot does
+     2 bytes  weight; moves are picked with probability proportional to it
+     4 bytes  learn (unused, written as 0)
+
+The keys are Polyglot's, computed from its published Random64 table, so Polyglot books made
+by other tools can be read and books built here can be used elsewhere. OpeningBook looks
+positions up by binary search over the mapped file: nothing is loaded at startup and a lookup
+reads only the entries it touches.
+"""
+import argparse
+import mmap
+import random
+import struct
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from board import Board
+from bitboard import BitBoard
+from pgn import read_games, replay, san
+from pieces import Knight, Bishop, Rook, Queen, King
+from polyglot import polyglot_key
+
+ENTRY = struct.Struct(">QHHI")
+ENTRY_SIZE = ENTRY.size
+MAX_WEIGHT = 0xFFFF
+PROMOTIONS = (None, Knight, Bishop, Rook, Queen)  # by promotion code
+
+_KEY = struct.Struct(">Q")
+
+
+def encode_move(board: Board, action) -> int:
+    """Returns the 16-bit book encoding of a legal action on board."""
+    (row, col), (to_row, to_col), promo = action
+    if board.piece_map[(row, col)].__class__ is King and abs(to_col - col) == 2:
+        to_col = 7 if to_col > col else 0  # castling: the king "takes" its rook
+    return (to_col | (7 - to_row) << 3 | col << 6 | (7 - row) << 9
+            | (PROMOTIONS.index(promo) if promo is not None else 0) << 12)
+
+
+def decode_move(board: Board, move: int):
+    """Returns the action of a book move on board, or None if it is not legal there
+    (a corrupt entry or a key collision)."""
+    promo_code = move >> 12 & 7
+    if promo_code >= len(PROMOTIONS):
+        return None
+    pos = (7 - (move >> 9 & 7), move >> 6 & 7)
+    target = (7 - (move >> 3 & 7), move & 7)
+    piece = board.piece_map.get(pos)
+    if piece is not None and piece.__class__ is King and pos[1] == 4 and target[0] == pos[0] and target[1] in (0, 7):
+        target = (pos[0], 6 if target[1] == 7 else 2)
+    promo = PROMOTIONS[promo_code]
+    if (target, promo) not in board.legal_moves.get(pos, ()):
+        return None
+    return pos, target, promo
+
+
+class OpeningBook:
+    """A read-only, memory-mapped opening book. Use as a context manager, or call close()."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        size = self._file.seek(0, 2)
+        if size % ENTRY_SIZE:
+            self._file.close()
+            raise ValueError(f"{path} is not a whole number of {ENTRY_SIZE}-byte book entries")
+        # an empty file cannot be mapped; it is simply a book without positions
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._count = size // ENTRY_SIZE
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "OpeningBook":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+        self._count = 0
+        self._file.close()
+
+    def entries(self, key: int) -> list[tuple[int, int]]:
+        """Returns the (move, weight) entries stored for a position key."""
+        data, unpack_key = self._data, _KEY.unpack_from
+        low, high = 0, self._count
+        while low < high:  # first entry with a key >= key
+            middle = (low + high) // 2
+            if unpack_key(data, middle * ENTRY_SIZE)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self._count:
+            entry_key, move, weight, _ = ENTRY.unpack_from(data, low * ENTRY_SIZE)
+            if entry_key != key:
+                break
+            found.append((move, weight))
+            low += 1
+        return found
+
+    def moves(self, board: Board) -> list[tuple[tuple, int]]:
+        """Returns the book moves of board's position as (action, weight) pairs, skipping any
+        that are not legal there."""
+        moves = []
+        for move, weight in self.entries(polyglot_key(board)):
+            action = decode_move(board, move)
+            if action is not None:
+                moves.append((action, weight))
+        return moves
+
+    def choose(self, board: Board, rng: random.Random | None = None):
+        """Returns a book move for board picked at random in proportion to the weights, or
+        None if the position is not in the book."""
+        moves = [(action, weight) for action, weight in self.moves(board) if weight > 0]
+        if not moves:
+            return None
+        actions, weights = zip(*moves)
+        return (rng or random).choices(actions, weights)[0]
+
+
+def book_entries(games: Iterable, plies: int = 20, min_games: int = 1) -> list[tuple[int, int, int]]:
+    """
+    Returns sorted (key, move, weight) book entries for the first plies moves of games
+    (PgnGame objects). A move scores 2 for every win and 1 for every draw of the side that
+    played it; moves played in fewer than min_games games or that never scored are left out.
+    The weights of a position are scaled down together if the largest exceeds MAX_WEIGHT.
+    Games with an illegal move contribute the moves before it.
+    """
+    scores = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}
+    stats = defaultdict(lambda: [0, 0])  # (key, move) -> [games, weight]
+    for game in games:
+        if game.result not in scores:
+            continue
+        try:
+            for played, (board, action) in enumerate(replay(game)):
+                if played == plies:
+                    break
+                move_stats = stats[polyglot_key(board), encode_move(board, action)]
+                move_stats[0] += 1
+                move_stats[1] += scores[game.result][board.ply % 2]
+        except ValueError:
+            continue
+
+    by_key = defaultdict(list)
+    for (key, move), (count, weight) in stats.items():
+        if count >= min_games and weight > 0:
+            by_key[key].append((move, weight))
+    entries = []
+    for key, moves in by_key.items():
+        top = max(weight for _, weight in moves)
+        scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+        entries.extend((key, move, max(1, int(weight * scale))) for move, weight in moves)
+    entries.sort()
+    return entries
+
+
+def write_book(path: str, entries: Iterable[tuple[int, int, int]]) -> int:
+    """Writes sorted (key, move, weight) entries to a book file and returns how many were written."""
+    count = 0
+    with open(path, "wb") as out:
+        for key, move, weight in entries:
+            out.write(ENTRY.pack(key, move, weight, 0))
+            count += 1
+    return count
+
+
+def build_book(pgn_paths: Iterable[str], path: str, plies: int = 20, min_games: int = 1) -> int:
+    """Builds a book file from PGN files (see book_entries) and returns its number of entries."""
+    games = (game for pgn_path in pgn_paths for game in read_games(pgn_path))
+    return write_book(path, book_entries(games, plies, min_games))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from PGN files")
+    build.add_argument("paths", nargs="+", metavar="path", help="PGN files, then the book file to write")
+    build.add_argument("--plies", type=int, default=20, help="book moves per game")
+    build.add_argument("--min-games", type=int, default=1, help="leave out moves played in fewer games")
+    probe = commands.add_parser("probe", help="list the book moves of a position")
+    probe.add_argument("book")
+    probe.add_argument("fen", nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if len(args.paths) < 2:
+            parser.error("build needs at least one PGN file and the book file")
+        start = time.perf_counter()
+        count = build_book(args.paths[:-1], args.paths[-1], args.plies, args.min_games)
+        print(f"{count} entries ({count * ENTRY_SIZE} bytes) in {time.perf_counter() - start:.2f}s")
+        return
+
+    board = BitBoard.from_fen(args.fen) if args.fen else BitBoard()
+    if not args.fen:
+        board.initial_setup()
+    with OpeningBook(args.book) as book:
+        moves = sorted(book.moves(board), key=lambda move: -move[1])
+        total = sum(weight for _, weight in moves)
+        if not moves:
+            print("position not in book", file=sys.stderr)
+        for action, weight in moves:
+            print(f"{san(board, action):<8}{weight:>6}  {weight / max(total, 1):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,23 @@
 
 import pygame
 import os
-import cairosvg
-from io import BytesIO
-from board import Board
-from ai import ChessAI
+from bitboard import BitBoard
+from board import log_debug
+from background_search import BackgroundSearch
+from sprites import SpriteCache
+from tablebase import TABLEBASE_DIR
 from pieces import Queen, Rook, Bishop, Knight
 
 MAX_DEPTH = 3
+AI_TIME_LIMIT = 2.0  # seconds per AI move
+AI_POLL_MS = 100  # how often the loop wakes up to check on the AI while it thinks
+PONDER = True  # let the AI search the reply it expects while the human thinks
+BOOK_FILE = "book.bin"  # opening book the AI plays from while it can, if the file exists (see book.py)
+LIGHT = (255, 255, 255)
+DARK = (118, 150, 86)
+HIGHLIGHT = (255, 255, 0)
+BANNER_HEIGHT = 28
+SPRITES_READY = pygame.USEREVENT + 1  # posted when sprites for a new size finish loading
 
 class ChessGUI:
     def __init__(self, width=600, height=600, ai_color=None):
@@ -22,15 +32,35 @@ class ChessGUI:
         pygame.display.set_caption("Chess")
 
         self.update_board_size()
+        self.sprite_cache = None
         self.pieces = self.load_pieces()
-
-        self.chess_board = Board()
+        self.crisp_pieces = self.pieces  # rendered at the current size, as opposed to scaled stand-ins
+        self.pending_pieces = None  # Future of the sprites being loaded for a new size
+        self.board_surface = None
+        self.build_board_surface()
+        # what is on screen, so render() only redraws the squares that changed
+        self.full_redraw = True
+        self.shown_pieces = {}
+        self.shown_selection = None
+        self.shown_banner = None
+        self.banner_font = pygame.font.Font(None, 28)
+
+        self.chess_board = BitBoard()
         self.chess_board.initial_setup()
         self.selected_piece_pos = None
         self.ai_color = ai_color
         self.ai = None
+        self.ai_paused = False  # toggled with Escape
         if self.ai_color is not None:
-            self.ai = ChessAI(max_depth=MAX_DEPTH)
+            # the AI searches in another process so the window keeps responding while it thinks
+            book = BOOK_FILE if os.path.exists(BOOK_FILE) else None
+            tablebases = TABLEBASE_DIR if os.path.isdir(TABLEBASE_DIR) else None  # see tablebase.py
+            self.ai = BackgroundSearch(max_depth=MAX_DEPTH, log_stats=True, book=book, tablebases=tablebases)
+
+    def ai_to_move(self) -> bool:
+        return self.ai is not None and (
+            (self.ai_color == "white" and self.chess_board.ply % 2 == 0)
+            or (self.ai_color == "black" and self.chess_board.ply % 2 == 1))
 
     def update_board_size(self):
         """Updates square size dynamically when the window is resized."""
@@ -38,42 +68,58 @@ class ChessGUI:
         self.square_size = self.board_size // 8
 
     def load_pieces(self, piece_set="merida"):
-        """Loads SVG pieces and converts them to Pygame surfaces at the correct size."""
-        pieces = {}
-        piece_names = ["Pawn", "Knight", "Bishop", "Rook", "Queen", "King"]
-
-        def load_svg_as_surface(svg_path, size):
-            png_data = cairosvg.svg2png(url=svg_path, output_width=size, output_height=size)
-            return pygame.image.load(BytesIO(png_data))
-
-        for color in ["white", "black"]:
-            for piece in piece_names:
-                filename = f"{color}_{piece}.svg"
-                svg_path = os.path.join(f"assets/{piece_set}", filename)
-                pieces[f"{color}_{piece}"] = load_svg_as_surface(svg_path, self.square_size)
-        
-        return pieces
+        """Loads the piece sprites at the current square size. They are rasterized from the SVGs
+        in assets/<piece_set> on first use and loaded from the on-disk sprite cache after that."""
+        self.sprite_cache = SpriteCache(os.path.join("assets", piece_set))
+        return self.sprite_cache.get(self.square_size)
 
     def resize_pieces(self):
-        """Rescales all piece images when the board size changes."""
-        for key in self.pieces:
-            piece_image = self.pieces[key]
-            self.pieces[key] = pygame.transform.scale(piece_image, (self.square_size, self.square_size))
+        """Starts loading sprites for the new square size in the background. Until they arrive
+        (see apply_pending_pieces) the last crisp sprites are shown scaled to the new size."""
+        size = (self.square_size, self.square_size)
+        self.pieces = {key: pygame.transform.smoothscale(image, size) for key, image in self.crisp_pieces.items()}
+        self.pending_pieces = self.sprite_cache.get_async(
+            self.square_size, on_ready=lambda: pygame.event.post(pygame.event.Event(SPRITES_READY)))
+
+    def apply_pending_pieces(self):
+        """Switches to the sprites loaded in the background once they are ready."""
+        if self.pending_pieces is None or not self.pending_pieces.done():
+            return
+        future, self.pending_pieces = self.pending_pieces, None
+        try:
+            self.pieces = self.crisp_pieces = future.result()
+            self.full_redraw = True
+        except Exception as e:  # keep the scaled sprites rather than crash the game
+            log_debug(f"Could not load sprites at {self.square_size}px: {e!r}")
     
-    def draw_board(self):
-        """Draws the chessboard with alternating colors."""
-        WHITE = (255, 255, 255)
-        GREEN = (118, 150, 86)
-        YELLOW = (255, 255, 0)
+    def build_board_surface(self):
+        """Pre-renders the empty board at the current square size."""
+        self.board_surface = pygame.Surface((self.square_size * 8, self.square_size * 8))
         for row in range(8):
             for col in range(8):
-                color = (
-                    YELLOW if self.selected_piece_pos == (col,row) 
-                    else WHITE if (row + col) % 2 == 0
-                    else GREEN
-                )
-                rect = pygame.Rect(row * self.square_size, col * self.square_size, self.square_size, self.square_size)
-                pygame.draw.rect(self.screen, color, rect)
+                self.board_surface.fill(LIGHT if (row + col) % 2 == 0 else DARK, self.square_rect((row, col)))
+
+    def square_rect(self, position):
+        row, col = position
+        return pygame.Rect(col * self.square_size, row * self.square_size, self.square_size, self.square_size)
+
+    def draw_board(self):
+        """Draws the chessboard with alternating colors."""
+        self.screen.blit(self.board_surface, (0, 0))
+        if self.selected_piece_pos is not None:
+            self.screen.fill(HIGHLIGHT, self.square_rect(self.selected_piece_pos))
+
+    def draw_square(self, position):
+        """Redraws one square and its piece, returning the screen area it covers."""
+        rect = self.square_rect(position)
+        if position == self.selected_piece_pos:
+            self.screen.fill(HIGHLIGHT, rect)
+        else:
+            self.screen.blit(self.board_surface, rect, area=rect)
+        piece = self.chess_board.piece_map.get(position)
+        if piece is not None:
+            self.screen.blit(self.pieces[f"{piece.color}_{piece.__class__.__name__}"], rect)
+        return rect
 
     def draw_pieces(self):
         """Draws pieces at their correct positions after resizing."""
@@ -82,6 +128,56 @@ class ChessGUI:
             piece_image = self.pieces[f"{piece.color}_{piece.__class__.__name__}"]
             self.screen.blit(piece_image, (col * self.square_size, row * self.square_size))
 
+    def banner_text(self):
+        """Returns the status shown over the board while it is the AI's turn, or None."""
+        if not self.ai_to_move():
+            return None
+        if self.ai_paused:
+            return "AI paused (Esc to resume)"
+        return f"Thinking... {self.ai.elapsed:.1f}s (Esc to pause)" if self.ai.thinking else None
+
+    def draw_thinking(self, label):
+        """Draws a banner over the top of the board while the AI is searching."""
+        text = self.banner_font.render(label, True, (255, 255, 255))
+        banner = pygame.Surface((self.board_size, BANNER_HEIGHT))
+        banner.set_alpha(180)
+        banner.fill((0, 0, 0))
+        self.screen.blit(banner, (0, 0))
+        self.screen.blit(text, (10, (BANNER_HEIGHT - text.get_height()) // 2))
+        return banner.get_rect()
+
+    def render(self):
+        """Updates the screen: everything after a resize or popup, otherwise only the squares whose
+        piece or highlight changed (and the banner) since the last call, with display.update."""
+        shown_pieces = dict(self.chess_board.piece_map)  # pieces are immutable, so a copy is a snapshot
+        banner = self.banner_text()
+        if self.full_redraw:
+            self.screen.fill("black")
+            self.draw_board()
+            self.draw_pieces()
+            if banner is not None:
+                self.draw_thinking(banner)
+            pygame.display.flip()
+        else:
+            dirty = {pos for pos in shown_pieces.keys() | self.shown_pieces.keys()
+                     if shown_pieces.get(pos) != self.shown_pieces.get(pos)}
+            if self.selected_piece_pos != self.shown_selection:
+                dirty |= {self.selected_piece_pos, self.shown_selection} - {None}
+            # the translucent banner is redrawn over freshly drawn squares only, so it never darkens twice
+            if banner != self.shown_banner or (banner is not None and dirty):
+                banner_rows = -(-BANNER_HEIGHT // self.square_size)
+                dirty |= {(row, col) for row in range(min(banner_rows, 8)) for col in range(8)}
+            if not dirty:
+                return
+            rects = [self.draw_square(pos) for pos in dirty]
+            if banner is not None:
+                rects.append(self.draw_thinking(banner))
+            pygame.display.update(rects)
+        self.full_redraw = False
+        self.shown_pieces = shown_pieces
+        self.shown_selection = self.selected_piece_pos
+        self.shown_banner = banner
+
     def handle_click(self, x, y):
         row, col = y // self.square_size, x // self.square_size
 
@@ -100,6 +196,7 @@ class ChessGUI:
                 and target[0] == promotion_row
                 and abs(self.selected_piece_pos[0] - promotion_row) == 1):
                 promotion_choice = self.promotion_prompt(piece.color)
+                self.full_redraw = True  # the prompt covered the board
             try:
                 action = (self.selected_piece_pos, target, promotion_choice)
                 self.chess_board.move(action)
@@ -111,9 +208,7 @@ class ChessGUI:
             # after 2nd click, check for end-of-game
 
             # Force visual update before checking end conditions
-            self.draw_board()
-            self.draw_pieces()
-            pygame.display.flip()
+            self.render()
 
             opp_color = "white" if piece.color == "black" else "black"
             if self.chess_board.in_checkmate(opp_color):
@@ -134,6 +229,7 @@ class ChessGUI:
         self.screen.blit(overlay, (0, 0))
         self.screen.blit(text, text_rect)
         pygame.display.flip()
+        self.full_redraw = True
 
         waiting = True
         while waiting:
@@ -213,47 +309,64 @@ class ChessGUI:
         self.width, self.height = new_width, new_height
         self.update_board_size()
         self.resize_pieces()
+        self.build_board_surface()
+        self.full_redraw = True
 
     def run(self):
-        """Runs the game loop, allowing interaction and resizing."""
+        """Runs the game loop, allowing interaction and resizing. The loop sleeps until an event
+        arrives, waking up every AI_POLL_MS only while the AI is thinking."""
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
         running = True
         while running:
-            self.screen.fill("black")
+            self.render()
 
-            self.draw_board()
-            self.draw_pieces()
-            pygame.display.flip()
-
-            for event in pygame.event.get():
+            if self.ai_to_move() and not self.ai_paused:
+                events = [pygame.event.wait(AI_POLL_MS)]
+            else:
+                events = [pygame.event.wait()]
+            for event in events + pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
-                    x, y = pygame.mouse.get_pos()
-                    self.handle_click(x, y)
+                    # the board is the AI's while it is to move
+                    if not self.ai_to_move():
+                        x, y = pygame.mouse.get_pos()
+                        self.handle_click(x, y)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE and self.ai is not None:
+                    self.ai_paused = not self.ai_paused
+                    if self.ai_paused:
+                        self.ai.cancel()
                 elif event.type == pygame.VIDEORESIZE:
                     self.handle_resize(event.w, event.h)
-
-            # Let the AI move if it's their turn
-            if self.ai is not None and (
-                (self.ai_color == "white" and self.chess_board.ply % 2 == 0)
-                or (self.ai_color == "black" and self.chess_board.ply % 2 == 1)
-                ):
-                move = self.ai.choose_move(self.chess_board)
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.full_redraw = True
+                elif event.type == SPRITES_READY:
+                    self.apply_pending_pieces()
+
+            # Let the AI move if it's their turn: start a search, then check on each wake-up whether it is done
+            if self.ai_to_move() and not self.ai_paused:
+                move = None
+                if self.ai.thinking:
+                    move = self.ai.poll()
+                elif self.chess_board.has_legal_move():
+                    self.ai.start(self.chess_board, time_limit=AI_TIME_LIMIT)
                 if move:
                     self.chess_board.move(move)
 
                     # Force visual update after AI move
-                    self.draw_board()
-                    self.draw_pieces()
-                    pygame.display.flip()
+                    self.render()
 
                     opp_color = "white" if self.ai_color == "black" else "black"
                     if self.chess_board.in_checkmate(opp_color):
                         self.show_end_message(f"{self.ai_color.capitalize()} wins!")
                     elif self.chess_board.is_draw():
                         self.show_end_message("Draw!")
+                    elif PONDER:
+                        # if the human plays the expected reply, the next search is already under way
+                        self.ai.ponder(self.chess_board, time_limit=AI_TIME_LIMIT)
 
-        
+        if self.ai is not None:
+            self.ai.close()
         pygame.quit()
 
 
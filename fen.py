@@ -0,0 +1,149 @@
+"""
+FEN parsing shared by Board.from_fen and a streaming bulk loader for large FEN/EPD files.
+
+    python fen.py positions.fen            # parse every line and report lines/sec
+    python fen.py positions.fen --boards   # also build a BitBoard for each line
+
+read_fens() reads line by line through a large buffer, so memory stays flat however big the
+file is. Without a board class it yields FenPosition tuples, which skip building a board
+(piece objects, hash, evaluation, move cache) and are several times faster to produce.
+"""
+import argparse
+import time
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+from zobrist import WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+PIECE_LETTERS = frozenset("PNBRQKpnbrqk.")
+CASTLING_FLAGS = {"K": WHITE_KINGSIDE, "Q": WHITE_QUEENSIDE, "k": BLACK_KINGSIDE, "q": BLACK_QUEENSIDE}
+READ_BUFFER = 1 << 20
+
+_EXPAND_EMPTY = str.maketrans({str(n): "." * n for n in range(1, 9)})
+# placement rank text -> its 8 squares; the same ranks recur across positions, so most lines
+# are expanded with dict lookups alone. Cleared when full to keep memory bounded.
+_ROW_CACHE: dict[str, str] = {}
+ROW_CACHE_SIZE = 100_000
+
+
+class FenPosition(NamedTuple):
+    """A parsed FEN. squares has one character per square, row-major from a8 to h1 (so
+    squares[row * 8 + col]), holding the FEN piece letter or "." for an empty square."""
+    squares: str
+    white_to_move: bool
+    castling: int  # bitmask of the zobrist castling flags
+    en_passant: tuple[int, int] | None  # (row, col) of the en passant target square
+    halfmove: int
+    fullmove: int
+
+
+def parse_fen(fen: str) -> FenPosition:
+    """Parses a FEN string. The halfmove clock and fullmove number may be left out (as in EPD,
+    whose trailing operations are ignored) and default to 0 and 1. Raises ValueError if the
+    FEN is malformed."""
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f"Invalid FEN: {fen}")
+    placement, side, castling, en_passant = fields[:4]
+
+    rows = placement.split("/")
+    if len(rows) != 8 or side not in ("w", "b"):
+        raise ValueError(f"Invalid FEN: {fen}")
+    expanded = []
+    for row in rows:
+        squares = _ROW_CACHE.get(row)
+        if squares is None:
+            squares = row.translate(_EXPAND_EMPTY)
+            if len(squares) != 8 or not PIECE_LETTERS.issuperset(squares):
+                raise ValueError(f"Invalid FEN: {fen}")
+            if len(_ROW_CACHE) >= ROW_CACHE_SIZE:
+                _ROW_CACHE.clear()
+            _ROW_CACHE[row] = squares
+        expanded.append(squares)
+    squares = "".join(expanded)
+
+    rights = 0
+    if castling != "-":
+        for char in castling:
+            if char not in CASTLING_FLAGS:
+                raise ValueError(f"Invalid FEN: {fen}")
+            rights |= CASTLING_FLAGS[char]
+
+    target = None
+    if en_passant != "-":
+        if (len(en_passant) != 2 or en_passant[0] not in "abcdefgh"
+                or en_passant[1] != ("6" if side == "w" else "3")):
+            raise ValueError(f"Invalid FEN: {fen}")
+        target = (8 - int(en_passant[1]), "abcdefgh".index(en_passant[0]))
+
+    halfmove, fullmove = 0, 1
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        halfmove, fullmove = int(fields[4]), max(1, int(fields[5]))
+    return FenPosition(squares, side == "w", rights, target, halfmove, fullmove)
+
+
+def format_fen(position: FenPosition) -> str:
+    """Returns the FEN string of a FenPosition (the inverse of parse_fen)."""
+    rows = []
+    for row in range(8):
+        text, empty = "", 0
+        for char in position.squares[row * 8:row * 8 + 8]:
+            if char == ".":
+                empty += 1
+                continue
+            if empty:
+                text, empty = text + str(empty), 0
+            text += char
+        rows.append(text + (str(empty) if empty else ""))
+    castling = "".join(char for char, flag in CASTLING_FLAGS.items() if position.castling & flag) or "-"
+    en_passant = "-"
+    if position.en_passant is not None:
+        row, col = position.en_passant
+        en_passant = f"{'abcdefgh'[col]}{8 - row}"
+    side = "w" if position.white_to_move else "b"
+    return f"{'/'.join(rows)} {side} {castling} {en_passant} {position.halfmove} {position.fullmove}"
+
+
+def read_fens(source: str | Iterable[str], board_class=None, skip_invalid: bool = False) -> Iterator:
+    """
+    Yields one position per FEN line of source, a file path or any iterable of lines (an open
+    file, sys.stdin). Blank lines and lines starting with # are skipped. Yields FenPosition
+    tuples, or boards if board_class (Board, BitBoard) is given. A malformed line raises
+    ValueError with its line number, unless skip_invalid is set.
+    """
+    if isinstance(source, str):
+        with open(source, encoding="ascii", errors="replace", buffering=READ_BUFFER) as lines:
+            yield from read_fens(lines, board_class, skip_invalid)
+        return
+    build = board_class.from_fen_position if board_class is not None else None
+    for number, line in enumerate(source, 1):
+        if not line or line[0] == "#" or line.isspace():
+            continue
+        try:
+            position = parse_fen(line)
+        except ValueError:
+            if skip_invalid:
+                continue
+            raise ValueError(f"line {number}: invalid FEN: {line.strip()}") from None
+        yield build(position) if build is not None else position
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="file with one FEN (or EPD) per line")
+    parser.add_argument("--boards", action="store_true", help="build a BitBoard for every position")
+    parser.add_argument("--skip-invalid", action="store_true", help="skip malformed lines instead of stopping")
+    args = parser.parse_args()
+    board_class = None
+    if args.boards:
+        from bitboard import BitBoard
+        board_class = BitBoard
+
+    start = time.perf_counter()
+    count = sum(1 for _ in read_fens(args.path, board_class, args.skip_invalid))
+    seconds = time.perf_counter() - start
+    print(f"{count} positions in {seconds:.2f}s, {count / max(seconds, 1e-9):.0f} positions/s")
+
+
+if __name__ == "__main__":
+    main()
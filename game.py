@@ -1,29 +1,43 @@
-from board import Board
+from board import Board, FEN_PIECES
+from pgn import game_result
+
+def parse_move(board: Board, text: str) -> tuple:
+    """Returns the action for input like 'e2 e4', or 'e7 e8 q' to promote (to q, r, b or n).
+    Raises ValueError if the input is malformed; board.move checks that the action is legal."""
+    move = text.strip().lower().split()
+    if len(move) not in (2, 3):
+        raise ValueError("Invalid input! Enter move in format: 'e2 e4' (or 'e7 e8 q' to promote).")
+    piece_position = board.algebraic_to_index(move[0])
+    target = board.algebraic_to_index(move[1])
+    promo = None
+    if len(move) == 3:
+        if move[2] not in ("q", "r", "b", "n"):
+            raise ValueError("Promote to q, r, b or n.")
+        promo = FEN_PIECES[move[2].upper()][1]
+    return piece_position, target, promo
+
 
 class ChessGame:
-    def __init__(self, ply=0) -> None:
-        self.board = Board(ply)
-    
+    def __init__(self) -> None:
+        self.board = Board()
+
     def newGame(self, color="white"):
         self.board.initial_setup()
 
-        while True:
+        while game_result(self.board) == "*":
             self.board.display(color)
             color_to_move = "white: " if self.board.ply % 2 == 0 else "black: "
             while True:
                 try:
-                    move = input(color_to_move).strip().lower().split()
-                    if len(move) != 2:
-                        raise ValueError("Invalid input! Enter move in format: 'e2 e4'.")
-                    piece_position = self.board.algebraic_to_index(move[0])
-                    target = self.board.algebraic_to_index(move[1])
-                    self.board.move(piece_position, target)
+                    self.board.move(parse_move(self.board, input(color_to_move)))
                     break
                 except ValueError as e:
                     print(e)
-            
+
             print()
-            
+
+        self.board.display(color)
+        print(f"Game over: {game_result(self.board)}")
 
 
 if __name__ == "__main__":
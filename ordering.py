@@ -0,0 +1,73 @@
+from board import Board
+from pieces import King
+
+MAX_PLY = 128
+HISTORY_LIMIT = 1 << 20  # history scores are halved once any of them grows past this
+
+
+class MoveOrderer:
+    """
+    Orders moves for alpha-beta so the likely best move is searched first:
+    the hash (principal variation) move, then captures by most valuable victim / least valuable
+    attacker, then promotions, then the two killer moves of the ply, then the remaining quiet
+    moves by their history score. Killers and history are learned from beta cutoffs.
+    """
+    def __init__(self) -> None:
+        self.killers: list[list] = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [0] * (2 * 64 * 64)  # [color][from square][to square]
+
+    def new_search(self) -> None:
+        """Forgets killers, which are position specific, and ages the history scores."""
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [score >> 1 for score in self.history]
+
+    @staticmethod
+    def _history_index(gameState: Board, action) -> int:
+        (from_row, from_col), (to_row, to_col), _ = action
+        return (gameState.ply % 2) * 4096 + (from_row * 8 + from_col) * 64 + to_row * 8 + to_col
+
+    @staticmethod
+    def is_quiet(gameState: Board, action) -> bool:
+        return action[2] is None and not gameState.is_capture(action)
+
+    def order(self, gameState: Board, moves: list, hash_move=None, ply: int = 0) -> list:
+        """Returns moves sorted best first."""
+        piece_map = gameState.piece_map
+        killers = self.killers[ply] if ply < MAX_PLY else [None, None]
+        history = self.history
+        side = (gameState.ply % 2) * 4096
+
+        def score(action):
+            if action == hash_move:
+                return (5, 0)
+            position, target, promo = action
+            victim = piece_map.get(target)
+            if victim is not None or gameState.is_en_passant(action):
+                attacker = piece_map[position]
+                attacker_value = 10 if isinstance(attacker, King) else attacker.value
+                victim_value = victim.value if victim is not None else 1
+                return (4, victim_value * 10 - attacker_value + (promo.value if promo else 0))
+            if promo is not None:
+                return (3, promo.value)
+            if action == killers[0]:
+                return (2, 1)
+            if action == killers[1]:
+                return (2, 0)
+            (from_row, from_col), (to_row, to_col) = position, target
+            return (1, history[side + (from_row * 8 + from_col) * 64 + to_row * 8 + to_col])
+
+        return sorted(moves, key=score, reverse=True)
+
+    def record_cutoff(self, gameState: Board, action, ply: int, draft: int) -> None:
+        """Learns from a quiet move that caused a beta cutoff at ply with draft plies left."""
+        if not self.is_quiet(gameState, action):
+            return
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != action:
+                killers[1] = killers[0]
+                killers[0] = action
+        index = self._history_index(gameState, action)
+        self.history[index] += draft * draft
+        if self.history[index] > HISTORY_LIMIT:
+            self.history = [score >> 1 for score in self.history]
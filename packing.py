@@ -0,0 +1,149 @@
+"""
+Fixed-size binary encoding of positions, for storing large position sets and passing positions
+between processes.
+
+    python packing.py positions.fen positions.bin    # convert a FEN/EPD file, reporting positions/s
+
+A packed position is PACKED_SIZE (38) bytes:
+
+    32 bytes  placement, two squares per byte (a8 in the high nibble of byte 0, h1 in the low
+              nibble of byte 31); 0 is an empty square, Piece.code + 1 a piece (1-6 white
+              P N B R Q K, 7-12 black)
+     1 byte   flags: bit 0 black to move, bits 1-4 the castling rights bitmask
+     1 byte   en passant file + 1, or 0
+     2 bytes  halfmove clock (little-endian)
+     2 bytes  fullmove number (little-endian)
+
+Board.pack() and Board.unpack() convert boards; pack_position/unpack_position convert FenPosition
+tuples without building a board. Files of packed positions are plain concatenations, so they can
+be memory-mapped, and position_array() views one as a NumPy structured array.
+
+NumPy is an optional dependency, left out of requirements.txt and environment.yml: install it
+(pip install numpy) to use position_array() and position_dtype(), the only functions that
+import it. Everything else here works without it.
+"""
+import argparse
+import mmap
+import struct
+import time
+from collections.abc import Iterable, Iterator
+from fen import FenPosition, read_fens
+
+PACKED_FORMAT = struct.Struct("<32sBBHH")
+PACKED_SIZE = PACKED_FORMAT.size
+SQUARE_LETTERS = ".PNBRQKpnbrqk"  # by square code
+
+# FEN letter (or ".") -> square code, as a str.translate table producing one character per square
+_LETTER_CODES = str.maketrans({letter: chr(code) for code, letter in enumerate(SQUARE_LETTERS)})
+# masks picking the two nibbles of each square pair out of the 64 codes read as one integer
+_HIGH_NIBBLES = int.from_bytes(b"\x00\xf0" * 32, "big")
+_LOW_NIBBLES = int.from_bytes(b"\x00\x0f" * 32, "big")
+# packed placement byte -> the letters of its two squares
+_BYTE_SQUARES = [SQUARE_LETTERS[byte >> 4] + SQUARE_LETTERS[byte & 15] if byte >> 4 < 13 and byte & 15 < 13
+                 else None for byte in range(256)]
+
+
+def pack_codes(codes: bytes | bytearray, white_to_move: bool, castling: int, en_passant_file: int | None,
+               halfmove: int, fullmove: int) -> bytes:
+    """Packs 64 square codes (row-major from a8) and the remaining position fields."""
+    # as 16-bit lanes each pair is high << 8 | low; shifting the whole integer right by 4 moves
+    # high next to low in the lane's low byte, in one pass over all 32 pairs
+    lanes = int.from_bytes(codes, "big")
+    placement = ((lanes >> 4) & _HIGH_NIBBLES | lanes & _LOW_NIBBLES).to_bytes(64, "big")[1::2]
+    return PACKED_FORMAT.pack(placement, (not white_to_move) | castling << 1,
+                              0 if en_passant_file is None else en_passant_file + 1,
+                              min(halfmove, 0xFFFF), min(fullmove, 0xFFFF))
+
+
+def pack_position(position: FenPosition) -> bytes:
+    """Returns the packed form of a FenPosition."""
+    codes = position.squares.translate(_LETTER_CODES).encode("latin-1")
+    en_passant_file = None if position.en_passant is None else position.en_passant[1]
+    return pack_codes(codes, position.white_to_move, position.castling, en_passant_file,
+                      position.halfmove, position.fullmove)
+
+
+def unpack_position(data: bytes | memoryview) -> FenPosition:
+    """Returns the FenPosition of a packed position. Raises ValueError if data is not one."""
+    if len(data) != PACKED_SIZE:
+        raise ValueError(f"A packed position is {PACKED_SIZE} bytes, not {len(data)}")
+    placement, flags, en_passant, halfmove, fullmove = PACKED_FORMAT.unpack(data)
+    try:
+        squares = "".join([_BYTE_SQUARES[byte] for byte in placement])
+    except TypeError:
+        raise ValueError("Invalid square code in packed position") from None
+    white_to_move = not flags & 1
+    target = None
+    if en_passant:
+        if en_passant > 8:
+            raise ValueError("Invalid en passant file in packed position")
+        target = (2 if white_to_move else 5, en_passant - 1)
+    return FenPosition(squares, white_to_move, flags >> 1 & 15, target, halfmove, fullmove)
+
+
+def write_packed(path: str, positions: Iterable) -> int:
+    """Writes positions (FenPosition tuples or boards) to a packed position file and returns
+    how many were written."""
+    count = 0
+    with open(path, "wb") as out:
+        for position in positions:
+            out.write(pack_position(position) if isinstance(position, FenPosition) else position.pack())
+            count += 1
+    return count
+
+
+def read_packed(path: str) -> Iterator[FenPosition]:
+    """Yields the positions of a packed position file, reading it through mmap."""
+    with open(path, "rb") as packed:
+        if packed.seek(0, 2) == 0:
+            return
+        with mmap.mmap(packed.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) % PACKED_SIZE:
+                raise ValueError(f"{path} is not a whole number of {PACKED_SIZE}-byte positions")
+            view = memoryview(data)
+            try:
+                for offset in range(0, len(data), PACKED_SIZE):
+                    yield unpack_position(view[offset:offset + PACKED_SIZE])
+            finally:
+                view.release()
+
+
+def position_dtype():
+    """Returns the NumPy structured dtype of one packed position."""
+    import numpy as np
+
+    return np.dtype([("placement", "u1", (32,)), ("flags", "u1"), ("en_passant", "u1"),
+                     ("halfmove", "<u2"), ("fullmove", "<u2")])
+
+
+def position_array(source: str | bytes | Iterable[bytes], memory_map: bool = True):
+    """
+    Returns packed positions as a NumPy structured array (see position_dtype) from a packed
+    position file (memory-mapped read-only unless memory_map is False), a bytes object of
+    concatenated positions, or an iterable of packed positions.
+    """
+    import numpy as np
+
+    dtype = position_dtype()
+    if isinstance(source, str):
+        if memory_map:
+            return np.memmap(source, dtype=dtype, mode="r")
+        return np.fromfile(source, dtype=dtype)
+    if not isinstance(source, (bytes, bytearray)):
+        source = b"".join(source)
+    return np.frombuffer(source, dtype=dtype)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fen_path", help="file with one FEN (or EPD) per line")
+    parser.add_argument("packed_path", help="packed position file to write")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    count = write_packed(args.packed_path, read_fens(args.fen_path))
+    seconds = max(time.perf_counter() - start, 1e-9)
+    print(f"{count} positions ({count * PACKED_SIZE} bytes) in {seconds:.2f}s, {count / seconds:.0f} positions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Perft: counts the leaf nodes of the legal move tree to a fixed depth, to check move generation
+against published node counts and to measure its speed.
+
+    python perft.py                          # all known positions to depth 3, checked against their counts
+    python perft.py --position kiwipete -d 3 --divide
+    python perft.py --fen "<FEN>" -d 4 --board dict
+"""
+import argparse
+import time
+from board import Board, move_name
+from bitboard import BitBoard
+
+# name: (FEN, node counts at depth 1, 2, ...)
+POSITIONS = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902, 197281, 4865609]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862, 4085603]),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    "promotions": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    "castling": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+}
+BOARD_CLASSES = {"bitboard": BitBoard, "dict": Board}
+
+
+def perft(board: Board, depth: int) -> int:
+    """Returns the number of leaf nodes depth plies below the current position."""
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return sum(len(moves) for moves in board.legal_moves.values())
+    nodes = 0
+    for action in list(board.get_all_legal_moves()):
+        board.move(action)
+        nodes += perft(board, depth - 1)
+        board.unmake()
+    return nodes
+
+
+def divide(board: Board, depth: int) -> dict[str, int]:
+    """Returns the perft count below each root move, keyed by the move in coordinate notation."""
+    counts = {}
+    for action in list(board.get_all_legal_moves()):
+        board.move(action)
+        counts[move_name(action)] = perft(board, depth - 1)
+        board.unmake()
+    return counts
+
+
+def run(board: Board, depth: int, show_divide: bool = False) -> tuple[int, float]:
+    """Runs perft (printing the per-move counts with show_divide) and returns (nodes, seconds)."""
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(board, depth)
+        for name in sorted(counts):
+            print(f"{name}: {counts[name]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, depth)
+    return nodes, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--position", choices=sorted(POSITIONS), help="a known position")
+    source.add_argument("--fen", help="any position")
+    parser.add_argument("-d", "--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the count below each root move")
+    parser.add_argument("--board", choices=sorted(BOARD_CLASSES), default="bitboard", help="move generator backend")
+    args = parser.parse_args()
+    board_class = BOARD_CLASSES[args.board]
+
+    if args.fen:
+        nodes, seconds = run(board_class.from_fen(args.fen), args.depth, args.divide)
+        print(f"nodes {nodes}  time {seconds:.2f}s  nps {nodes / seconds:.0f}")
+        return
+
+    failed = False
+    for name in [args.position] if args.position else POSITIONS:
+        fen, expected = POSITIONS[name]
+        depth = args.depth
+        nodes, seconds = run(board_class.from_fen(fen), depth, args.divide)
+        status = "" if depth > len(expected) else ("ok" if nodes == expected[depth - 1] else
+                                                   f"FAIL, expected {expected[depth - 1]}")
+        failed |= status.startswith("FAIL")
+        print(f"{name:<11} depth {depth}  nodes {nodes:>9}  time {seconds:7.2f}s  "
+              f"nps {nodes / seconds:>8.0f}  {status}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
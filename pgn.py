@@ -0,0 +1,268 @@
+"""
+Streaming PGN reading and writing, with SAN (standard algebraic notation) moves.
+
+    python pgn.py games.pgn            # parse every game and report games/sec
+    python pgn.py games.pgn --replay   # also resolve and play every move on a BitBoard
+
+read_games() reads the file line by line through a large buffer and yields one PgnGame at a
+time, so memory stays bounded by the largest single game however big the file is. A game's
+moves stay SAN strings until replay() resolves them against the legal moves of a board, so
+jobs that only need the headers or the move text do not pay for move generation.
+"""
+import argparse
+import re
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from board import Board, FEN_PIECES
+from bitboard import BitBoard
+from pieces import King, Pawn
+
+READ_BUFFER = 1 << 20
+LINE_WIDTH = 80
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+# comments, variation brackets, NAGs, move numbers and everything else (moves, results)
+_TOKEN_RE = re.compile(r"\{[^}]*\}?|;[^\n]*|[()]|\$\d+|\d+\.+|[^\s(){};$]+")
+_MOVE_NUMBER_RE = re.compile(r"\d+\.+")
+_HEADER_RE = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_SAN_RE = re.compile(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?")
+_FILES = "abcdefgh"
+
+
+@dataclass
+class PgnGame:
+    """One game of a PGN file: its tag pairs, its main-line moves in SAN (comments, NAGs and
+    variations dropped) and its result."""
+    headers: dict[str, str] = field(default_factory=dict)
+    moves: list[str] = field(default_factory=list)
+    result: str = "*"
+
+
+def square_name(pos: tuple[int, int]) -> str:
+    return f"{_FILES[pos[1]]}{8 - pos[0]}"
+
+
+def san(board: Board, action) -> str:
+    """Returns the SAN of a legal move in the current position of board, e.g. Nbd7, exd6,
+    e8=Q+ or O-O#. The board is left as it was."""
+    position, target, promo = action
+    piece = board.piece_map[position]
+    if isinstance(piece, King) and abs(position[1] - target[1]) == 2:
+        text = "O-O" if target[1] == 6 else "O-O-O"
+    else:
+        capture = board.is_capture(action)
+        if isinstance(piece, Pawn):
+            text = f"{_FILES[position[1]]}x" if capture else ""
+        else:
+            text = str(piece).upper()
+            # other pieces of the same kind that can reach the target need telling apart
+            rivals = [pos for pos, moves in board.legal_moves.items()
+                      if pos != position and type(board.piece_map[pos]) is type(piece)
+                      and any(move_target == target for move_target, _ in moves)]
+            if rivals:
+                if all(pos[1] != position[1] for pos in rivals):
+                    text += _FILES[position[1]]
+                elif all(pos[0] != position[0] for pos in rivals):
+                    text += str(8 - position[0])
+                else:
+                    text += square_name(position)
+            text += "x" if capture else ""
+        text += square_name(target)
+        if promo is not None:
+            text += "=" + str(promo("white"))
+    board.move(action)
+    if board.in_check("white" if board.ply % 2 == 0 else "black"):
+        text += "+" if board.has_legal_move() else "#"
+    board.unmake()
+    return text
+
+
+def parse_san(board: Board, text: str):
+    """Returns the legal move of board that the SAN text describes, as a (position, target,
+    promo) action. Check marks and annotations (+, #, !, ?) are ignored, castling may use O or
+    0, and a promotion without a piece letter is taken as a queen. Raises ValueError if the
+    move is malformed, illegal or ambiguous."""
+    stripped = text.rstrip("+#!?")
+    legal = board.legal_moves
+    if stripped in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        color = "white" if board.ply % 2 == 0 else "black"
+        king_pos = board.king_positions[color]
+        target = (king_pos[0], 6 if len(stripped) == 3 else 2)
+        if (target, None) in legal.get(king_pos, ()) and abs(king_pos[1] - target[1]) == 2:
+            return (king_pos, target, None)
+        raise ValueError(f"Illegal move: {text}")
+
+    match = _SAN_RE.fullmatch(stripped)
+    if match is None:
+        raise ValueError(f"Invalid SAN: {text}")
+    letter, from_file, from_rank, target_name, promo_letter = match.groups()
+    piece_class = FEN_PIECES[letter][1] if letter else Pawn
+    target = (8 - int(target_name[1]), _FILES.index(target_name[0]))
+    promo_class = FEN_PIECES[promo_letter.upper()][1] if promo_letter else None
+
+    candidates = []
+    for pos, moves in legal.items():
+        if (type(board.piece_map[pos]) is not piece_class
+                or (from_file is not None and pos[1] != _FILES.index(from_file))
+                or (from_rank is not None and pos[0] != 8 - int(from_rank))):
+            continue
+        for move_target, promo in moves:
+            if move_target == target and promo is promo_class:
+                candidates.append((pos, target, promo))
+    if not candidates and promo_class is None and piece_class is Pawn and target[0] in (0, 7):
+        return parse_san(board, stripped + "=Q")
+    if len(candidates) != 1:
+        raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} move: {text}")
+    return candidates[0]
+
+
+def _parse_game(header_lines: list[str], movetext_lines: list[str]) -> PgnGame:
+    game = PgnGame()
+    for line in header_lines:
+        for name, value in _HEADER_RE.findall(line):
+            game.headers[name] = value.replace('\\"', '"').replace("\\\\", "\\")
+    depth = 0  # of nested variations, whose moves are skipped
+    for token in _TOKEN_RE.findall("\n".join(movetext_lines)):
+        first = token[0]
+        if first == "(":
+            depth += 1
+        elif first == ")":
+            depth = max(0, depth - 1)
+        elif depth or first in "{;$" or _MOVE_NUMBER_RE.fullmatch(token):
+            continue
+        elif token in RESULTS:
+            game.result = token
+        else:
+            game.moves.append(token)
+    if game.result == "*":
+        game.result = game.headers.get("Result", "*")
+    return game
+
+
+def read_games(source: str | Iterable[str]) -> Iterator[PgnGame]:
+    """
+    Yields the games of source, a PGN file path or any iterable of lines (an open file,
+    sys.stdin), one at a time. Only the lines of the current game are held in memory.
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8", errors="replace", buffering=READ_BUFFER) as lines:
+            yield from read_games(lines)
+        return
+    header_lines, movetext_lines = [], []
+    in_comment = False  # a brace comment spanning lines, in which "[" does not start a header
+    for line in source:
+        if not in_comment and line.startswith("["):
+            if movetext_lines:
+                yield _parse_game(header_lines, movetext_lines)
+                header_lines, movetext_lines = [], []
+            header_lines.append(line)
+        elif line.startswith("%"):  # escape mechanism: the line is ignored
+            continue
+        elif not line.isspace() and line:
+            movetext_lines.append(line)
+            if "{" in line or "}" in line:
+                in_comment = line.rfind("{") > line.rfind("}")
+    if header_lines or movetext_lines:
+        yield _parse_game(header_lines, movetext_lines)
+
+
+def start_board(game: PgnGame, board_class=BitBoard) -> Board:
+    """Returns the starting position of game: its FEN tag if it has one, else the initial position."""
+    if "FEN" in game.headers:
+        return board_class.from_fen(game.headers["FEN"])
+    board = board_class()
+    board.initial_setup()
+    return board
+
+
+def replay(game: PgnGame, board_class=BitBoard) -> Iterator[tuple[Board, tuple]]:
+    """Plays through the moves of game, yielding (board, action) before each move is made on
+    board (the same board object every time). Raises ValueError at the first move that does
+    not resolve to a legal move."""
+    board = start_board(game, board_class)
+    for text in game.moves:
+        try:
+            action = parse_san(board, text)
+        except ValueError as error:
+            raise ValueError(f"move {board.ply // 2 + 1}{'.' if board.ply % 2 == 0 else '...'} {error}") from None
+        yield board, action
+        board.move(action)
+
+
+def game_result(board: Board) -> str:
+    """Returns the PGN result of the position: a win by checkmate, a draw, or * if the game is not over."""
+    color = "white" if board.ply % 2 == 0 else "black"
+    if board.in_checkmate(color):
+        return "0-1" if color == "white" else "1-0"
+    return "1/2-1/2" if board.is_draw() else "*"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def format_game(actions: Iterable, headers: dict[str, str] | None = None, result: str | None = None,
+                fen: str | None = None, board_class=BitBoard) -> str:
+    """
+    Returns a PGN game for moves played from the initial position (or from fen), such as the
+    moves ChessAI.choose_move chose in a game. The seven standard tags come first, filled with
+    "?" unless given in headers; result defaults to the result of the final position.
+    """
+    board = board_class.from_fen(fen) if fen else board_class()
+    if not fen:
+        board.initial_setup()
+    tokens = []
+    for action in actions:
+        if board.ply % 2 == 0 or not tokens:
+            tokens.append(f"{board.ply // 2 + 1}{'.' if board.ply % 2 == 0 else '...'}")
+        tokens.append(san(board, action))
+        board.move(action)
+    if result is None:
+        result = game_result(board)
+    tokens.append(result)
+
+    tags = {"Event": "?", "Site": "?", "Date": "????.??.??", "Round": "?", "White": "?", "Black": "?"}
+    tags.update(headers or {})
+    tags["Result"] = result
+    if fen:
+        tags.update(SetUp="1", FEN=fen)
+    lines = [f'[{name} "{_escape(value)}"]' for name, value in tags.items()]
+    lines.append("")
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="PGN file")
+    parser.add_argument("--replay", action="store_true", help="resolve and play every move on a BitBoard")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games = moves = errors = 0
+    for game in read_games(args.path):
+        games += 1
+        if not args.replay:
+            moves += len(game.moves)
+            continue
+        try:
+            for _ in replay(game):
+                moves += 1
+        except ValueError as error:
+            errors += 1
+            print(f"game {games}: {error}")
+    seconds = max(time.perf_counter() - start, 1e-9)
+    print(f"{games} games, {moves} moves in {seconds:.2f}s: {games / seconds:.0f} games/s, "
+          f"{moves / seconds:.0f} moves/s" + (f", {errors} games with illegal moves" if errors else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,46 @@
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)  # Piece.type_code of each piece type
+# (piece class, color) -> the one instance of that piece, see Piece.__new__
+_FLYWEIGHTS = {}
+
+
 class Piece:
-    def __init__(self, color, has_moved=False) -> None:
-        self.color = color
-        self.has_moved = has_moved
+    """
+    A piece type and color. Pieces are immutable flyweights: Rook("white") always returns the same
+    object, so boards share them and copying a board never copies a piece. What used to be per-piece
+    state (whether a king or rook has moved, which pawn just moved two) lives on the Board as
+    castling_rights and en_passant.
+    """
+    __slots__ = ("color", "color_index", "code", "letter")
+    type_code = -1  # PAWN ... KING
+    symbol = "?"
+
+    def __new__(cls, color):
+        piece = _FLYWEIGHTS.get((cls, color))
+        if piece is None:
+            if color not in ("white", "black"):
+                raise ValueError(f"Invalid color: {color}")
+            piece = object.__new__(cls)
+            color_index = 0 if color == "white" else 1
+            for name, value in (("color", color), ("color_index", color_index),
+                                ("code", color_index * 6 + cls.type_code),  # 0-11, for table lookups
+                                ("letter", cls.symbol if color == "white" else cls.symbol.lower())):
+                object.__setattr__(piece, name, value)
+            _FLYWEIGHTS[(cls, color)] = piece
+        return piece
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # unpickling (and copying) goes through __new__, so it returns the shared instance
+        return type(self), (self.color,)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.color!r})"
 
     def __str__(self):
         """Returns a one-letter representation of the piece for board display."""
-        symbol_map = {
-            "King": "K",
-            "Queen": "Q",
-            "Rook": "R",
-            "Bishop": "B",
-            "Knight": "N",
-            "Pawn": "P",
-        }
-        piece_symbol = symbol_map.get(self.__class__.__name__, "?")
-        return piece_symbol if self.color == "white" else piece_symbol.lower()
+        return self.letter
 
     @staticmethod
     def in_bounds(position):
@@ -56,6 +82,9 @@ class Piece:
 
 
 class Rook(Piece):
+    __slots__ = ()
+    type_code = ROOK
+    symbol = "R"
     value = 5
     directions = [(0,1),(0,-1),(1, 0),(-1,0)]
     def valid_moves(self, piece_position, board_object):
@@ -63,6 +92,9 @@ class Rook(Piece):
     
 
 class Bishop(Piece):
+    __slots__ = ()
+    type_code = BISHOP
+    symbol = "B"
     value = 3
     directions = [(1,1),(1,-1),(-1,1),(-1,-1)]
     def valid_moves(self, piece_position, board_object):
@@ -70,6 +102,9 @@ class Bishop(Piece):
 
 
 class Queen(Piece):
+    __slots__ = ()
+    type_code = QUEEN
+    symbol = "Q"
     value = 9
     directions = [(0,1),(0,-1),(1, 0),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
     def valid_moves(self, piece_position, board_object):
@@ -77,6 +112,9 @@ class Queen(Piece):
         
     
 class Knight(Piece):
+    __slots__ = ()
+    type_code = KNIGHT
+    symbol = "N"
     value = 3
     directions = [(1,2), (1,-2), (-1, 2), (-1,-2), (2,1), (2,-1), (-2,1), (-2,-1)]
     def valid_moves(self, piece_position, board_object):
@@ -84,6 +122,9 @@ class Knight(Piece):
 
 
 class King(Piece):
+    __slots__ = ()
+    type_code = KING
+    symbol = "K"
     value = 0
     directions = [(0,1),(0,-1),(1, 0),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
     def valid_moves(self, piece_position, board_object):
@@ -91,11 +132,10 @@ class King(Piece):
     
 
 class Pawn(Piece):
+    __slots__ = ()
+    type_code = PAWN
+    symbol = "P"
     value = 1
-    def __init__(self, color, has_moved=False, moved_two_ply=-1) -> None:
-        super().__init__(color, has_moved)
-        self.moved_two_ply = moved_two_ply
-
     def valid_moves(self, piece_position, board_object):
         moves = []
         row, col = piece_position
@@ -113,8 +153,8 @@ class Pawn(Piece):
             else:
                 moves.append((one_forward, None))
 
-            # two forward
-            if not self.has_moved:
+            # two forward, from the starting rank
+            if row == (6 if self.color == "white" else 1):
                 two_forward = (row + 2*direction, col)
                 if self.in_bounds(two_forward) and two_forward not in board:
                     moves.append((two_forward, None))
@@ -125,11 +165,7 @@ class Pawn(Piece):
             if diagonal_move in board and board[diagonal_move].color != self.color:
                 moves.append((diagonal_move, None))
             # En passant
-            side_pawn_pos = (row, col + dc)
-            if (side_pawn_pos in board 
-                and board[side_pawn_pos].color != self.color
-                and isinstance(board[side_pawn_pos], Pawn)
-                and board[side_pawn_pos].moved_two_ply == board_object.ply - 1):
+            if diagonal_move == board_object.en_passant:
                 moves.append((diagonal_move, None))
         
         return moves
@@ -0,0 +1,321 @@
+"""
+Headless engine-vs-engine matches for testing ChessAI changes.
+
+    python selfplay.py --games 200 --depth 3 --depth-b 2
+    python selfplay.py --games 100 --time 0.5 --openings book.pgn --opening-plies 8
+    python selfplay.py --games 100 -b quiescence=false --results quiescence.tsv
+    python selfplay.py --games 100 --opening-plies 0 -a book=book.bin -b book=book.bin
+
+Engine A and engine B play each opening twice, once with each color, on a pool of worker
+processes (all cores by default). Each finished game is appended to the results file at once,
+one tab-separated line per game, so a crash loses nothing: a worker that dies has its games
+replayed on a fresh pool, and running the same command again skips the games already in the
+file. The score is reported from A's side, with the Elo difference and its 95% error bar.
+
+Openings are random legal moves from the start (--opening-plies, reproducible with --seed), or
+the first moves of the games in a PGN file or the positions of a FEN file (--openings).
+"""
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from ai import ChessAI
+from bitboard import BitBoard
+from board import move_name
+from fen import START_FEN, format_fen, read_fens
+from pgn import game_result, read_games, replay
+
+RESULTS_FILE = "selfplay_results.tsv"
+MAX_PLIES = 400  # games still going after this many plies are scored as draws
+MAX_ATTEMPTS = 3  # times a game is retried after its worker crashed
+SCORES = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+
+@dataclass
+class EngineConfig:
+    """One side of a match: a ChessAI searching to depth plies, or for time_limit seconds per
+    move (up to depth, if given), built with the extra ChessAI keyword arguments in options."""
+    depth: int | None = 3
+    time_limit: float | None = None
+    options: dict = field(default_factory=dict)
+
+    def describe(self) -> str:
+        parts = [f"depth {self.depth}"] if self.depth else []
+        parts += [f"{self.time_limit}s/move"] if self.time_limit else []
+        parts += [f"{name}={value}" for name, value in self.options.items()]
+        return ", ".join(parts)
+
+
+@dataclass
+class GameSpec:
+    game_id: int
+    opening: str  # FEN of the starting position
+    a_is_white: bool
+
+
+@dataclass
+class GameRecord:
+    game_id: int
+    opening: str
+    white: str  # "A" or "B"
+    result: str  # PGN result, from white's side
+    reason: str  # checkmate, draw or ply limit
+    moves: list[str]  # in coordinate notation
+
+    @property
+    def a_score(self) -> float:
+        score = SCORES[self.result]
+        return score if self.white == "A" else 1 - score
+
+    def to_line(self) -> str:
+        return "\t".join([str(self.game_id), self.opening, self.white, self.result, self.reason,
+                          " ".join(self.moves)]) + "\n"
+
+    @classmethod
+    def from_line(cls, line: str) -> "GameRecord":
+        game_id, opening, white, result, reason, moves = line.rstrip("\n").split("\t")
+        if white not in ("A", "B") or result not in SCORES:
+            raise ValueError(f"Invalid result line: {line!r}")
+        return cls(int(game_id), opening, white, result, reason, moves.split())
+
+
+# per worker process: engines by side, kept across games so they are built only once
+_engines: dict[str, tuple[EngineConfig, ChessAI]] = {}
+
+
+def _engine(side: str, config: EngineConfig) -> ChessAI:
+    cached = _engines.get(side)
+    if cached is None or cached[0] != config:
+        cached = _engines[side] = (config, ChessAI(config.depth or 3, **config.options))
+    return cached[1]
+
+
+def play_game(spec: GameSpec, engine_a: EngineConfig, engine_b: EngineConfig, max_plies: int = MAX_PLIES) -> GameRecord:
+    """Plays one game from spec.opening and returns its record. Runs in a worker process."""
+    board = BitBoard.from_fen(spec.opening)
+    white, black = (("A", engine_a), ("B", engine_b)) if spec.a_is_white else (("B", engine_b), ("A", engine_a))
+    ais = {side: _engine(side, config) for side, config in (white, black)}
+    for ai in ais.values():
+        ai.tt.clear()  # so games do not depend on which games the worker played before
+        ai.book_rng.seed(spec.game_id)  # and book moves are the same when a game is replayed
+    moves = []
+    while (result := game_result(board)) == "*" and len(moves) < max_plies:
+        side, config = white if board.ply % 2 == 0 else black
+        action = ais[side].choose_move(board, time_limit=config.time_limit,
+                                       max_depth=config.depth if config.time_limit else None)
+        moves.append(move_name(action))
+        board.move(action)
+    if result == "*":
+        result, reason = "1/2-1/2", "ply limit"
+    else:
+        reason = "draw" if result == "1/2-1/2" else "checkmate"
+    return GameRecord(spec.game_id, spec.opening, white[0], result, reason, moves)
+
+
+def random_openings(count: int, plies: int, seed: int = 0) -> list[str]:
+    """Returns count FENs reached by plies random legal moves from the initial position."""
+    rng = random.Random(seed)
+    openings = []
+    while len(openings) < count:
+        board = BitBoard()
+        board.initial_setup()
+        for _ in range(plies):
+            moves = list(board.get_all_legal_moves())
+            if not moves:
+                break
+            board.move(rng.choice(moves))
+        if game_result(board) == "*":
+            openings.append(board.to_fen())
+    return openings
+
+
+def book_openings(path: str, plies: int, count: int | None = None) -> list[str]:
+    """Returns the FENs after the first plies moves of the games of a PGN file, or the positions
+    of a FEN file (anything not ending in .pgn), at most count of them."""
+    openings = []
+    if path.lower().endswith(".pgn"):
+        for game in read_games(path):
+            board = None
+            # replay() makes each move after yielding it, so stopping at plies leaves that many made
+            for played, (board, _) in enumerate(replay(game)):
+                if played == plies:
+                    break
+            if board is not None:
+                openings.append(board.to_fen())
+            if count is not None and len(openings) >= count:
+                break
+    else:
+        for position in read_fens(path):
+            openings.append(format_fen(position))
+            if count is not None and len(openings) >= count:
+                break
+    return openings
+
+
+def elo_difference(wins: int, draws: int, losses: int) -> tuple[float, float]:
+    """Returns the Elo difference implied by a score and the half-width of its 95% confidence
+    interval (from the standard error of the per-game score). Both are infinite at a 0% or 100% score."""
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(s: float) -> float:
+        if s <= 0 or s >= 1:
+            return math.copysign(math.inf, s - 0.5)
+        return 400 * math.log10(s / (1 - s))
+
+    if score in (0.0, 1.0):
+        return elo(score), math.inf
+    low, high = elo(max(score - margin, 0.0)), elo(min(score + margin, 1.0))
+    return elo(score), (high - low) / 2
+
+
+def summary(records: list[GameRecord]) -> str:
+    wins = sum(record.a_score == 1 for record in records)
+    losses = sum(record.a_score == 0 for record in records)
+    draws = len(records) - wins - losses
+    elo, margin = elo_difference(wins, draws, losses)
+    return f"{len(records)} games  A +{wins} ={draws} -{losses}  Elo {elo:+.0f} ± {margin:.0f}"
+
+
+def read_results(path: str) -> dict[int, GameRecord]:
+    """Returns the games already recorded in a results file, by game id."""
+    if not os.path.exists(path):
+        return {}
+    records = {}
+    with open(path) as results:
+        for line in results:
+            try:
+                record = GameRecord.from_line(line)
+            except ValueError:  # a line cut short when the runner itself was killed
+                continue
+            records[record.game_id] = record
+    return records
+
+
+def _ends_mid_line(path: str) -> bool:
+    with open(path, "rb") as results:
+        if results.seek(0, os.SEEK_END) == 0:
+            return False
+        results.seek(-1, os.SEEK_END)
+        return results.read(1) != b"\n"
+
+
+def run_match(specs: list[GameSpec], engine_a: EngineConfig, engine_b: EngineConfig, results_path: str,
+              workers: int | None = None, max_plies: int = MAX_PLIES, play=play_game, progress=None) -> list[GameRecord]:
+    """
+    Plays every game of specs not yet in results_path on a pool of worker processes, appending
+    each record to the file as it finishes, and returns all the records of specs. progress, if
+    given, is called with every new record.
+
+    A game that raises is retried up to MAX_ATTEMPTS times in all. When a worker dies the pool
+    breaks and every unfinished game fails with it, so those are replayed on a new pool without
+    counting an attempt. If no game finished before the break, the next game is then played on
+    its own, so a game that crashes its worker is found out and counted.
+    """
+    recorded = read_results(results_path)
+    pending = [spec for spec in specs if spec.game_id not in recorded]
+    attempts = {spec.game_id: 0 for spec in pending}
+    isolate = False
+    with open(results_path, "a") as results:
+        if _ends_mid_line(results_path):
+            results.write("\n")  # so the next record does not continue a line cut short
+        while pending:
+            retry, finished, broken = [], 0, False
+            batch, rest = (pending[:1], pending[1:]) if isolate else (pending, [])
+            with ProcessPoolExecutor(1 if isolate else workers or os.cpu_count()) as pool:
+                futures = {pool.submit(play, spec, engine_a, engine_b, max_plies): spec for spec in batch}
+                for future in as_completed(futures):
+                    spec = futures[future]
+                    try:
+                        record = future.result()
+                    except Exception as error:
+                        # any of the games may have crashed the worker, unless this one was played alone
+                        if isinstance(error, BrokenProcessPool) and not isolate:
+                            broken = True
+                        else:
+                            attempts[spec.game_id] += 1
+                        if attempts[spec.game_id] < MAX_ATTEMPTS:
+                            retry.append(spec)
+                        continue
+                    finished += 1
+                    results.write(record.to_line())
+                    results.flush()
+                    recorded[record.game_id] = record
+                    if progress is not None:
+                        progress(record)
+            isolate = broken and not finished and not isolate
+            pending = sorted(retry + rest, key=lambda spec: spec.game_id)
+    return [recorded[spec.game_id] for spec in specs if spec.game_id in recorded]
+
+
+def parse_options(pairs: list[str]) -> dict:
+    """Parses ["quiescence=false", "tt_size_mb=64", "book=book.bin"] into ChessAI keyword arguments."""
+    options = {}
+    for pair in pairs:
+        name, _, text = pair.partition("=")
+        if text.lower() in ("true", "false"):
+            options[name] = text.lower() == "true"
+        else:
+            try:
+                options[name] = int(text)
+            except ValueError:
+                try:
+                    options[name] = float(text)
+                except ValueError:
+                    options[name] = text
+    return options
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100, help="games to play (rounded up to pairs)")
+    parser.add_argument("--depth", type=int, default=2, help="search depth of engine A (and B)")
+    parser.add_argument("--depth-b", type=int, help="search depth of engine B")
+    parser.add_argument("--time", type=float, help="seconds per move of engine A (and B)")
+    parser.add_argument("--time-b", type=float, help="seconds per move of engine B")
+    parser.add_argument("-a", dest="options_a", action="append", default=[], metavar="NAME=VALUE",
+                        help="ChessAI option of engine A, e.g. quiescence=false")
+    parser.add_argument("-b", dest="options_b", action="append", default=[], metavar="NAME=VALUE",
+                        help="ChessAI option of engine B")
+    parser.add_argument("--openings", help="PGN or FEN file of openings (default: random moves)")
+    parser.add_argument("--opening-plies", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random openings")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--results", default=RESULTS_FILE, help="results file, resumed if it exists")
+    args = parser.parse_args()
+
+    engine_a = EngineConfig(args.depth, args.time, parse_options(args.options_a))
+    engine_b = EngineConfig(args.depth_b or args.depth, args.time_b or args.time, parse_options(args.options_b))
+    pairs = (args.games + 1) // 2
+    if args.openings:
+        openings = book_openings(args.openings, args.opening_plies) or [START_FEN]
+        openings = [openings[i % len(openings)] for i in range(pairs)]
+    else:
+        openings = random_openings(pairs, args.opening_plies, args.seed)
+    specs = [GameSpec(2 * i + swap, fen, not swap) for i, fen in enumerate(openings) for swap in (0, 1)]
+
+    print(f"A: {engine_a.describe()}\nB: {engine_b.describe()}\n{len(specs)} games on {args.workers} workers")
+    start, finished = time.perf_counter(), []
+
+    def progress(record: GameRecord) -> None:
+        finished.append(record)
+        print(f"game {record.game_id:>4} {record.result:>7} ({record.white} white, {record.reason})  "
+              f"[{summary(finished)}]", flush=True)
+
+    records = run_match(specs, engine_a, engine_b, args.results, args.workers, args.max_plies, progress=progress)
+    print(f"{summary(records)}  ({time.perf_counter() - start:.0f}s)")
+    if len(records) < len(specs):
+        print(f"{len(specs) - len(records)} games failed {MAX_ATTEMPTS} times and were not played")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import hashlib
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+import pygame
+
+CACHE_DIR = "sprite_cache"
+COLORS = ["white", "black"]
+PIECE_NAMES = ["Pawn", "Knight", "Bishop", "Rook", "Queen", "King"]
+
+
+class SpriteCache:
+    """
+    Piece sprites of one piece set (a directory of {color}_{Piece}.svg files), rasterized once
+    per pixel size and saved as a PNG atlas (one row per color) in cache_dir, so later launches
+    just load the atlas. The atlas name includes a fingerprint of the SVGs, so editing them
+    invalidates it. cairosvg is only imported when an atlas has to be rasterized.
+    """
+    def __init__(self, piece_set_dir: str, cache_dir: str = CACHE_DIR) -> None:
+        self.piece_set_dir = piece_set_dir
+        self.cache_dir = cache_dir
+        self._sprites: dict[int, dict[str, pygame.Surface]] = {}  # size -> sprites loaded this session
+        self._executor = None
+        self._pending: Future | None = None
+
+    def _fingerprint(self) -> str:
+        digest = hashlib.sha1()
+        for color in COLORS:
+            for name in PIECE_NAMES:
+                stat = os.stat(os.path.join(self.piece_set_dir, f"{color}_{name}.svg"))
+                digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()[:12]
+
+    def atlas_path(self, size: int) -> str:
+        piece_set = os.path.basename(os.path.normpath(self.piece_set_dir))
+        return os.path.join(self.cache_dir, f"{piece_set}_{size}px_{self._fingerprint()}.png")
+
+    def get(self, size: int) -> dict[str, pygame.Surface]:
+        """Returns {"white_Pawn": surface, ...} with size x size sprites, from memory, the disk
+        cache or, failing both, by rasterizing the SVGs (and caching the result)."""
+        if size in self._sprites:
+            return self._sprites[size]
+        path = self.atlas_path(size)
+        if os.path.exists(path):
+            atlas = pygame.image.load(path)
+        else:
+            atlas = self._rasterize(size)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write under a temporary name first so a half-written atlas is never loaded
+            temp_path = f"{path}.{os.getpid()}.tmp.png"
+            pygame.image.save(atlas, temp_path)
+            os.replace(temp_path, path)
+        sprites = {
+            f"{color}_{name}": atlas.subsurface(pygame.Rect(col * size, row * size, size, size))
+            for row, color in enumerate(COLORS) for col, name in enumerate(PIECE_NAMES)
+        }
+        self._sprites[size] = sprites
+        return sprites
+
+    def _rasterize(self, size: int) -> pygame.Surface:
+        import cairosvg  # only needed when the atlas is not cached yet
+
+        atlas = pygame.Surface((size * len(PIECE_NAMES), size * len(COLORS)), pygame.SRCALPHA)
+        for row, color in enumerate(COLORS):
+            for col, name in enumerate(PIECE_NAMES):
+                svg_path = os.path.join(self.piece_set_dir, f"{color}_{name}.svg")
+                png_data = cairosvg.svg2png(url=svg_path, output_width=size, output_height=size)
+                atlas.blit(pygame.image.load(BytesIO(png_data)), (col * size, row * size))
+        return atlas
+
+    def get_async(self, size: int, on_ready=None) -> Future:
+        """Starts loading the sprites for size on a background thread and returns the Future.
+        A request that has not started yet is dropped in favor of this one (e.g. while the
+        window is being dragged to a new size). on_ready, if given, is called from the
+        background thread once the sprites are loaded."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        if self._pending is not None:
+            self._pending.cancel()
+        future = self._executor.submit(self.get, size)
+        if on_ready is not None:
+            future.add_done_callback(lambda done: done.cancelled() or on_ready())
+        self._pending = future
+        return future
@@ -0,0 +1,636 @@
+"""
+Endgame tablebases: the distance to mate of every position with three or four pieces (kings
+included), built by retrograde analysis and probed by ChessAI.
+
+    python tablebase.py                      # build every 3-piece table into tablebases/
+    python tablebase.py KQvKR KBNvK          # build these tables and the ones they lead into
+    python tablebase.py --pieces 4           # build every 3- and 4-piece table
+    python tablebase.py --probe "8/8/8/8/8/2k5/8/K6Q w - - 0 1"
+
+A table holds one material balance, named like KQvKR (white's pieces, then black's). Only the
+stronger side is stored as white; the other color arrangement is probed by flipping the board.
+The file is one byte per index: 0 for a draw, 255 for an index that is not a legal position in
+canonical form, otherwise 1 + the plies to mate with best play on both sides, so the code is
+even when the side to move mates and odd when it gets mated (1 is checkmate).
+
+The index is a perfect hash of the position: the side to move, the white king's square within
+the symmetry region, then the square of every other piece, as digits of a mixed-radix number.
+Without pawns the board is rotated and mirrored until the white king is on a1-d1-d4 (10
+squares); with pawns it can only be mirrored left to right (the 32 squares of files a-d).
+
+Tables are generated in dependency order (a capture or promotion leads into a smaller or
+other table). Each one is a scan that scores mates, stalemates and moves that leave the
+table, then a retrograde pass that walks back from every decided position by ply. Both are
+split across a pool of processes shared by every table that is ready: the scan into one job
+per white king square, each ply into chunks of the positions it decided, whose predecessors
+the workers generate while this process updates the table. In pure Python a 3-piece table
+takes seconds of CPU and a 4-piece table several minutes (pawn tables hold 16M index slots),
+so the wall time of a --pieces 4 build comes down roughly with the number of cores.
+
+Castling rights and en passant are not part of a tablebase position: the tables treat double
+pawn pushes as giving no en passant capture, and positions with castling rights or a
+capturable en passant pawn are not probed. The fifty-move rule is ignored.
+"""
+import argparse
+import mmap
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from itertools import combinations_with_replacement, product, repeat
+from board import Board
+from bitboard import BitBoard
+from pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+TABLEBASE_DIR = "tablebases"
+SUFFIX = ".tb"
+DRAW, INVALID = 0, 255
+MAX_PIECES = 4
+
+WHITE, BLACK = 0, 1
+LETTERS = "PNBRQK"  # by type code
+_NAME_ORDER = "KQRBNP"  # order of the pieces within each side of a table name
+_EXIT_DRAW = 254  # best move leaving the table draws (codes of decided positions stop at 253)
+_CHUNK = 4096  # positions per job when a ply's predecessors are spread over a pool
+
+
+def _squares_within(row: int, col: int, steps) -> list[int]:
+    return [(row + dr) * 8 + col + dc for dr, dc in steps if 0 <= row + dr < 8 and 0 <= col + dc < 8]
+
+
+def _ray(row: int, col: int, dr: int, dc: int) -> tuple[int, ...]:
+    squares = []
+    row, col = row + dr, col + dc
+    while 0 <= row < 8 and 0 <= col < 8:
+        squares.append(row * 8 + col)
+        row, col = row + dr, col + dc
+    return tuple(squares)
+
+
+_KING_STEPS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+_KNIGHT_STEPS = [(1, 2), (2, 1), (-1, 2), (-2, 1), (1, -2), (2, -1), (-1, -2), (-2, -1)]
+_ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+_BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+# Squares are row * 8 + col with row 0 the eighth rank, as on Board.
+_KING_TARGETS = [_squares_within(sq // 8, sq % 8, _KING_STEPS) for sq in range(64)]
+_KNIGHT_TARGETS = [_squares_within(sq // 8, sq % 8, _KNIGHT_STEPS) for sq in range(64)]
+_RAYS = {
+    ROOK: [[_ray(sq // 8, sq % 8, *d) for d in _ROOK_DIRECTIONS] for sq in range(64)],
+    BISHOP: [[_ray(sq // 8, sq % 8, *d) for d in _BISHOP_DIRECTIONS] for sq in range(64)],
+}
+_RAYS[QUEEN] = [_RAYS[ROOK][sq] + _RAYS[BISHOP][sq] for sq in range(64)]
+_LEAPER_SETS = {KING: [set(targets) for targets in _KING_TARGETS],
+                KNIGHT: [set(targets) for targets in _KNIGHT_TARGETS]}
+# squares a pawn of each color attacks from each square (white pawns move towards row 0)
+_PAWN_ATTACKS = [[set(_squares_within(sq // 8, sq % 8, [(-1, -1), (-1, 1)])) for sq in range(64)],
+                 [set(_squares_within(sq // 8, sq % 8, [(1, -1), (1, 1)])) for sq in range(64)]]
+# (from * 64 + to) -> the sliders that move along the line joining the squares, and the bitmask
+# of the squares strictly between them
+_LINE_SLIDERS: list[frozenset] = [frozenset()] * 4096
+_BETWEEN = [0] * 4096
+for _sq in range(64):
+    for _kind, _directions in ((ROOK, _ROOK_DIRECTIONS), (BISHOP, _BISHOP_DIRECTIONS)):
+        for _direction in _directions:
+            _mask = 0
+            for _target in _ray(_sq // 8, _sq % 8, *_direction):
+                _LINE_SLIDERS[_sq * 64 + _target] = frozenset((_kind, QUEEN))
+                _BETWEEN[_sq * 64 + _target] = _mask
+                _mask |= 1 << _target
+
+# the 8 symmetries of the board as square permutations; pawn tables may only use the first two
+_SYMMETRIES = [[f(sq // 8, sq % 8) for sq in range(64)] for f in (
+    lambda r, c: r * 8 + c, lambda r, c: r * 8 + 7 - c, lambda r, c: (7 - r) * 8 + c,
+    lambda r, c: (7 - r) * 8 + 7 - c, lambda r, c: c * 8 + r, lambda r, c: c * 8 + 7 - r,
+    lambda r, c: (7 - c) * 8 + r, lambda r, c: (7 - c) * 8 + 7 - r)]
+# white king squares of the canonical form: the a1-d1-d4 triangle, or files a-d with pawns
+_REGION = [sq for sq in range(64) if sq % 8 <= 3 and 7 - sq // 8 <= sq % 8]
+_PAWN_REGION = [sq for sq in range(64) if sq % 8 <= 3]
+
+
+def _attacks(kind: int, color: int, origin: int, target: int, occupied: int) -> bool:
+    if kind == PAWN:
+        return target in _PAWN_ATTACKS[color][origin]
+    if kind == KING or kind == KNIGHT:
+        return target in _LEAPER_SETS[kind][origin]
+    line = origin * 64 + target
+    return kind in _LINE_SLIDERS[line] and not _BETWEEN[line] & occupied
+
+
+def _attacked(pieces, squares, target: int, by_color: int, occupied: int) -> bool:
+    """Returns True if a piece of by_color attacks target (squares[i] is None once captured)."""
+    for (color, kind), sq in zip(pieces, squares):
+        if color == by_color and sq is not None and _attacks(kind, color, sq, target, occupied):
+            return True
+    return False
+
+
+def _targets(kind: int, color: int, origin: int, occupied: int):
+    """Yields the squares a piece can move to ignoring its own king's safety and the color
+    of what it lands on; pawns yield only their pushes and captures onto occupied squares."""
+    if kind == KING or kind == KNIGHT:
+        yield from (_KING_TARGETS if kind == KING else _KNIGHT_TARGETS)[origin]
+    elif kind == PAWN:
+        step = -8 if color == WHITE else 8
+        push = origin + step
+        if not occupied >> push & 1:
+            yield push
+            if origin // 8 == (6 if color == WHITE else 1) and not occupied >> (push + step) & 1:
+                yield push + step
+        for target in _PAWN_ATTACKS[color][origin]:
+            if occupied >> target & 1:
+                yield target
+    else:
+        for ray in _RAYS[kind][origin]:
+            for target in ray:
+                yield target
+                if occupied >> target & 1:
+                    break
+
+
+def _legal_moves(pieces, squares, color: int):
+    """Yields (new squares, whether it captures, (piece index, promotion type code) or None)
+    for each legal move of color. The kings are pieces 0 (white) and 1 (black)."""
+    occupied = 0
+    owner = {}
+    for index, sq in enumerate(squares):
+        if sq is not None:
+            occupied |= 1 << sq
+            owner[sq] = index
+    for index, ((piece_color, kind), origin) in enumerate(zip(pieces, squares)):
+        if piece_color != color or origin is None:
+            continue
+        for target in _targets(kind, color, origin, occupied):
+            victim = owner.get(target)
+            if victim is not None and pieces[victim][0] == color:
+                continue
+            after = list(squares)
+            after[index] = target
+            if victim is not None:
+                after[victim] = None
+            if _attacked(pieces, after, after[color], 1 - color, occupied & ~(1 << origin) | 1 << target):
+                continue
+            if kind == PAWN and target // 8 in (0, 7):
+                for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    yield after, victim is not None, (index, promotion)
+            else:
+                yield after, victim is not None, None
+
+
+def _unmoves(pieces, squares, color: int, occupied: int):
+    """Yields the squares of every position from which color's last move (not a capture or a
+    promotion) could have led to squares."""
+    for index, ((piece_color, kind), target) in enumerate(zip(pieces, squares)):
+        if piece_color != color:
+            continue
+        if kind == PAWN:
+            step = 8 if color == WHITE else -8  # backwards
+            origin = target + step
+            if occupied >> origin & 1 or origin // 8 in (0, 7):
+                continue
+            origins = [origin]
+            if target // 8 == (4 if color == WHITE else 3) and not occupied >> (origin + step) & 1:
+                origins.append(origin + step)
+        elif kind == KING or kind == KNIGHT:
+            origins = [sq for sq in (_KING_TARGETS if kind == KING else _KNIGHT_TARGETS)[target]
+                       if not occupied >> sq & 1]
+        else:
+            origins = []
+            for ray in _RAYS[kind][target]:
+                for sq in ray:
+                    if occupied >> sq & 1:
+                        break
+                    origins.append(sq)
+        for origin in origins:
+            before = list(squares)
+            before[index] = origin
+            yield before
+
+
+def _strength(letters: str) -> tuple:
+    """More pieces, then more valuable ones, is stronger."""
+    return len(letters), sorted((LETTERS.index(letter) for letter in letters), reverse=True)
+
+
+def material_name(white: str, black: str) -> tuple[str, bool]:
+    """Returns the table name of the material (piece letters of each side, kings included), and
+    whether the colors have to be swapped to find it: KvKQ is stored as KQvK."""
+    white = "".join(sorted(white.upper(), key=_NAME_ORDER.index))
+    black = "".join(sorted(black.upper(), key=_NAME_ORDER.index))
+    if _strength(black) > _strength(white):
+        return f"{black}v{white}", True
+    return f"{white}v{black}", False
+
+
+class Layout:
+    """The pieces and index layout of one table."""
+
+    def __init__(self, name: str) -> None:
+        white, sep, black = name.partition("v")
+        if (not sep or not white.startswith("K") or not black.startswith("K")
+                or any(letter not in "QRBNP" for letter in white[1:] + black[1:])
+                or material_name(white, black) != (name, False)):
+            raise ValueError(f"Not a table name: {name!r} (e.g. KQvK, KRvKN)")
+        self.name = name
+        extras = [(WHITE, LETTERS.index(letter)) for letter in white[1:]]
+        extras += [(BLACK, LETTERS.index(letter)) for letter in black[1:]]
+        self.pieces = [(WHITE, KING), (BLACK, KING)] + extras
+        if not 3 <= len(self.pieces) <= MAX_PIECES:
+            raise ValueError(f"Tables have 3 to {MAX_PIECES} pieces: {name!r}")
+        self.pawns = any(kind == PAWN for _, kind in extras)
+        self.region = _PAWN_REGION if self.pawns else _REGION
+        self.region_index = {sq: i for i, sq in enumerate(self.region)}
+        symmetries = _SYMMETRIES[:2] if self.pawns else _SYMMETRIES
+        # per white king square, the symmetries that bring it into the region (two on its edge),
+        # each with the king's part of the index
+        self.to_region = [[(self.region_index[m[sq]], m) for m in symmetries if m[sq] in self.region_index]
+                          for sq in range(64)]
+        self.identical = len(extras) == 2 and extras[0] == extras[1]
+        self.others = len(self.pieces) - 1
+        self.side_size = len(self.region) * 64 ** self.others
+        self.size = 2 * self.side_size
+
+    def index(self, squares, white_to_move: bool) -> int:
+        """Returns the index of a position in canonical form (squares in the order of self.pieces)."""
+        best = None
+        for index, m in self.to_region[squares[0]]:
+            if self.others == 2:
+                index = (index * 64 + m[squares[1]]) * 64 + m[squares[2]]
+            else:
+                first, second = m[squares[2]], m[squares[3]]
+                if self.identical and first > second:
+                    first, second = second, first
+                index = ((index * 64 + m[squares[1]]) * 64 + first) * 64 + second
+            if best is None or index < best:
+                best = index
+        return best + (0 if white_to_move else self.side_size)
+
+    def squares(self, index: int) -> tuple[list[int], bool]:
+        """Returns the squares and side to move of an index (the inverse of index())."""
+        white_to_move = index < self.side_size
+        index %= self.side_size
+        squares = []
+        for _ in range(self.others):
+            index, sq = divmod(index, 64)
+            squares.append(sq)
+        squares.append(self.region[index])
+        squares.reverse()
+        return squares, white_to_move
+
+    def dependencies(self) -> set[str]:
+        """Returns the tables that captures and promotions from this one lead into."""
+        letters = [LETTERS[kind] for _, kind in self.pieces]
+        colors = [color for color, _ in self.pieces]
+        pawns = [i for i, letter in enumerate(letters) if letter == "P"]
+        results = set()
+        for removed in [None] + list(range(2, len(letters))):
+            for promoted in [None] + pawns:
+                if removed is None and promoted is None or removed == promoted:
+                    continue
+                if removed is not None and promoted is not None and colors[removed] == colors[promoted]:
+                    continue  # a pawn that captures takes an enemy piece
+                for promotion in "QRBN" if promoted is not None else "":
+                    changed = list(letters)
+                    changed[promoted] = promotion
+                    results.add(self._material(changed, colors, removed))
+                if promoted is None:
+                    results.add(self._material(letters, colors, removed))
+        results.discard(None)
+        return results
+
+    @staticmethod
+    def _material(letters, colors, removed) -> str | None:
+        white = "".join(letter for i, letter in enumerate(letters) if colors[i] == WHITE and i != removed)
+        black = "".join(letter for i, letter in enumerate(letters) if colors[i] == BLACK and i != removed)
+        return material_name(white, black)[0] if len(white) + len(black) > 2 else None
+
+
+@lru_cache(maxsize=None)
+def layout(name: str) -> Layout:
+    return Layout(name)
+
+
+class Tablebases:
+    """
+    The tables of a directory, memory-mapped as they are first probed. Missing tables are not
+    an error: positions they would cover probe as None.
+    """
+
+    def __init__(self, directory: str = TABLEBASE_DIR) -> None:
+        self.directory = directory
+        self._tables: dict[str, tuple[Layout, mmap.mmap] | None] = {}
+        names = [entry[:-len(SUFFIX)] for entry in os.listdir(directory)
+                 if entry.endswith(SUFFIX)] if os.path.isdir(directory) else []
+        self.names = sorted(names)
+        # pieces in the largest table; boards with more pieces are not worth probing
+        self.max_pieces = max((len(name) - 1 for name in names), default=0)
+
+    def close(self) -> None:
+        for table in self._tables.values():
+            if table is not None:
+                table[1].close()
+        self._tables.clear()
+
+    def _table(self, name: str):
+        table = self._tables.get(name, False)
+        if table is False:
+            path = os.path.join(self.directory, name + SUFFIX)
+            table = None
+            if os.path.exists(path):
+                table_layout = layout(name)
+                with open(path, "rb") as table_file:
+                    if os.fstat(table_file.fileno()).st_size != table_layout.size:
+                        raise ValueError(f"{path} is not a {name} table")
+                    table = (table_layout, mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ))
+            self._tables[name] = table
+        return table
+
+    def probe_code(self, items, white_to_move: bool) -> int | None:
+        """Returns the table code (see the module docstring) of the position of items, a list of
+        (color, type code, square) with color 0 for white, or None if it is not in a table."""
+        if len(items) == 2:
+            return DRAW
+        white = "".join(LETTERS[kind] for color, kind, _ in items if color == WHITE)
+        black = "".join(LETTERS[kind] for color, kind, _ in items if color == BLACK)
+        name, swap = material_name(white, black)
+        table = self._table(name)
+        if table is None:
+            return None
+        table_layout, data = table
+        if swap:
+            items = [(1 - color, kind, sq ^ 56) for color, kind, sq in items]
+            white_to_move = not white_to_move
+        remaining = list(items)
+        squares = []
+        for color, kind in table_layout.pieces:
+            for item in remaining:
+                if item[0] == color and item[1] == kind:
+                    squares.append(item[2])
+                    remaining.remove(item)
+                    break
+        code = data[table_layout.index(squares, white_to_move)]
+        return None if code == INVALID else code
+
+    def probe(self, board: Board) -> tuple[int, int] | None:
+        """Returns (outcome, plies) of board's position for the side to move, outcome 1 for a
+        win, 0 for a draw and -1 for a loss in plies plies with best play, or None when the
+        position is not in the tables (more pieces, castling rights or en passant)."""
+        if len(board.piece_map) > self.max_pieces or board.castling_rights or board.en_passant_file is not None:
+            return None
+        items = [(piece.color_index, piece.type_code, row * 8 + col) for (row, col), piece in board.piece_map.items()]
+        code = self.probe_code(items, board.ply % 2 == 0)
+        if code is None:
+            return None
+        return outcome(code)
+
+    def best_move(self, board: Board) -> tuple[tuple, int, int] | None:
+        """Returns (action, outcome, plies) for the best move in board's position (the fastest
+        win, else a draw, else the slowest loss), or None if it is not in the tables."""
+        if self.probe(board) is None:
+            return None
+        best = None
+        for action in board.get_all_legal_moves():
+            board.move(action)
+            result = self.probe(board)
+            board.unmake()
+            if result is None:
+                return None
+            result = (-result[0], result[1] + 1) if result[0] else (0, 0)
+            if best is None or _rank(result) > _rank(best[1:]):
+                best = (action, *result)
+        return best
+
+
+def outcome(code: int) -> tuple[int, int]:
+    """Returns (outcome, plies) for a table code: 1 if the side to move mates in plies plies,
+    -1 if it gets mated in plies, (0, 0) for a draw."""
+    if code == DRAW:
+        return 0, 0
+    plies = code - 1
+    return (1 if plies % 2 else -1), plies
+
+
+def _rank(result: tuple[int, int]) -> int:
+    result_outcome, plies = result
+    return result_outcome * (1000 - plies) if result_outcome else 0
+
+
+def _code_rank(code: int) -> int:
+    """Orders codes from the mover's side: faster wins, then draws, then slower losses."""
+    if code == DRAW or code == _EXIT_DRAW:
+        return 0
+    return _rank(outcome(code))
+
+
+def _scan(name: str, directory: str, white_to_move: bool, king_index: int) -> tuple[bytearray, bytearray, bytearray]:
+    """The first pass over one block of a table: the positions with this side to move and the
+    white king on region square king_index (64 ** others indexes). Returns (codes, counts, exits):
+    codes is INVALID for indexes that are not legal positions in canonical form, 1 for checkmate
+    and otherwise DRAW; counts is the number of distinct positions of this table the moves lead
+    to; exits is the code (for the mover) of the best move that leaves the table, or 0 if none does."""
+    table_layout = layout(name)
+    pieces = table_layout.pieces
+    tablebases = Tablebases(directory)
+    size = 64 ** table_layout.others
+    codes = bytearray([INVALID]) * size
+    counts = bytearray(size)
+    exits = bytearray(size)
+    color = WHITE if white_to_move else BLACK
+    base = (0 if white_to_move else table_layout.side_size) + king_index * size
+    pawn_kinds = [kind == PAWN for _, kind in pieces]
+    identical = table_layout.identical
+    king = table_layout.region[king_index]
+    on_edge = len(table_layout.to_region[king]) > 1
+    for index, rest in enumerate(product(range(64), repeat=table_layout.others)):
+        squares = [king, *rest]
+        if len(set(squares)) != len(squares):
+            continue
+        if any(is_pawn and sq // 8 in (0, 7) for is_pawn, sq in zip(pawn_kinds, squares)):
+            continue
+        # another index holds this position (only possible for identical pieces, or with
+        # the king on a line of symmetry)
+        if identical and squares[2] > squares[3]:
+            continue
+        if on_edge and table_layout.index(squares, white_to_move) != base + index:
+            continue
+        occupied = 0
+        for sq in squares:
+            occupied |= 1 << sq
+        if _attacked(pieces, squares, squares[1 - color], color, occupied):
+            continue  # the side not to move is in check
+        successors = set()
+        best_exit = 0
+        for after, capture, promotion in _legal_moves(pieces, squares, color):
+            if not capture and promotion is None:
+                successors.add(table_layout.index(after, not white_to_move))
+                continue
+            promoted, promotion = promotion or (None, None)
+            items = [(c, promotion if i == promoted else kind, sq)
+                     for i, ((c, kind), sq) in enumerate(zip(pieces, after)) if sq is not None]
+            code = tablebases.probe_code(items, not white_to_move)
+            if code is None:
+                raise FileNotFoundError(f"{name} needs the tables {sorted(table_layout.dependencies())}")
+            if code + 1 >= _EXIT_DRAW:
+                raise ValueError(f"{name}: mates longer than {_EXIT_DRAW - 2} plies do not fit in a byte")
+            code = _EXIT_DRAW if code == DRAW else code + 1
+            if not best_exit or _code_rank(code) > _code_rank(best_exit):
+                best_exit = code
+        codes[index] = DRAW
+        if not successors and not best_exit and _attacked(pieces, squares, squares[color], 1 - color, occupied):
+            codes[index] = 1  # checkmate
+        counts[index] = len(successors)
+        exits[index] = best_exit
+    tablebases.close()
+    return codes, counts, exits
+
+
+def _predecessors(name: str, indexes: array) -> array:
+    """Returns the distinct positions one move before each of indexes, one position's after another."""
+    table_layout = layout(name)
+    pieces = table_layout.pieces
+    results = array("I")
+    for index in indexes:
+        squares, white_to_move = table_layout.squares(index)
+        occupied = 0
+        for sq in squares:
+            occupied |= 1 << sq
+        mover = WHITE if not white_to_move else BLACK  # who made the last move
+        results.extend({table_layout.index(before, not white_to_move)
+                        for before in _unmoves(pieces, squares, mover, occupied)})
+    return results
+
+
+def generate(name: str, directory: str = TABLEBASE_DIR, pool: ProcessPoolExecutor | None = None) -> str:
+    """Builds one table from the tables it depends on and returns its path. With a pool, the scan
+    (one job per white king square) and the predecessors of each ply run on its processes."""
+    table_layout = layout(name)
+    run = pool.map if pool is not None else map
+    kings = len(table_layout.region)
+    sides = [True] * kings + [False] * kings
+    blocks = list(run(_scan, repeat(name), repeat(directory), sides, 2 * list(range(kings))))
+    codes, counts, exits = (bytearray().join(block[i] for block in blocks) for i in range(3))
+    del blocks
+
+    # buckets[plies]: positions that may be decided in that many plies; a position is final
+    # when its bucket comes up (wins may be queued several times, the first is the fastest)
+    buckets: dict[int, array] = {0: array("I", [index for index, code in enumerate(codes) if code == 1])}
+    for index in buckets[0]:
+        codes[index] = DRAW  # so that the pass below decides them like every other position
+    for index, code in enumerate(codes):
+        exit_code = exits[index]
+        if code == DRAW and exit_code and exit_code != _EXIT_DRAW and (exit_code % 2 == 0 or not counts[index]):
+            # a winning capture or promotion, or only losing ones and no move within the table
+            buckets.setdefault(exit_code - 1, array("I")).append(index)
+
+    plies = 0
+    while buckets:
+        decided = array("I")
+        for index in buckets.pop(plies, ()):
+            if codes[index] == DRAW:
+                codes[index] = plies + 1
+                decided.append(index)
+        chunks = [decided[start:start + _CHUNK] for start in range(0, len(decided), _CHUNK)]
+        won = plies % 2 == 0  # these positions are lost, so moving into them wins
+        for predecessors in run(_predecessors, repeat(name), chunks):
+            for previous in predecessors:
+                if codes[previous] != DRAW:
+                    continue  # decided already, or not a legal position
+                if won:
+                    buckets.setdefault(plies + 1, array("I")).append(previous)
+                    continue
+                counts[previous] -= 1
+                if counts[previous] == 0:
+                    exit_code = exits[previous]
+                    if exit_code == _EXIT_DRAW or exit_code and exit_code % 2 == 0:
+                        continue  # a capture or promotion draws (or wins, queued already)
+                    # every move loses: as late as the slowest losing move allows
+                    buckets.setdefault(max(plies + 1, exit_code - 1), array("I")).append(previous)
+        plies += 1
+        if buckets and plies >= _EXIT_DRAW - 1:
+            raise ValueError(f"{name}: mates longer than {_EXIT_DRAW - 2} plies do not fit in a byte")
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + SUFFIX)
+    with open(path + ".tmp", "wb") as out:
+        out.write(codes)
+    os.replace(path + ".tmp", path)  # never leaves a half-written table behind
+    return path
+
+
+def all_tables(pieces: int) -> list[str]:
+    """Returns the names of every table with up to pieces pieces."""
+    names = set()
+    for count in range(1, pieces - 1):
+        for extras in combinations_with_replacement("QRBNP", count):
+            for split in range(count + 1):
+                white, black = "K" + "".join(extras[:split]), "K" + "".join(extras[split:])
+                names.add(material_name(white, black)[0])
+    return sorted(names, key=lambda name: (len(name), name))
+
+
+def build(names: list[str], directory: str = TABLEBASE_DIR, workers: int | None = None, progress=None) -> list[str]:
+    """Builds the named tables, and every table they depend on that is not in directory yet,
+    on a pool of worker processes shared by the tables that are ready (each one is driven by a
+    thread of this process). Returns the names of the tables built; progress, if given, is
+    called with each name and its build time as it finishes."""
+    needed = {}
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name in needed:
+            continue
+        needed[name] = layout(name).dependencies()
+        stack.extend(needed[name])
+    todo = {name: deps for name, deps in needed.items()
+            if name in names or not os.path.exists(os.path.join(directory, name + SUFFIX))}
+    built = []
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers) as pool, ThreadPoolExecutor(workers) as tables:
+        running = {}  # future -> (name, start time)
+        while todo or running:
+            waiting = todo.keys() | {name for name, _ in running.values()}
+            for name in [name for name, deps in todo.items() if not deps & waiting]:
+                del todo[name]
+                running[tables.submit(generate, name, directory, pool)] = (name, time.perf_counter())
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, started = running.pop(future)
+                future.result()
+                built.append(name)
+                if progress is not None:
+                    progress(name, time.perf_counter() - started)
+    return built
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tables", nargs="*", help="tables to build, e.g. KQvKR (default: all up to --pieces)")
+    parser.add_argument("--pieces", type=int, default=3, choices=(3, 4))
+    parser.add_argument("--dir", default=TABLEBASE_DIR, help="directory of the table files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--probe", metavar="FEN", help="print the best move of a position instead")
+    args = parser.parse_args()
+
+    if args.probe:
+        board = BitBoard.from_fen(args.probe)
+        tablebases = Tablebases(args.dir)
+        best = tablebases.best_move(board)
+        if best is None:
+            print("not in the tablebases")
+            return
+        from pgn import san
+        action, result, plies = best
+        print(f"{san(board, action)}: " + ({1: f"mate in {(plies + 1) // 2}", 0: "draw",
+                                             -1: f"mated in {plies // 2}"}[result]))
+        return
+
+    start = time.perf_counter()
+    names = args.tables or all_tables(args.pieces)
+    build(names, args.dir, args.workers,
+          lambda name, seconds: print(f"{name:<8} {layout(name).size:>10} positions {seconds:6.0f}s", flush=True))
+    print(f"done in {time.perf_counter() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
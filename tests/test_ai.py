@@ -0,0 +1,208 @@
+import pytest
+import time
+from ai import ChessAI, MATE_SCORE, WIN_BOUND, score_from_tt, score_to_tt
+from board import move_name
+from bitboard import BitBoard
+from pieces import King, Pawn, Rook, Queen, Knight
+from ordering import MoveOrderer
+from transposition import TranspositionTable, EXACT, LOWER, encode_move, decode_move
+
+def setup_board(pieces):
+    board = BitBoard()
+    for pos, piece in pieces.items():
+        board.piece_map[pos] = piece
+        if isinstance(piece, King):
+            board.king_positions[piece.color] = pos
+    board.sync_bitboards()
+    board.hash = board.compute_position_key()
+    board.mg_score, board.eg_score, board.phase = board.compute_evaluation()
+    return board
+
+def back_rank_mate_board():
+    return setup_board({
+        (0, 6): King("black"),  # Kg8
+        (1, 5): Pawn("black"), (1, 6): Pawn("black"), (1, 7): Pawn("black"),  # f7 g7 h7
+        (7, 0): Rook("white"),  # Ra1
+        (7, 6): King("white"),  # Kg1
+    })
+
+def test_finds_mate_in_one():
+    board = back_rank_mate_board()
+    assert ChessAI(max_depth=2).choose_move(board) == ((7, 0), (0, 0), None)  # Ra8#
+
+def test_mates_score_by_distance():
+    ai = ChessAI(max_depth=3)
+    assert ai.choose_move(back_rank_mate_board()) == ((7, 0), (0, 0), None)
+    assert ai.stats.score == MATE_SCORE - 1
+    # 1. Kf7 Kh7 2. Rh1#, as Ra8+ lets the king out to h7
+    board = BitBoard.from_fen("7k/8/5K2/8/8/8/8/R7 w - - 0 1")
+    assert ai.choose_move(board) == ((2, 5), (1, 5), None)
+    assert ai.stats.score == MATE_SCORE - 3
+
+def test_table_scores_count_mates_from_the_stored_position():
+    for value in (MATE_SCORE - 5, -(MATE_SCORE - 4), WIN_BOUND + 10, 250, -WIN_BOUND):
+        assert score_from_tt(score_to_tt(value, 3), 3) == value
+    assert score_to_tt(MATE_SCORE - 5, 3) == MATE_SCORE - 2 and score_to_tt(250, 3) == 250
+
+def test_transposition_table_reused_across_searches():
+    board = BitBoard()
+    board.initial_setup()
+    ai = ChessAI(max_depth=2)
+    first = ai.choose_move(board)
+    hits = ai.tt.hits
+    assert ai.choose_move(board) == first
+    assert ai.tt.hits > hits
+
+def test_time_limited_search_returns_in_time():
+    board = BitBoard()
+    board.initial_setup()
+    for action in [((6, 4), (4, 4), None), ((1, 4), (3, 4), None), ((7, 6), (5, 5), None)]:
+        board.move(action)
+    key, undo_depth = board.hash, len(board.undo_stack)
+    start = time.monotonic()
+    action = ChessAI(max_depth=3).choose_move(board, time_limit=0.3)
+    assert time.monotonic() - start < 1.0
+    assert action in set(board.get_all_legal_moves())
+    assert board.hash == key and len(board.undo_stack) == undo_depth
+
+def test_time_limited_search_finds_mate():
+    board = back_rank_mate_board()
+    assert ChessAI(max_depth=2).choose_move(board, time_limit=5, max_depth=4) == ((7, 0), (0, 0), None)
+
+def test_pondering_defers_time_limit():
+    board = BitBoard()
+    board.initial_setup()
+    for action in [((6, 4), (4, 4), None), ((1, 4), (3, 4), None), ((7, 6), (5, 5), None)]:
+        board.move(action)
+    start = time.monotonic()
+    hit = start + 0.5
+    action = ChessAI(max_depth=3).choose_move(board, time_limit=0.1, pondering=lambda: time.monotonic() < hit)
+    assert 0.5 <= time.monotonic() - start < 1.5
+    assert action in set(board.get_all_legal_moves())
+
+def test_quiescence_sees_past_the_horizon():
+    # Qxe5 looks like it wins the knight at the leaves, but dxe5 wins the queen back,
+    # so only with quiescence is the knight safe enough to take the free a6 pawn instead
+    pieces = {
+        (0, 7): King("black"),  # Kh8
+        (0, 4): Queen("black"),  # Qe8
+        (2, 0): Pawn("black"),  # a6
+        (3, 4): Knight("white"),  # Ne5
+        (4, 3): Pawn("white"),  # d4
+        (7, 0): Rook("white"),  # Ra1
+        (7, 6): King("white"),  # Kg1
+    }
+    rook_takes_pawn = ((7, 0), (2, 0), None)
+    assert ChessAI(max_depth=1, quiescence=False).choose_move(setup_board(pieces)) != rook_takes_pawn
+    ai = ChessAI(max_depth=1)
+    assert ai.choose_move(setup_board(pieces)) == rook_takes_pawn
+    assert ai.stats.q_nodes > 0
+
+def test_table_store_and_probe():
+    tt = TranspositionTable(size_mb=0.01)
+    move = ((6, 4), (4, 4), None)
+    tt.store(12345, 3, -42, LOWER, move)
+    assert tt.probe(12345) == (3, -42, LOWER, move)
+    assert tt.probe(54321) is None
+    assert tt.hit_rate == 0.5
+
+def test_table_prefers_deeper_entries_within_a_search():
+    tt = TranspositionTable(size_mb=0.01)
+    key, colliding_key = 7, 7 + tt.size
+    tt.store(key, 5, 10, EXACT)
+    tt.store(colliding_key, 2, 20, EXACT)
+    assert tt.probe(key) == (5, 10, EXACT, None)
+    tt.new_search()
+    tt.store(colliding_key, 2, 20, EXACT)
+    assert tt.probe(colliding_key) == (2, 20, EXACT, None)
+
+def test_move_encoding_round_trip():
+    from pieces import Knight
+    for action in [((6, 4), (4, 4), None), ((1, 0), (0, 0), Knight), ((0, 0), (7, 7), None)]:
+        assert decode_move(encode_move(action)) == action
+
+def test_captures_ordered_most_valuable_victim_first():
+    board = BitBoard()
+    board.initial_setup()
+    for action in [((6, 4), (4, 4), None), ((1, 3), (3, 3), None),   # e4 d5
+                   ((7, 6), (5, 5), None), ((0, 3), (2, 3), None),   # Nf3 Qd6
+                   ((7, 1), (5, 2), None), ((2, 3), (3, 4), None)]:  # Nc3 Qe5
+        board.move(action)
+    ordered = MoveOrderer().order(board, list(board.get_all_legal_moves()))
+    # Nfxe5 (queen) before Ncxd5 (pawn), quiet moves after both; exd5 is pinned
+    assert ordered[0] == ((5, 5), (3, 4), None)
+    assert ordered[1] == ((5, 2), (3, 3), None)
+    assert all(not board.is_capture(action) for action in ordered[2:])
+
+def test_ordering_reduces_nodes_searched():
+    nodes = {}
+    for move_ordering in (False, True):
+        board = BitBoard()
+        board.initial_setup()
+        for action in [((6, 4), (4, 4), None), ((1, 4), (3, 4), None), ((7, 6), (5, 5), None)]:
+            board.move(action)
+        ai = ChessAI(max_depth=3, move_ordering=move_ordering, quiescence=False)
+        ai.choose_move(board)
+        nodes[move_ordering] = ai.stats.nodes
+    assert nodes[True] < nodes[False]
+
+def test_pruning_switches_reduce_nodes_and_keep_mates():
+    nodes = {}
+    for switch in (False, True):
+        board = BitBoard()
+        board.initial_setup()
+        for action in [((6, 4), (4, 4), None), ((1, 4), (3, 4), None), ((7, 6), (5, 5), None)]:
+            board.move(action)
+        ai = ChessAI(max_depth=3, pvs=switch, null_move=switch, lmr=switch)
+        ai.choose_move(board)
+        nodes[switch] = ai.stats.nodes
+        assert ChessAI(max_depth=3, pvs=switch, null_move=switch, lmr=switch).choose_move(
+            back_rank_mate_board()) == ((7, 0), (0, 0), None)
+    assert nodes[True] < nodes[False]
+    assert ai.stats.reductions > 0 and ai.stats.null_cutoffs > 0
+
+def test_null_move_skipped_without_pieces():
+    board = setup_board({(0, 0): King("black"), (7, 7): King("white"), (6, 0): Pawn("white")})
+    assert not board.has_non_pawn_material(0) and not board.has_non_pawn_material(1)
+    board = back_rank_mate_board()
+    assert board.has_non_pawn_material(0) and not board.has_non_pawn_material(1)
+
+# late move reductions depend on each process's move-ordering history, so parallel and serial
+# choices only have to agree without them (see ChessAI.choose_move)
+@pytest.mark.parametrize("max_depth, switches", [(2, {}), (3, {"lmr": False})])
+def test_parallel_search_matches_serial(max_depth, switches):
+    import random
+    rng = random.Random(7)
+    ai = ChessAI(max_depth=max_depth, workers=2, **switches)
+    try:
+        assert ai.choose_move(back_rank_mate_board()) == ((7, 0), (0, 0), None)
+        for _ in range(4):
+            board = BitBoard()
+            board.initial_setup()
+            for _ in range(rng.randint(4, 12)):
+                board.move(rng.choice(list(board.get_all_legal_moves())))
+            key, undo_depth = board.hash, len(board.undo_stack)
+            ai.tt.clear()
+            serial = ChessAI(max_depth=max_depth, **switches)
+            assert ai.choose_move(board) == serial.choose_move(board)
+            assert ai.stats.score == serial.stats.score
+            assert board.hash == key and len(board.undo_stack) == undo_depth
+    finally:
+        ai.close()
+
+def test_search_stats_and_progress():
+    board = BitBoard()
+    board.initial_setup()
+    for action in [((6, 4), (4, 4), None), ((1, 4), (3, 4), None), ((7, 6), (5, 5), None)]:
+        board.move(action)
+    reported = []
+    ai = ChessAI(max_depth=3, progress=lambda stats: reported.append((stats.depth, list(stats.pv))))
+    action = ai.choose_move(board, time_limit=30, max_depth=3)
+    stats = ai.stats
+    assert [depth for depth, _ in reported] == [1, 3]
+    assert stats.depth == 3 and stats.pv[0] == action and len(stats.pv) <= 4
+    assert stats.nodes > stats.q_nodes > 0 and stats.nps > 0
+    assert 0 < stats.cutoff_rate < 1 and 0 < stats.first_move_cutoff_rate <= 1
+    assert stats.tt_probes >= stats.tt_hits > 0
+    assert stats.time >= stats.movegen_time + stats.check_time + stats.eval_time
+    assert stats.summary().startswith("depth 3 ") and f"pv {move_name(action)}" in stats.summary()
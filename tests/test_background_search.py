@@ -0,0 +1,57 @@
+import time
+from background_search import BackgroundSearch
+from bitboard import BitBoard
+
+def test_search_runs_in_background_and_can_be_cancelled():
+    board = BitBoard()
+    board.initial_setup()
+    search = BackgroundSearch(max_depth=2)
+    try:
+        # a long search, abandoned right away
+        search.start(board, time_limit=60)
+        assert search.thinking
+        search.cancel()
+        assert not search.thinking and search.poll() is None
+
+        # the board can change while the next search runs; it works on a snapshot
+        search.start(board, time_limit=0.2)
+        start = time.monotonic()
+        board.move(((6, 4), (4, 4), None))
+        assert time.monotonic() - start < 0.1
+        move = search.wait(timeout=30)
+        assert move[0] in {(6, col) for col in range(8)} | {(7, 1), (7, 6)}  # a white opening move
+        assert not search.thinking and search.stats.nodes > 0
+    finally:
+        search.close()
+
+def test_ponder_hit_continues_and_miss_starts_over():
+    board = BitBoard()
+    board.initial_setup()
+    search = BackgroundSearch(max_depth=3)
+    try:
+        search.start(board, time_limit=0.3)
+        board.move(search.wait(timeout=30))
+        assert search.ponder(board, time_limit=0.5)
+        assert search.pondering and not search.thinking and search.poll() is None
+        time.sleep(0.8)  # the human thinks for longer than the AI's time limit
+
+        # hit: the pondering search has used up the time limit, so the move comes at once
+        reply = search.stats.pv[1]
+        board.move(reply)
+        start = time.monotonic()
+        search.start(board, time_limit=0.5)
+        assert search.thinking
+        move = search.wait(timeout=30)
+        assert time.monotonic() - start < 0.4
+        assert move in set(board.get_all_legal_moves()) and search.stats.time >= 0.5
+        board.move(move)
+
+        # miss: another reply is played, and the search starts over for it
+        assert search.ponder(board, time_limit=0.3)
+        other = next(action for action in board.get_all_legal_moves() if action != search.stats.pv[1])
+        board.move(other)
+        search.start(board, time_limit=0.3)
+        move = search.wait(timeout=30)
+        assert move in set(board.get_all_legal_moves()) and search.stats.pv[0] == move
+    finally:
+        search.close()
@@ -0,0 +1,69 @@
+import random
+import pytest
+from board import Board
+from bitboard import BitBoard
+
+def legal_move_set(board):
+    return set(board.get_all_legal_moves())
+
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for action in list(board.get_all_legal_moves()):
+        board.move(action)
+        nodes += perft(board, depth - 1)
+        board.unmake()
+    return nodes
+
+def test_initial_moves_match_dict_board():
+    board = Board()
+    board.initial_setup()
+    bitboard = BitBoard()
+    bitboard.initial_setup()
+    assert legal_move_set(board) == legal_move_set(bitboard)
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_games_match_dict_board(seed):
+    rng = random.Random(seed)
+    board = Board()
+    board.initial_setup()
+    bitboard = BitBoard()
+    bitboard.initial_setup()
+    for _ in range(60):
+        moves = sorted(legal_move_set(board), key=str)
+        assert moves == sorted(legal_move_set(bitboard), key=str)
+        assert board.in_check("white") == bitboard.in_check("white")
+        assert board.in_check("black") == bitboard.in_check("black")
+        if not moves:
+            break
+        action = rng.choice(moves)
+        board.move(action)
+        bitboard.move(action)
+
+def test_perft_start_position():
+    bitboard = BitBoard()
+    bitboard.initial_setup()
+    assert [perft(bitboard, depth) for depth in (1, 2, 3)] == [20, 400, 8902]
+
+def test_undo_restores_bitboards():
+    bitboard = BitBoard()
+    bitboard.initial_setup()
+    before = [row[:] for row in bitboard.bitboards]
+    bitboard.move(((6, 4), (4, 4), None))
+    bitboard.unmake()
+    assert bitboard.bitboards == before
+    assert bitboard.occupancy == [sum(row) for row in before]
+
+def test_en_passant_and_castling():
+    bitboard = BitBoard()
+    bitboard.initial_setup()
+    for action in [((6, 4), (4, 4), None), ((1, 0), (2, 0), None),
+                   ((4, 4), (3, 4), None), ((1, 3), (3, 3), None)]:  # e4 a6 e5 d5
+        bitboard.move(action)
+    assert ((3, 4), (2, 3), None) in legal_move_set(bitboard)  # exd6 e.p.
+
+    for action in [((7, 6), (5, 5), None), ((2, 0), (3, 0), None),
+                   ((7, 5), (6, 4), None), ((3, 0), (4, 0), None)]:  # Nf3 a5 Be2 a4
+        bitboard.move(action)
+    assert ((7, 4), (7, 6), None) in legal_move_set(bitboard)  # O-O
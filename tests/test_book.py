@@ -0,0 +1,93 @@
+import random
+import pytest
+from ai import ChessAI
+from bitboard import BitBoard
+from book import ENTRY_SIZE, OpeningBook, book_entries, build_book, decode_move, encode_move, write_book
+from pgn import read_games
+from pieces import Knight
+from polyglot import polyglot_key
+
+GAMES = """
+[Result "1-0"]
+1. e4 e5 2. Nf3 Nc6 1-0
+
+[Result "1/2-1/2"]
+1. e4 c5 2. Nf3 1/2-1/2
+
+[Result "0-1"]
+1. d4 d5 0-1
+
+[Result "*"]
+1. c4 *
+"""
+
+def start():
+    board = BitBoard()
+    board.initial_setup()
+    return board
+
+def test_polyglot_keys():
+    # the examples of the Polyglot book format description
+    assert polyglot_key(start()) == 0x463B96181691FC9C
+    lines = [
+        [("e2e4", 0x823C9B50FD114196), ("d7d5", 0x0756B94461C50FB0), ("e4e5", 0x662FAFB965DB29D4),
+         ("f7f5", 0x22A48B5A8E47FF78),  # e5xf6 en passant is possible, so the file counts
+         ("e1e2", 0x652A607CA3F242C1), ("e8f7", 0x00FDD303C946BDD9)],
+        [("a2a4", None), ("b7b5", None), ("h2h4", None), ("b5b4", None),
+         ("c2c4", 0x3C8123EA7B067637), ("b4c3", 0x93D32682782EDFAE), ("a1a3", 0x5C3F9B829B279560)],
+    ]
+    for line in lines:
+        board = start()
+        for move, key in line:
+            board.move((board.algebraic_to_index(move[:2]), board.algebraic_to_index(move[2:]), None))
+            assert key is None or polyglot_key(board) == key
+
+def test_move_encoding():
+    board = BitBoard.from_fen("r3k2r/1P6/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    assert encode_move(board, ((7, 4), (7, 6), None)) == 4 << 6 | 7  # e1h1
+    assert encode_move(board, ((1, 1), (0, 1), Knight)) == 1 << 12 | 6 << 9 | 1 << 6 | 7 << 3 | 1  # b7b8n
+    for action in board.get_all_legal_moves():
+        assert decode_move(board, encode_move(board, action)) == action
+    assert decode_move(board, 4 << 9 | 4 << 6 | 4 << 3 | 4) is None  # e5e5
+
+def test_build_and_probe(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    pgn.write_text(GAMES)
+    path = str(tmp_path / "book.bin")
+    entries = book_entries(read_games(str(pgn)))
+    assert entries == sorted(entries) and build_book([str(pgn)], path) == len(entries)
+    assert (tmp_path / "book.bin").stat().st_size == len(entries) * ENTRY_SIZE
+
+    board = start()
+    with OpeningBook(path) as book:
+        # e4 won once and drew once for white; d4 lost and c4 has no result
+        assert book.moves(board) == [(((6, 4), (4, 4), None), 3)]
+        board.move(((6, 4), (4, 4), None))
+        assert {action for action, _ in book.moves(board)} == {((1, 2), (3, 2), None)}  # e5 lost
+        board.move(((1, 2), (3, 2), None))
+        assert book.choose(board, random.Random(1)) == ((7, 6), (5, 5), None)
+        board.move(((7, 6), (5, 5), None))
+        assert book.choose(board) is None
+
+def test_invalid_book(tmp_path):
+    path = tmp_path / "book.bin"
+    path.write_bytes(b"\x00" * (ENTRY_SIZE + 1))
+    with pytest.raises(ValueError):
+        OpeningBook(str(path))
+    path.write_bytes(b"")
+    with OpeningBook(str(path)) as book:
+        assert len(book) == 0 and book.choose(start()) is None
+
+def test_choose_move_plays_from_book(tmp_path):
+    board = start()
+    path = str(tmp_path / "book.bin")
+    key = polyglot_key(board)
+    write_book(path, [(key, encode_move(board, ((6, 3), (4, 3), None)), 1),
+                      (key, encode_move(board, ((6, 4), (4, 4), None)), 3)])
+    ai = ChessAI(3, book=path)
+    ai.book_rng = random.Random(0)
+    chosen = {ai.choose_move(board) for _ in range(40)}
+    assert chosen == {((6, 3), (4, 3), None), ((6, 4), (4, 4), None)}
+    assert ai.stats.depth == 0 and ai.stats.pv[0] in chosen
+    board.move(((6, 4), (4, 4), None))
+    assert ai.choose_move(board) is not None and ai.stats.depth > 0  # out of book: searched
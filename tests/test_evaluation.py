@@ -0,0 +1,53 @@
+import random
+import pytest
+from ai import ChessAI
+from board import Board
+from bitboard import BitBoard
+from evaluation import MAX_PHASE
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_incremental_evaluation_matches_full_recompute(board_class):
+    rng = random.Random(11)
+    board = board_class()
+    board.initial_setup()
+    for _ in range(80):
+        moves = list(board.get_all_legal_moves())
+        if not moves:
+            break
+        board.move(rng.choice(moves))
+        assert (board.mg_score, board.eg_score, board.phase) == board.compute_evaluation()
+    while board.undo_stack:
+        board.unmake()
+    assert (board.mg_score, board.eg_score, board.phase) == (0, 0, MAX_PHASE)
+
+def test_start_position_is_balanced():
+    board = BitBoard()
+    board.initial_setup()
+    assert board.evaluate() == 0
+    board.move(((6, 4), (4, 4), None))  # e4
+    # good for white, so bad for black, the side to move
+    assert board.evaluate() < 0
+
+def test_evaluation_is_symmetric():
+    board = BitBoard()
+    board.initial_setup()
+    for action in [((6, 3), (4, 3), None), ((1, 3), (3, 3), None)]:  # d4 d5
+        board.move(action)
+    assert board.evaluate() == 0
+    board.move(((7, 6), (5, 5), None))  # Nf3
+    white_view = -board.evaluate()
+    board.move(((0, 6), (2, 5), None))  # Nf6
+    assert white_view > 0 and board.evaluate() == 0
+
+@pytest.mark.parametrize("fen, drawn", [
+    ("8/8/8/4k3/8/8/8/2B1K3 w - - 0 1", True),  # KB vs K
+    ("8/8/8/4k3/8/8/8/1N2K3 b - - 0 1", True),  # KN vs K
+    ("8/8/3b4/4k3/8/8/8/2B1K3 w - - 0 1", True),  # bishops on dark squares
+    ("8/8/2b5/4k3/8/8/8/2B1K3 w - - 0 1", False),  # opposite-colored bishops
+    ("8/8/8/4k3/8/8/4P3/4K3 w - - 0 1", False),  # KP vs K
+    ("8/8/8/4k3/8/8/8/R3K3 w - - 0 1", False),  # KR vs K
+])
+def test_insufficient_material_scores_as_draw(fen, drawn):
+    board = BitBoard.from_fen(fen)
+    assert board.has_insufficient_material() == drawn
+    assert (ChessAI(1).state_eval(board) == 0) == drawn
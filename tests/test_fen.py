@@ -0,0 +1,74 @@
+import pytest
+from board import Board
+from bitboard import BitBoard
+from fen import START_FEN, FenPosition, parse_fen, read_fens
+from perft import POSITIONS
+
+def play(board, moves):
+    for move in moves.split():
+        board.move((board.algebraic_to_index(move[:2]), board.algebraic_to_index(move[2:4]), None))
+    return board
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_round_trip(board_class, name):
+    fen = POSITIONS[name][0]
+    board = board_class.from_fen(fen)
+    assert board.to_fen() == fen
+    assert board.hash == board.compute_position_key()
+    assert (board.mg_score, board.eg_score, board.phase) == board.compute_evaluation()
+
+def test_to_fen_after_moves():
+    board = Board()
+    board.initial_setup()
+    assert board.to_fen() == START_FEN
+    play(board, "e2e4")
+    assert board.to_fen() == "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+    play(board, "c7c5 g1f3")
+    assert board.to_fen() == "rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"
+    play(board, "b8c6 e1e2")
+    assert board.to_fen() == "r1bqkbnr/pp1ppppp/2n5/2p5/4P3/5N2/PPPPKPPP/RNBQ1B1R b kq - 3 3"
+
+def test_from_fen_matches_played_position():
+    played = BitBoard()
+    played.initial_setup()
+    play(played, "e2e4 d7d5 e4e5 f7f5")
+    loaded = BitBoard.from_fen(played.to_fen())
+    assert loaded.to_fen() == played.to_fen()
+    assert loaded.hash == played.hash
+    assert dict(loaded.legal_moves) == dict(played.legal_moves)  # including e5f6 en passant
+
+def test_halfmove_clock_and_fifty_move_rule():
+    board = Board.from_fen("4k3/8/8/8/8/8/8/R3K3 w - - 99 80")
+    assert not board.is_draw()
+    play(board, "a1a2")
+    assert board.time_since_capture == 100 and board.is_draw()
+    assert board.to_fen().endswith(" - - 100 80")
+    board.unmake()
+    assert board.to_fen() == "4k3/8/8/8/8/8/8/R3K3 w - - 99 80"
+
+@pytest.mark.parametrize("fen", [
+    "", "8/8/8/8/8/8/8/8 w - - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",
+    "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkx - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e4 0 1",
+])
+def test_invalid_fen(fen):
+    with pytest.raises(ValueError):
+        Board.from_fen(fen)
+
+def test_read_fens(tmp_path):
+    path = tmp_path / "positions.fen"
+    fens = [fen for fen, _ in POSITIONS.values()]
+    path.write_text("# test positions\n\n" + "\n".join(fens) + "\n")
+    positions = list(read_fens(str(path)))
+    assert all(isinstance(position, FenPosition) for position in positions)
+    assert positions == [parse_fen(fen) for fen in fens]
+    assert [board.to_fen() for board in read_fens(str(path), BitBoard)] == fens
+
+def test_read_fens_invalid_line():
+    lines = [START_FEN, "not a fen", START_FEN]
+    with pytest.raises(ValueError, match="line 2"):
+        list(read_fens(lines))
+    assert len(list(read_fens(lines, skip_invalid=True))) == 2
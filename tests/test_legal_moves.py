@@ -0,0 +1,101 @@
+import pytest
+from board import Board
+from bitboard import BitBoard
+from game import parse_move
+from pieces import Queen, King, Rook, Pawn
+from zobrist import WHITE_KINGSIDE, WHITE_QUEENSIDE
+
+def setup_board(board_class, pieces, ply=0, castling_rights=0):
+    board = board_class()
+    board.ply = ply
+    board.castling_rights = castling_rights
+    for pos, piece in pieces.items():
+        board.piece_map[pos] = piece
+        if isinstance(piece, King):
+            board.king_positions[piece.color] = pos
+    if isinstance(board, BitBoard):
+        board.sync_bitboards()
+    board.mg_score, board.eg_score, board.phase = board.compute_evaluation()
+    return board
+
+def stalemate_board(board_class):
+    return setup_board(board_class, {
+        (0, 0): King("black"),  # Ka8
+        (2, 1): Queen("white"),  # Qb6
+        (7, 7): King("white"),  # Kh1
+    }, ply=1)
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_moves_generated_only_when_read(board_class):
+    board = board_class()
+    board.initial_setup()
+    assert board._legal_moves is None
+    board.move(((6, 4), (4, 4), None))
+    assert board._legal_moves is None
+    assert len(list(board.get_all_legal_moves())) == 20
+    assert board._legal_moves is not None
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_undo_restores_cached_moves(board_class):
+    board = board_class()
+    board.initial_setup()
+    cached = board.legal_moves
+    board.move(((6, 4), (4, 4), None))
+    board.unmake()
+    assert board.legal_moves is cached
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_stalemate_without_full_generation(board_class):
+    board = stalemate_board(board_class)
+    assert not board.has_legal_move()
+    assert board.is_draw()
+    assert not board.in_checkmate("black")
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_pinned_piece_stays_on_pin_ray(board_class):
+    board = setup_board(board_class, {
+        (7, 4): King("white"),  # Ke1
+        (6, 4): Rook("white"),  # Re2
+        (0, 4): Rook("black"),  # Re8
+        (0, 0): King("black"),  # Ka8
+    })
+    assert sorted(target for target, _ in board.legal_moves[(6, 4)]) == [(row, 4) for row in range(6)]
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_en_passant_exposing_king_is_illegal(board_class):
+    board = setup_board(board_class, {
+        (3, 0): King("white"),  # Ka5
+        (3, 1): Pawn("white"),  # b5
+        (1, 2): Pawn("black"),  # c7
+        (3, 7): Rook("black"),  # Rh5
+        (0, 7): King("black"),  # Kh8
+    }, ply=1)
+    board.move(((1, 2), (3, 2), None))  # c5
+    assert ((2, 2), None) not in board.legal_moves.get((3, 1), [])
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_castling_only_checks_the_kings_path(board_class):
+    board = setup_board(board_class, {
+        (7, 4): King("white"),  # Ke1
+        (7, 0): Rook("white"),  # Ra1
+        (7, 7): Rook("white"),  # Rh1
+        (0, 1): Rook("black"),  # Rb8 covers b1, which the king never crosses
+        (0, 5): Rook("black"),  # Rf8 covers f1
+        (0, 7): King("black"),  # Kh8
+    }, castling_rights=WHITE_KINGSIDE | WHITE_QUEENSIDE)
+    king_targets = [target for target, _ in board.legal_moves[(7, 4)]]
+    assert (7, 2) in king_targets
+    assert (7, 6) not in king_targets
+
+@pytest.mark.parametrize("text", ["e2 e4 q", "e7 e8 nb", "e7 e8"])
+def test_move_rejects_bad_promotion_input(text):
+    board = Board.from_fen("k7/4P3/8/8/8/8/4P3/K7 w - - 0 1")
+    before = dict(board.piece_map)
+    with pytest.raises(ValueError):
+        board.move(parse_move(board, text))
+    assert board.piece_map == before and board.ply == 0
+
+def test_move_promotes_to_chosen_piece():
+    board = Board.from_fen("k7/4P3/8/8/8/8/4P3/K7 w - - 0 1")
+    board.move(parse_move(board, "e7 e8 n"))
+    assert board.to_fen().startswith("k3N3/")
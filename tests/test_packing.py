@@ -0,0 +1,64 @@
+import pytest
+from board import Board
+from bitboard import BitBoard
+from fen import START_FEN, parse_fen
+from packing import PACKED_SIZE, pack_position, position_array, read_packed, unpack_position, write_packed
+from perft import POSITIONS
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_round_trip(board_class, name):
+    fen = POSITIONS[name][0]
+    board = board_class.from_fen(fen)
+    data = board.pack()
+    assert len(data) == PACKED_SIZE == 38
+    assert data == pack_position(parse_fen(fen))
+    unpacked = board_class.unpack(data)
+    assert unpacked.to_fen() == fen and unpacked.hash == board.hash
+
+def test_packed_after_moves():
+    board = Board()
+    board.initial_setup()
+    for move in ("e2e4", "c7c5", "e1e2"):
+        board.move((board.algebraic_to_index(move[:2]), board.algebraic_to_index(move[2:]), None))
+        assert unpack_position(board.pack()) == board.fen_position()
+
+def test_state_keeps_repetitions():
+    board = BitBoard()
+    board.initial_setup()
+    board.move(((6, 4), (4, 4), None))  # e4, after which the start position cannot come back
+    for move in ("g8f6", "g1f3", "f6g8", "f3g1") * 2:
+        board.move((board.algebraic_to_index(move[:2]), board.algebraic_to_index(move[2:]), None))
+    data, history = board.pack_state()
+    assert history == {key: board.position_history[key] for key in history} and len(history) == 4
+    copy = BitBoard.unpack_state((data, history))
+    assert copy.hash == board.hash and copy.is_draw() and copy.undo_stack == []
+
+def test_invalid_data():
+    data = Board.from_fen(START_FEN).pack()
+    with pytest.raises(ValueError):
+        unpack_position(data[:-1])
+    with pytest.raises(ValueError):
+        unpack_position(b"\xff" + data[1:])  # square code 15
+    with pytest.raises(ValueError):
+        unpack_position(data[:33] + b"\x09" + data[34:])  # en passant file 8
+
+def test_packed_file(tmp_path):
+    path = str(tmp_path / "positions.bin")
+    fens = [POSITIONS[name][0] for name in sorted(POSITIONS)]
+    assert write_packed(path, [parse_fen(fen) for fen in fens[:-1]] + [BitBoard.from_fen(fens[-1])]) == len(fens)
+    assert (tmp_path / "positions.bin").stat().st_size == len(fens) * PACKED_SIZE
+    assert list(read_packed(path)) == [parse_fen(fen) for fen in fens]
+
+    with open(path, "ab") as packed:
+        packed.write(b"\x00")
+    with pytest.raises(ValueError):
+        list(read_packed(path))
+
+def test_position_array(tmp_path):
+    pytest.importorskip("numpy")
+    path = str(tmp_path / "positions.bin")
+    write_packed(path, [parse_fen(START_FEN)] * 3)
+    positions = position_array(path)
+    assert len(positions) == 3 and positions[2]["fullmove"] == 1 and positions[0]["flags"] == 15 << 1
+    assert bytes(positions[1]) == Board.from_fen(START_FEN).pack()
@@ -0,0 +1,31 @@
+import time
+import pytest
+from board import Board
+from bitboard import BitBoard
+from perft import POSITIONS, perft, divide
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_perft_known_counts(board_class, name):
+    fen, expected = POSITIONS[name]
+    board = board_class.from_fen(fen)
+    key = board.hash
+    assert [perft(board, depth) for depth in (1, 2)] == expected[:2]
+    assert board.hash == key and not board.undo_stack
+
+def test_divide_sums_to_perft():
+    board = BitBoard.from_fen(POSITIONS["kiwipete"][0])
+    counts = divide(board, 2)
+    assert len(counts) == 48 and counts["e1g1"] == 43
+    assert sum(counts.values()) == 2039
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_perft_benchmark(name):
+    fen, expected = POSITIONS[name]
+    board = BitBoard.from_fen(fen)
+    start = time.perf_counter()
+    nodes = perft(board, len(expected))
+    seconds = time.perf_counter() - start
+    print(f"{name}: {nodes} nodes in {seconds:.2f}s, {nodes / seconds:.0f} nps")
+    assert nodes == expected[-1]
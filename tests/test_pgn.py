@@ -0,0 +1,75 @@
+import pytest
+from bitboard import BitBoard
+from pgn import format_game, parse_san, read_games, replay, san
+from pieces import Knight, Queen
+
+OPERA_GAME = """[Event "Paris"]
+[White "Paul Morphy"]
+[Black "Duke Karl / Count Isouard"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 d6 3. d4 Bg4 {a weak move,
+[already]} 4. dxe5 Bxf3 (4... dxe5 5. Qxd8+ (5. dxe5) Kxd8) 5. Qxf3 dxe5 6. Bc4 Nf6
+7. Qb3 Qe7 8. Nc3 c6 9. Bg5 $6 b5 10. Nxb5 cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8
+13. Rxd7 Rxd7 14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ ; sacrifice
+Nxb8 17. Rd8# 1-0
+
+[Event "unfinished"]
+
+1. d4 d5 *
+"""
+
+def test_read_games():
+    games = list(read_games(OPERA_GAME.splitlines(keepends=True)))
+    assert len(games) == 2
+    opera, unfinished = games
+    assert opera.headers["Black"] == "Duke Karl / Count Isouard"
+    assert opera.moves[6:9] == ["dxe5", "Bxf3", "Qxf3"]  # the variations are skipped
+    assert opera.moves[-3:] == ["Qb8+", "Nxb8", "Rd8#"] and len(opera.moves) == 33
+    assert opera.result == "1-0"
+    assert unfinished.moves == ["d4", "d5"] and unfinished.result == "*"
+
+def test_write_and_read_back(tmp_path):
+    opera = next(read_games(OPERA_GAME.splitlines()))
+    actions = [action for _, action in replay(opera)]
+    text = format_game(actions, {"White": "Paul Morphy", "Event": "Paris"})
+    assert text.startswith('[Event "Paris"]\n[Site "?"]')
+    assert '[Result "1-0"]' in text and text.rstrip().endswith("17. Rd8# 1-0")
+    assert all(len(line) <= 80 for line in text.splitlines())
+    path = tmp_path / "games.pgn"
+    path.write_text(text * 3)
+    games = list(read_games(str(path)))
+    assert len(games) == 3 and all(game.moves == opera.moves for game in games)
+
+def test_san_disambiguation():
+    board = BitBoard.from_fen("7k/8/8/R7/8/2N3N1/8/R3K3 w - - 0 1")
+    names = {san(board, action) for action in board.get_all_legal_moves()}
+    assert {"R1a3", "R5a2", "Nce4", "Nge2", "Nf5", "Ra6", "Rh5+"} <= names
+    assert not {"Ra3", "Ne4", "N3e4"} & names
+    board = BitBoard.from_fen("5k2/8/8/8/Q6Q/8/8/Q3K3 w - - 0 1")
+    assert {san(board, action) for action in board.get_all_legal_moves() if action[1] == (4, 3)} == {
+        "Q1d4", "Qa4d4", "Qhd4"}
+
+def test_san_special_moves():
+    board = BitBoard.from_fen("r3k2r/1P6/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1")
+    assert san(board, ((7, 4), (7, 6), None)) == "O-O"
+    assert san(board, ((7, 4), (7, 2), None)) == "O-O-O"
+    assert san(board, ((3, 4), (2, 3), None)) == "exd6"
+    assert san(board, ((1, 1), (0, 0), Queen)) == "bxa8=Q+"
+    assert san(board, ((1, 1), (0, 1), Knight)) == "b8=N"
+
+def test_parse_san():
+    board = BitBoard.from_fen("4k3/1P6/8/8/8/8/8/R3K2R w KQ - 0 1")
+    assert parse_san(board, "b8=N") == ((1, 1), (0, 1), Knight)
+    assert parse_san(board, "b8") == ((1, 1), (0, 1), Queen)
+    assert parse_san(board, "O-O+") == ((7, 4), (7, 6), None)
+    assert parse_san(board, "0-0-0") == ((7, 4), (7, 2), None)
+    assert parse_san(board, "Rd1") == ((7, 0), (7, 3), None)
+    for text in ("Rd2", "Nf3", "Kd3", "xyz"):
+        with pytest.raises(ValueError):
+            parse_san(board, text)
+
+def test_replay_reports_illegal_move():
+    game = next(read_games(["1. e4 e5 2. Ke3 *"]))
+    with pytest.raises(ValueError, match="move 2. Illegal move: Ke3"):
+        list(replay(game))
@@ -0,0 +1,35 @@
+import copy
+import pickle
+import pytest
+from board import Board
+from pieces import Pawn, Rook, King, PAWN, ROOK
+
+def test_pieces_are_shared_and_immutable():
+    assert Pawn("white") is Pawn("white") and Pawn("white") is not Pawn("black")
+    rook = Rook("black")
+    assert (rook.type_code, rook.color_index, rook.code, str(rook)) == (ROOK, 1, 6 + ROOK, "r")
+    assert str(Pawn("white")) == "P" and Pawn("white").code == PAWN
+    with pytest.raises(AttributeError):
+        rook.color = "white"
+    with pytest.raises(AttributeError):
+        rook.has_moved = True
+    with pytest.raises(ValueError):
+        King("red")
+
+def test_copies_share_pieces():
+    board = Board()
+    board.initial_setup()
+    for board_copy in (pickle.loads(pickle.dumps(board)), copy.deepcopy(board)):
+        assert all(board_copy.piece_map[pos] is piece for pos, piece in board.piece_map.items())
+        assert board_copy.castling_rights == board.castling_rights
+
+def test_castling_rights_and_en_passant_follow_moves():
+    board = Board.from_fen("r3k2r/8/8/8/3p4/8/4P3/R3K2R w KQkq - 0 1")
+    board.move(((6, 4), (4, 4), None))  # e4
+    assert board.en_passant == (5, 4) and board.to_fen().split()[2:4] == ["KQkq", "e3"]
+    board.move(((0, 7), (7, 7), None))  # Rxh1
+    assert board.en_passant is None and board.to_fen().split()[2] == "Qq"
+    board.unmake()
+    board.unmake()
+    assert board.to_fen() == "r3k2r/8/8/8/3p4/8/4P3/R3K2R w KQkq - 0 1"
+    assert board.hash == board.compute_position_key()
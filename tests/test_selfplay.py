@@ -0,0 +1,67 @@
+import math
+import os
+import time
+import pytest
+from fen import START_FEN
+from selfplay import (EngineConfig, GameRecord, GameSpec, elo_difference, play_game, random_openings,
+                      read_results, run_match)
+
+def scripted_play(spec, engine_a, engine_b, max_plies):
+    """Stands in for play_game: A wins every game, and the worker playing game 1 dies the
+    first time (engine_a.options["marker"] records that it did)."""
+    marker = engine_a.options["marker"]
+    if spec.game_id == 1 and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return GameRecord(spec.game_id, spec.opening, "A" if spec.a_is_white else "B",
+                      "1-0" if spec.a_is_white else "0-1", "checkmate", ["e2e4"])
+
+def crashing_play(spec, engine_a, engine_b, max_plies):
+    """Like scripted_play, but the worker playing game 1 dies every time."""
+    if spec.game_id == 1:
+        os._exit(1)
+    time.sleep(0.1)  # so the other games are still running when it does
+    return GameRecord(spec.game_id, spec.opening, "A", "1-0", "checkmate", ["e2e4"])
+
+def failing_play(spec, engine_a, engine_b, max_plies):
+    raise AssertionError("recorded games must not be replayed")
+
+def test_elo_difference():
+    assert elo_difference(10, 0, 10) == (0.0, pytest.approx(163.3, abs=0.1))
+    assert elo_difference(5, 0, 0) == (math.inf, math.inf)
+    elo, margin = elo_difference(60, 30, 10)
+    assert elo == pytest.approx(191, abs=1)
+    assert 0 < margin < elo_difference(6, 3, 1)[1]
+
+def test_play_game_stops_at_ply_limit():
+    record = play_game(GameSpec(7, START_FEN, False), EngineConfig(1), EngineConfig(1), max_plies=4)
+    assert (record.game_id, record.white, record.result, record.reason) == (7, "B", "1/2-1/2", "ply limit")
+    assert len(record.moves) == 4
+
+def test_random_openings_are_reproducible():
+    openings = random_openings(3, 4, seed=5)
+    assert openings == random_openings(3, 4, seed=5) and len(set(openings)) == 3
+    assert all(" w " in fen for fen in openings)
+
+def test_run_match_survives_crash_and_resumes(tmp_path):
+    results = str(tmp_path / "results.tsv")
+    specs = [GameSpec(i, START_FEN, i % 2 == 0) for i in range(6)]
+    engine_a = EngineConfig(1, options={"marker": str(tmp_path / "crashed")})
+    records = run_match(specs, engine_a, EngineConfig(1), results, workers=2, play=scripted_play)
+    assert os.path.exists(tmp_path / "crashed")
+    assert sorted(record.game_id for record in records) == list(range(6))
+    assert all(record.a_score == 1 for record in records)
+    assert sorted(read_results(results)) == list(range(6))
+
+    with open(results, "a") as results_file:
+        results_file.write("6\tcut short")  # as if the runner was killed mid-write
+    specs.append(GameSpec(6, START_FEN, True))
+    records = run_match(specs, engine_a, EngineConfig(1), results, workers=1, play=scripted_play)
+    assert len(records) == 7 and sorted(read_results(results)) == list(range(7))
+    assert len(run_match(specs, engine_a, EngineConfig(1), results, workers=1, play=failing_play)) == 7
+
+def test_run_match_drops_only_the_crashing_game(tmp_path):
+    results = str(tmp_path / "results.tsv")
+    specs = [GameSpec(i, START_FEN, True) for i in range(6)]
+    records = run_match(specs, EngineConfig(1), EngineConfig(1), results, workers=3, play=crashing_play)
+    assert sorted(record.game_id for record in records) == [0, 2, 3, 4, 5]
@@ -0,0 +1,16 @@
+import sys
+import pytest
+
+pygame = pytest.importorskip("pygame")
+pytest.importorskip("cairosvg")
+from sprites import SpriteCache
+
+def test_atlas_is_cached_on_disk(tmp_path, monkeypatch):
+    sprites = SpriteCache("assets/merida", cache_dir=str(tmp_path)).get(40)
+    assert len(sprites) == 12 and sprites["black_King"].get_size() == (40, 40)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # a fresh cache (a new launch) loads the atlas without rasterizing
+    monkeypatch.setitem(sys.modules, "cairosvg", None)
+    cached = SpriteCache("assets/merida", cache_dir=str(tmp_path)).get_async(40).result()
+    assert cached.keys() == sprites.keys()
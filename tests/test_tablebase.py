@@ -0,0 +1,53 @@
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from ai import ChessAI
+from bitboard import BitBoard
+from tablebase import INVALID, Tablebases, all_tables, generate, layout, material_name
+
+@pytest.fixture(scope="module")
+def tablebases(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("tablebases")
+    generate("KQvK", str(directory))
+    return Tablebases(str(directory))
+
+def test_names_and_dependencies():
+    assert material_name("KR", "KQ") == ("KQvKR", True)
+    assert material_name("PKQ", "KN") == ("KQPvKN", False)
+    assert all_tables(3) == ["KBvK", "KNvK", "KPvK", "KQvK", "KRvK"] and len(all_tables(4)) == 35
+    assert layout("KPvK").dependencies() == {"KQvK", "KRvK", "KBvK", "KNvK"}
+    assert layout("KRvKP").dependencies() == {"KRvK", "KPvK", "KQvKR", "KRvKR", "KRvKB", "KRvKN",
+                                              "KQvK", "KBvK", "KNvK"}  # pawn takes rook and promotes
+    for name in ("KvK", "KQRBvK", "KRvKQ", "KXvK"):
+        with pytest.raises(ValueError):
+            layout(name)
+
+@pytest.mark.parametrize("name", ["KQvKR", "KPvKP", "KNNvK"])
+def test_index_round_trip(name):
+    table_layout = layout(name)
+    for index in (12345, table_layout.side_size + 777, table_layout.size - 1):
+        squares, white_to_move = table_layout.squares(index)
+        assert table_layout.index(squares, white_to_move) <= index  # the canonical form, or this one
+
+def test_probe(tablebases):
+    assert len(tablebases.names) == 1 and tablebases.max_pieces == 3
+    white = BitBoard.from_fen("8/8/8/8/8/2k5/8/K6Q w - - 0 1")
+    black = BitBoard.from_fen("k6q/8/2K5/8/8/8/8/8 b - - 0 1")  # the same position, colors swapped
+    assert tablebases.probe(white) == tablebases.probe(black) == (1, 11)
+    assert tablebases.best_move(white) == (((7, 7), (3, 3), None), 1, 11)
+    assert tablebases.probe(BitBoard.from_fen("k7/2Q5/1K6/8/8/8/8/8 b - - 0 1")) == (0, 0)  # stalemate
+    assert tablebases.probe(BitBoard.from_fen("k1Q5/8/1K6/8/8/8/8/8 b - - 0 1")) == (-1, 0)  # checkmate
+    assert tablebases.probe(BitBoard.from_fen("8/8/8/8/8/2k5/8/K6R w - - 0 1")) is None  # no KRvK table
+    data = open(f"{tablebases.directory}/KQvK.tb", "rb").read()
+    assert max(code for code in data if code != INVALID) == 21  # the longest KQvK mate: 10 moves
+
+def test_search_uses_tablebases(tablebases):
+    ai = ChessAI(2, tablebases=tablebases)
+    board = BitBoard.from_fen("8/8/8/8/8/2k5/8/K6Q w - - 0 1")
+    assert ai.choose_move(board) == ((7, 7), (3, 3), None) and ai.stats.depth == 0 and ai.stats.tb_hits == 1
+    board = BitBoard.from_fen("k7/8/8/8/8/8/2n5/K2Q4 w - - 0 1")  # only Qxc2 leaves a won KQvK
+    assert ai.choose_move(board) == ((7, 3), (6, 2), None) and ai.stats.tb_hits > 0
+
+def test_generate_on_a_pool(tmp_path):
+    with ProcessPoolExecutor(2) as pool:
+        pooled = open(generate("KQvK", str(tmp_path / "pooled"), pool), "rb").read()
+    assert pooled == open(generate("KQvK", str(tmp_path / "serial")), "rb").read()
@@ -2,31 +2,23 @@ import pytest
 from board import Board
 from pieces import Pawn, Queen, King
 
+def snapshot(board: Board):
+    """Everything unmake() has to restore."""
+    return (dict(board.piece_map), dict(board.king_positions), board.ply, board.time_since_capture,
+            board.castling_rights, board.en_passant,
+            board.hash, board.en_passant_file, dict(board.position_history),
+            board.mg_score, board.eg_score, board.phase)
+
 def make_move_and_undo(board: Board, action):
     before_key = board.compute_position_key()
-    before_time = board.time_since_capture
-    piece = board.piece_map[action[0]]
-    was_first_move = not piece.has_moved
-
-    if board.is_capture(action):
-        capture_details = board.get_capture_details(action)
-    else:
-        capture_details = [None, None, None]
+    before = snapshot(board)
     board.update_legal_moves()
     board.move(action)
-
-    board.undo_move(
-        position=action[0],
-        target=action[1],
-        promo=action[2],
-        was_first_move=was_first_move,
-        captured_piece=capture_details[0],
-        captured_piece_pos=capture_details[1],
-        prev_time_since_capture=capture_details[2]
-    )
+    board.unmake()
 
     after_key = board.compute_position_key()
     assert before_key == after_key, f"Undo failed! \nBefore: {before_key}\nAfter:  {after_key}"
+    assert before == snapshot(board)
 
 def test_undo_regular_pawn_move():
     board = Board()
@@ -78,4 +70,37 @@ def test_undo_promotion():
     board.king_positions["black"] = (0, 3)
     board.update_legal_moves()
     move = ((6, 0), (7, 0), Queen)
-    make_move_and_undo(board, move)
\ No newline at end of file
+    make_move_and_undo(board, move)
+
+def test_undo_restores_en_passant_right():
+    board = Board()
+    board.initial_setup()
+    for action in [((6, 4), (4, 4), None), ((1, 0), (2, 0), None),
+                   ((4, 4), (3, 4), None), ((1, 3), (3, 3), None)]:  # e4 a6 e5 d5
+        board.move(action)
+    make_move_and_undo(board, ((7, 6), (5, 5), None))  # Nf3 gives up exd6 e.p.
+    assert ((3, 4), (2, 3), None) in set(board.get_all_legal_moves())
+
+def test_unmake_sequence_returns_to_start():
+    board = Board()
+    board.initial_setup()
+    start = snapshot(board)
+    actions = [((6, 4), (4, 4), None), ((1, 3), (3, 3), None), ((4, 4), (3, 3), None),
+               ((0, 3), (3, 3), None), ((7, 6), (5, 5), None), ((3, 3), (3, 4), None)]
+    for action in actions:
+        board.move(action)
+    for _ in actions:
+        board.unmake()
+    assert snapshot(board) == start
+    assert board.undo_stack == []
+
+def test_undo_null_move():
+    board = Board()
+    board.initial_setup()
+    board.move(((6, 4), (4, 4), None))  # e4 leaves an en passant file
+    before = snapshot(board)
+    board.make_null_move()
+    assert board.ply == before[2] + 1 and board.en_passant is None and board.hash != before[6]
+    assert board.hash == board.compute_position_key()
+    board.unmake()
+    assert snapshot(board) == before
@@ -0,0 +1,58 @@
+import random
+import pytest
+from board import Board
+from bitboard import BitBoard
+
+KNIGHT_SHUFFLE = [((7, 6), (5, 5), None), ((0, 6), (2, 5), None),  # Nf3 Nf6
+                  ((5, 5), (7, 6), None), ((2, 5), (0, 6), None)]  # Ng1 Ng8
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_incremental_hash_matches_full_recompute(board_class):
+    rng = random.Random(7)
+    board = board_class()
+    board.initial_setup()
+    for _ in range(80):
+        moves = list(board.get_all_legal_moves())
+        if not moves:
+            break
+        board.move(rng.choice(moves))
+        assert board.hash == board.compute_position_key()
+
+def test_transposition_returns_to_same_hash():
+    board = Board()
+    board.initial_setup()
+    start = board.hash
+    for action in KNIGHT_SHUFFLE:
+        board.move(action)
+    assert board.hash == start
+    assert board.position_history[start] == 2
+
+def test_threefold_repetition_is_draw():
+    board = BitBoard()
+    board.initial_setup()
+    for action in KNIGHT_SHUFFLE * 2:
+        assert not board.is_draw()
+        board.move(action)
+    assert board.is_draw()
+
+def test_castling_rights_change_hash():
+    # same placement reached with and without the king having moved
+    board = Board()
+    board.initial_setup()
+    for action in [((6, 4), (4, 4), None), ((1, 4), (3, 4), None)]:  # e4 e5
+        board.move(action)
+    before = board.hash
+    for action in [((7, 4), (6, 4), None), ((0, 6), (2, 5), None),  # Ke2 Nf6
+                   ((6, 4), (7, 4), None), ((2, 5), (0, 6), None)]:  # Ke1 Ng8
+        board.move(action)
+    assert board.hash != before
+    assert board.hash == board.compute_position_key()
+
+def test_undo_restores_hash_and_history():
+    board = BitBoard()
+    board.initial_setup()
+    start, history = board.hash, dict(board.position_history)
+    board.move(((6, 4), (4, 4), None))
+    board.unmake()
+    assert board.hash == start
+    assert board.position_history == history
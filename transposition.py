@@ -0,0 +1,84 @@
+from array import array
+from pieces import Queen, Knight, Rook, Bishop
+
+# Bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+
+PROMOTIONS = [None, Queen, Knight, Rook, Bishop]
+PROMOTION_CODES = {piece_class: code for code, piece_class in enumerate(PROMOTIONS)}
+
+
+def encode_move(action) -> int:
+    """Packs a (position, target, promo) action into an int. 0 means no move."""
+    (from_row, from_col), (to_row, to_col), promo = action
+    return (from_row * 8 + from_col) | (to_row * 8 + to_col) << 6 | PROMOTION_CODES[promo] << 12
+
+
+def decode_move(code: int):
+    """Unpacks an int from encode_move back into a (position, target, promo) action."""
+    from_sq, to_sq = code & 63, (code >> 6) & 63
+    return (from_sq // 8, from_sq % 8), (to_sq // 8, to_sq % 8), PROMOTIONS[code >> 12]
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results indexed by the low bits of the Zobrist hash.
+    Entries are packed into flat arrays, so the memory use is set by size_mb up front and
+    never grows. On a collision the deeper result is kept, unless the stored entry is from
+    an earlier search (see new_search), in which case it is always replaced.
+    """
+    ENTRY_BYTES = 20  # 8 byte key, 8 byte packed (score, age, depth, bound), 4 byte move
+
+    def __init__(self, size_mb: float = 16) -> None:
+        self.size_mb = size_mb
+        self.size = max(1, int(size_mb * 1024 * 1024) // self.ENTRY_BYTES)
+        self.keys = array("Q", bytes(8 * self.size))
+        self.data = array("q", bytes(8 * self.size))
+        self.moves = array("I", bytes(4 * self.size))
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self) -> None:
+        """Empties the table and resets the statistics."""
+        self.__init__(self.size_mb)
+
+    def new_search(self) -> None:
+        """Marks the start of a new search so entries from earlier searches are replaced first."""
+        self.age = (self.age + 1) & 0x3FF
+
+    def probe(self, key: int):
+        """Returns (depth, score, bound, move) stored for key, or None. move is an action or None."""
+        self.probes += 1
+        index = key % self.size
+        data = self.data[index]
+        # depth is stored +1, so a zero depth field marks an empty slot
+        if self.keys[index] != key or not data & 0x3FC:
+            return None
+        self.hits += 1
+        move = self.moves[index]
+        return ((data >> 2) & 0xFF) - 1, data >> 20, data & 3, decode_move(move) if move else None
+
+    def store(self, key: int, depth: int, score: int, bound: int, move=None) -> None:
+        """Stores a search result for key. Scores are from the perspective of the side to move."""
+        index = key % self.size
+        old = self.data[index]
+        if (self.keys[index] == key or not old & 0x3FC
+                or (old >> 10) & 0x3FF != self.age or depth >= ((old >> 2) & 0xFF) - 1):
+            if move is None and self.keys[index] == key:
+                move_code = self.moves[index]  # keep the previous best move for ordering
+            else:
+                move_code = encode_move(move) if move is not None else 0
+            self.keys[index] = key
+            self.data[index] = (score << 20) | (self.age << 10) | (min(depth + 1, 0xFF) << 2) | bound
+            self.moves[index] = move_code
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def usage(self) -> float:
+        """Fraction of slots filled in the current search."""
+        sample = min(self.size, 1000)
+        return sum(1 for i in range(sample)
+                   if self.data[i] & 0x3FC and (self.data[i] >> 10) & 0x3FF == self.age) / sample
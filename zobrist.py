@@ -0,0 +1,19 @@
+import random
+from pieces import Rook, Bishop, Queen, Knight, King, Pawn
+
+# Fixed seed so hashes are reproducible across runs and processes (opening books, saved games).
+_rng = random.Random(20250101)
+
+# PIECE_KEYS[(color, piece class)][row * 8 + col]
+PIECE_KEYS = {
+    (color, piece_class): [_rng.getrandbits(64) for _ in range(64)]
+    for color in ("white", "black")
+    for piece_class in (Pawn, Knight, Bishop, Rook, Queen, King)
+}
+# Indexed by the castling rights bitmask Board.castling_rights
+CASTLING_KEYS = [_rng.getrandbits(64) for _ in range(16)]
+EN_PASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+BLACK_TO_MOVE_KEY = _rng.getrandbits(64)
+
+# Castling rights bits
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8